@@ -0,0 +1,65 @@
+import os
+import csv
+import random
+import classes.database as database_class
+from utils.utilities import get_current_datetime, get_unique_id, hash_password
+
+
+def generate_dataset(folder_path: str, users: int, courses: int, enrollments: int, seed=0):
+    """
+    Generate a database folder filled with synthetic users, courses and enrollments.
+
+    Parameters:
+    - folder_path (str): Folder path to store all csv files.
+    - users (int): The number of students to create.
+    - courses (int): The number of courses to create.
+    - enrollments (int): The number of enrollments to create.
+    - seed (int): Optional. Seed for the random number generator.
+
+    Returns:
+    - Database: A Database instance for the generated folder.
+    """
+    rng = random.Random(seed)
+    db = database_class.Database(folder_path=folder_path)
+    now = get_current_datetime()
+    password = hash_password("password")
+    creators = ["super admin", "registrar", "dean"]
+
+    user_rows = [{"id": get_unique_id(), "name": f"Student {index}", "username": f"student{index}",
+                  "password": password, "role": "student", "creator": rng.choice(creators),
+                  "created_at": now, "updated_at": now} for index in range(users)]
+
+    course_rows = [{"id": get_unique_id(), "name": f"Course {index}", "description": f"Description of course {index}",
+                    "creator": rng.choice(creators), "created_at": now, "updated_at": now} for index in range(courses)]
+
+    with open(db.users_file, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=db.users_field_names)
+        writer.writerows(user_rows)
+
+    with open(db.courses_file, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=db.courses_field_names)
+        writer.writerows(course_rows)
+
+    with open(db.enrollments_file, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=db.enrollments_field_names)
+        for _ in range(enrollments):
+            user = rng.choice(user_rows)
+            course = rng.choice(course_rows)
+            writer.writerow({"id": get_unique_id(), "user_id": user["id"], "course_id": course["id"],
+                             "creator": rng.choice(creators), "created_at": now, "updated_at": now})
+
+    return db
+
+
+def dataset_size(folder_path: str):
+    """
+    Get the total size in bytes of the csv files in a database folder.
+
+    Parameters:
+    - folder_path (str): Folder path of the database.
+
+    Returns:
+    - int: The total size in bytes.
+    """
+    return sum(os.path.getsize(os.path.join(folder_path, name))
+               for name in os.listdir(folder_path) if name.endswith('.csv'))
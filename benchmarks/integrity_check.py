@@ -0,0 +1,66 @@
+"""
+Measure the time and peak memory of an integrity check over a large database, sequential
+and split across worker processes.
+
+Usage: python -m benchmarks.integrity_check [enrollments]
+"""
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import classes.database as database_class
+from benchmarks.datasets import dataset_size, generate_dataset
+
+
+def time_check(db):
+    """
+    Time an integrity check, then measure the memory a second check allocates in this
+    process. Tracing allocations slows the check down, so it isn't timed.
+
+    Parameters:
+    - db (Database): The Database instance.
+
+    Returns:
+    - tuple[float, int, IntegrityReport]: The time in seconds, the peak memory in bytes and the report.
+    """
+    start = time.perf_counter()
+    report = db.check_integrity()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    db.check_integrity()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return elapsed, peak, report
+
+
+def main():
+    enrollments = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cpus = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        generate_dataset(folder_path, users=enrollments // 20,
+                         courses=enrollments // 200, enrollments=enrollments)
+
+        print(f"Enrollments: {enrollments} ({dataset_size(folder_path) / 2 ** 20:.0f} MiB), CPUs: {cpus}")
+
+        sequential_db = database_class.Database(
+            folder_path=folder_path, parallel_scan_threshold=float('inf'))
+        elapsed, peak, report = time_check(sequential_db)
+        print(f"sequential: {elapsed:.2f}s, peak {peak / 2 ** 20:.0f} MiB, "
+              f"{len(report.duplicate_enrollments)} duplicate enrollment(s)")
+
+        parallel_db = database_class.Database(
+            folder_path=folder_path, parallel_scan_threshold=0, max_workers=cpus)
+        # Build the index and start the pool before timing
+        parallel_db.check_integrity()
+        elapsed, peak, report = time_check(parallel_db)
+        print(f"{cpus} worker(s): {elapsed:.2f}s, peak {peak / 2 ** 20:.0f} MiB, "
+              f"{len(report.duplicate_enrollments)} duplicate enrollment(s)")
+        parallel_db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Measure the memory held by enrollments and users read from a large dataset,
+with and without interning of repeated column values.
+
+Usage: python -m benchmarks.interning_memory [enrollments]
+"""
+import sys
+import tempfile
+import tracemalloc
+from benchmarks.datasets import generate_dataset
+
+
+def measure(db, interned: bool):
+    """
+    Measure the memory retained by reading every user and enrollment.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - interned (bool): Whether repeated values should be interned.
+
+    Returns:
+    - int: The number of bytes retained by the loaded records.
+    """
+    interned_field_names = db.interned_field_names
+    if not interned:
+        db.interned_field_names = {}
+
+    try:
+        tracemalloc.start()
+        records = [*db.read_users(), *db.read_enrollments()]
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    finally:
+        db.interned_field_names = interned_field_names
+
+    del records
+    return retained
+
+
+def main():
+    enrollments = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        db = generate_dataset(folder_path, users=enrollments // 20,
+                              courses=enrollments // 200, enrollments=enrollments)
+
+        plain = measure(db, interned=False)
+        interned = measure(db, interned=True)
+
+        print(f"Enrollments: {enrollments}")
+        print(f"Without interning: {plain / 2 ** 20:.1f} MiB")
+        print(f"With interning:    {interned / 2 ** 20:.1f} MiB")
+        print(f"Saved:             {(plain - interned) / plain:.0%}")
+
+
+if __name__ == "__main__":
+    main()
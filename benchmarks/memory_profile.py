@@ -0,0 +1,267 @@
+"""
+Profile the peak memory of each screen of the application and each bulk read of the
+Database on generated datasets of increasing size, list the sites allocating the most
+memory at the peak, and fail if a step exceeds its memory budget.
+
+Budgets grow with the dataset: a step may use BASE_BUDGET plus its budget in bytes per
+enrollment, so a step whose memory grows faster than the data fails on large datasets.
+
+Usage: python -m benchmarks.memory_profile [--sizes N [N ...]] [--top N] [--budget STEP=BYTES ...]
+"""
+import gc
+import sys
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import utils.utilities as utilities
+import classes.database as database_class
+from classes.screen import Screen
+from classes.render_cache import RenderCache
+from benchmarks.datasets import generate_dataset
+
+# Memory any step may use whatever the size of the dataset
+BASE_BUDGET = 4 * 2 ** 20
+
+# Seconds between two checks for the peak of a step
+SAMPLE_INTERVAL = 0.002
+
+
+class Sink:
+    """
+    A stream counting what the screen writes instead of keeping it, and catching the
+    errors the actions print instead of raising.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.errors: list[str] = []
+
+    def write(self, text: str):
+        self.size += len(text)
+        if 'error occured' in text:
+            self.errors.append(text.strip())
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def view(action, user=None, answer=None):
+    """
+    Get a step that runs an action of utilities.py.
+
+    Parameters:
+    - action (Callable): The action.
+    - user (str): Optional. The key in the step context of the user the action runs as.
+    - answer (str): Optional. The key in the step context of the answer to the prompt of the action.
+
+    Returns:
+    - Callable: The step, taking the Database instance and the step context.
+    """
+    def step(db, context):
+        if answer:
+            utilities.screen.input = lambda prompt='': context[answer]
+
+        if user:
+            action(db, context[user])
+        else:
+            action(db)
+        utilities.screen.flush()
+
+    return step
+
+
+# Steps of the profile and their budgets in bytes per enrollment
+STEPS = {
+    'view_all_users': (view(utilities.view_all_users, 'admin'), 150),
+    'view_all_courses': (view(utilities.view_all_courses, 'admin'), 25),
+    'view_all_enrollments': (view(utilities.view_all_enrollments, 'admin'), 2000),
+    'view_all_student_courses': (view(utilities.view_all_student_courses, answer='username'), 50),
+    'view_all_course_students': (view(utilities.view_all_course_students, answer='course_id'), 100),
+    'view_my_courses': (view(utilities.view_my_courses, 'student'), 25),
+    'read_users': (lambda db, context: db.read_users(), 75),
+    'read_courses': (lambda db, context: db.read_courses(), 25),
+    'read_enrollments': (lambda db, context: db.read_enrollments(), 1000),
+    'query_enrollments': (lambda db, context: db.query_enrollments(course_id=context['course_id']), 50),
+    'query_latest_enrollments': (lambda db, context: db.query('enrollment', order_by=['-created_at'], limit=100), 25),
+    'check_integrity': (lambda db, context: db.check_integrity(), 750),
+}
+
+
+def open_database(folder_path: str):
+    """
+    Open a database with its table indexes loaded, so steps don't count them.
+
+    Parameters:
+    - folder_path (str): Folder path of the database.
+
+    Returns:
+    - tuple[Database, dict]: The Database instance and the step context: an admin, a
+      student with enrollments and their username, and the id of a course with students.
+    """
+    db = database_class.Database(folder_path=folder_path)
+
+    for record_type in ['user', 'course', 'enrollment']:
+        db.refresh(record_type)
+
+    enrollment = db.query('enrollment', limit=1, fields=['user_id', 'course_id'])[0]
+    context = {
+        'admin': db.read_user(username='admin'),
+        'student': db.read_user(id=enrollment['user_id']),
+        'username': db.read_user(id=enrollment['user_id']).username,
+        'course_id': enrollment['course_id'],
+    }
+
+    return db, context
+
+
+def measure_peak(step, db, context):
+    """
+    Measure the peak memory of a step.
+
+    Parameters:
+    - step (Callable): The step.
+    - db (Database): The Database instance.
+    - context (dict): The step context.
+
+    Returns:
+    - int: The peak memory in bytes.
+    """
+    utilities.render_cache = RenderCache()
+    gc.collect()
+
+    # Keeping one frame per allocation slows the step down the least
+    tracemalloc.start()
+    result = step(db, context)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    del result
+    return peak
+
+
+def snapshot_peak(step, db, context, peak: int):
+    """
+    Run a step again and take a snapshot of the memory it holds once it nears its peak.
+    Snapshots only hold live memory, so one taken after the step would miss what it freed.
+
+    Parameters:
+    - step (Callable): The step.
+    - db (Database): The Database instance.
+    - context (dict): The step context.
+    - peak (int): The peak memory of the step, see measure_peak.
+
+    Returns:
+    - Snapshot: The snapshot, None if the step held 80% of its peak too briefly to be sampled.
+    """
+    utilities.render_cache = RenderCache()
+    gc.collect()
+    snapshots = []
+    done = threading.Event()
+
+    # Sampling from a thread leaves the step at full speed, unlike a profile hook on every call
+    def sample():
+        while not snapshots and not done.wait(SAMPLE_INTERVAL):
+            if tracemalloc.get_traced_memory()[0] >= peak * 0.8:
+                snapshots.append(tracemalloc.take_snapshot())
+
+    tracemalloc.start()
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    try:
+        result = step(db, context)
+    finally:
+        done.set()
+        sampler.join()
+        tracemalloc.stop()
+
+    del result
+    return snapshots[0] if snapshots else None
+
+
+def format_sites(snapshot, top: int):
+    """
+    Describe the sites allocating the most memory in a snapshot.
+
+    Parameters:
+    - snapshot (Snapshot): The snapshot.
+    - top (int): The number of sites.
+
+    Returns:
+    - list[str]: A line per site, with the size and number of the blocks it allocated.
+    """
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)])
+    lines = []
+
+    for statistic in snapshot.statistics('lineno')[:top]:
+        frame = statistic.traceback[0]
+        lines.append(f"        {statistic.size / 2 ** 20:7.1f} MiB  {statistic.count:>8} blocks  {frame.filename}:{frame.lineno}")
+
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.memory_profile", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 20_000, 40_000],
+                        help="Numbers of enrollments of the datasets (default: 10000 20000 40000).")
+    parser.add_argument("--top", type=int, default=3, help="Allocation sites listed per step, 0 for none (default: 3).")
+    parser.add_argument("--budget", action="append", default=[], metavar="STEP=BYTES",
+                        help="Budget of a step in bytes per enrollment, may be repeated.")
+    parser.add_argument("--steps", nargs="+", choices=list(STEPS), help="Steps to profile (default: all).")
+    args = parser.parse_args()
+
+    budgets = {name: budget for name, (_, budget) in STEPS.items()}
+    for option in args.budget:
+        name, _, value = option.partition('=')
+        if name not in STEPS or not value.isdigit():
+            sys.exit(f"Invalid budget '{option}'. Use STEP=BYTES with a step among: {', '.join(STEPS)}")
+        budgets[name] = int(value)
+
+    # Imported before profiling, so the first view doesn't count it
+    import prettytable  # noqa: F401
+
+    sink = Sink()
+    utilities.screen = Screen(stream=sink)
+    failures = []
+
+    for size in sorted(args.sizes):
+        with tempfile.TemporaryDirectory() as folder_path:
+            generate_dataset(folder_path, users=size // 20, courses=size // 200, enrollments=size)
+            db, context = open_database(folder_path)
+            print(f"Enrollments: {size} (indexes: {db.memory_usage() / 2 ** 20:.1f} MiB)")
+
+            for name in args.steps or STEPS:
+                step = STEPS[name][0]
+                errors = len(sink.errors)
+                peak = measure_peak(step, db, context)
+                budget = BASE_BUDGET + budgets[name] * size
+                print(f"    {name}: peak {peak / 2 ** 20:.1f} MiB ({peak / size:.0f} B per enrollment, "
+                      f"budget {budget / 2 ** 20:.1f} MiB)")
+
+                if args.top:
+                    snapshot = snapshot_peak(step, db, context, peak)
+                    if snapshot is not None:
+                        print("\n".join(format_sites(snapshot, args.top)))
+                    else:
+                        print("        (the peak was too brief to sample)")
+
+                if len(sink.errors) > errors:
+                    failures.append(f"{name} failed with {size} enrollments: {sink.errors[-1]}")
+                if peak > budget:
+                    failures.append(f"{name} peaked at {peak / 2 ** 20:.1f} MiB with {size} enrollments, "
+                                    f"over its {budget / 2 ** 20:.1f} MiB budget")
+
+            db.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
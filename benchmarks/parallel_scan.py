@@ -0,0 +1,64 @@
+"""
+Measure the speedup of parallel chunked scans over a sequential scan of one large enrollments file.
+
+Usage: python -m benchmarks.parallel_scan [enrollments]
+"""
+import os
+import sys
+import time
+import tempfile
+import classes.database as database_class
+from benchmarks.datasets import dataset_size, generate_dataset
+
+
+def time_query(db, user_id: str, repeats=3):
+    """
+    Time the best of several enrollment queries by user id.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - user_id (str): The user ID to query.
+    - repeats (int): Optional. The number of times to run the query.
+
+    Returns:
+    - float: The fastest run in seconds.
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        db.query_enrollments(user_id=user_id)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings)
+
+
+def main():
+    enrollments = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cpus = os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as folder_path:
+        db = generate_dataset(folder_path, users=enrollments // 20,
+                              courses=enrollments // 200, enrollments=enrollments)
+        user_id = db.read_users()[-1].id
+
+        print(f"Enrollments: {enrollments} ({dataset_size(folder_path) / 2 ** 20:.0f} MiB), CPUs: {cpus}")
+
+        sequential_db = database_class.Database(
+            folder_path=folder_path, parallel_scan_threshold=float('inf'))
+        sequential = time_query(sequential_db, user_id)
+        print(f"sequential: {sequential:.2f}s")
+
+        workers = 1
+        while workers <= cpus:
+            parallel_db = database_class.Database(
+                folder_path=folder_path, parallel_scan_threshold=0, max_workers=workers)
+            # Build the index and start the pool before timing
+            time_query(parallel_db, user_id, repeats=1)
+            parallel = time_query(parallel_db, user_id)
+            print(f"{workers} worker(s): {parallel:.2f}s, speedup {sequential / parallel:.1f}x")
+            parallel_db._get_executor().shutdown()
+            workers *= 2
+
+
+if __name__ == "__main__":
+    main()
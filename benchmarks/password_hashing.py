@@ -0,0 +1,58 @@
+"""
+Measure login throughput, the password verifications per second, at several password hash costs.
+
+Usage: python -m benchmarks.password_hashing [logins] [clients]
+"""
+import sys
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import utils.utilities as utilities
+
+SETTINGS = [
+    ('scrypt', 2 ** 12),
+    ('scrypt', 2 ** 14),
+    ('scrypt', 2 ** 15),
+    ('pbkdf2_sha256', 100_000),
+    ('pbkdf2_sha256', 600_000),
+]
+
+
+def time_logins(hashed_password: str, logins: int, clients: int):
+    """
+    Time concurrent password verifications, each client thread logging in one after another.
+
+    Parameters:
+    - hashed_password (str): The stored hash to verify against.
+    - logins (int): The total number of verifications.
+    - clients (int): The number of threads logging in at the same time.
+
+    Returns:
+    - float: The number of verifications per second.
+    """
+    def login(_):
+        return utilities.verify_password("correct horse battery staple", hashed_password)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as clients_pool:
+        assert all(clients_pool.map(login, range(logins)))
+
+    return logins / (time.perf_counter() - start)
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    print(f"Logins: {logins}, concurrent clients: {clients}, password workers: {utilities.PASSWORD_WORKERS}")
+
+    legacy = hashlib.sha256("correct horse battery staple".encode('utf-8')).hexdigest()
+    print(f"{'legacy sha256':>24}: {time_logins(legacy, logins * 100, clients):10.0f} logins/s")
+
+    for algorithm, cost in SETTINGS:
+        hashed_password = utilities.hash_password("correct horse battery staple", algorithm, cost)
+        print(f"{f'{algorithm} {cost}':>24}: {time_logins(hashed_password, logins, clients):10.1f} logins/s")
+
+
+if __name__ == "__main__":
+    main()
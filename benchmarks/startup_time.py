@@ -0,0 +1,71 @@
+"""
+Measure the import time of the application entry points with `python -X importtime`, and
+fail if it exceeds a budget or if a module meant to load on first use is imported at startup.
+
+Usage: python -m benchmarks.startup_time [runs]
+"""
+import os
+import sys
+import subprocess
+
+# Entry points, the time their imports may take in milliseconds, and the modules
+# only some actions need, which they must not import at startup
+ENTRY_POINTS = {
+    'main': (80, ['prettytable', 'multiprocessing', 'concurrent.futures', 'argparse', 'uuid', 'utils.external_sort', 'classes.integrity', 'classes.block_table']),
+    'utils.cli': (100, ['prettytable', 'multiprocessing', 'concurrent.futures', 'uuid', 'utils.external_sort', 'classes.integrity', 'classes.block_table']),
+}
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str):
+    """
+    Import a module in a fresh interpreter and read its -X importtime report.
+
+    Parameters:
+    - module (str): The module to import.
+
+    Returns:
+    - dict[str, tuple[int, int]]: The self and cumulative import time of every imported module, in microseconds.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT_PATH, capture_output=True, text=True, check=True)
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_time), int(cumulative))
+
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    failures = []
+
+    for module, (budget, deferred_modules) in ENTRY_POINTS.items():
+        # The fastest run is the least disturbed by other processes and a cold disk cache
+        times = min((import_times(module) for _ in range(runs)), key=lambda times: times[module][1])
+        total = times[module][1] / 1000
+
+        print(f"{module}: {total:.1f} ms (budget {budget:.0f} ms)")
+        for name, (self_time, _) in sorted(times.items(), key=lambda item: -item[1][0])[:5]:
+            print(f"    {name}: {self_time / 1000:.1f} ms")
+
+        if total > budget:
+            failures.append(f"{module} took {total:.1f} ms to import, over its {budget:.0f} ms budget")
+
+        for name in deferred_modules:
+            if name in times:
+                failures.append(f"{module} imports {name} at startup")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
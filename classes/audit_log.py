@@ -0,0 +1,148 @@
+import os
+import json
+import queue
+import atexit
+import threading
+from utils.utilities import get_current_datetime
+
+# Put on the queue by close, stops the writer once every event before it was written
+_STOP = object()
+
+
+class AuditLog:
+    def __init__(self, file_path: str, max_bytes=10 * 2 ** 20, backup_count=5, queue_size=1024, batch_size=256):
+        """
+        Initialize an AuditLog object, an append-only JSON Lines log of who did what.
+
+        Events are queued and written by a background thread, which writes every event
+        queued meanwhile in one batch and syncs it to disk once. Recording an event
+        therefore costs a queue insertion instead of a disk sync. Once queue_size events
+        are waiting, record blocks until the writer catches up, so a slow disk slows down
+        the actions rather than dropping events or growing memory. Events still queued are
+        written when the program exits.
+
+        The log is rotated once it passes max_bytes: audit.jsonl becomes audit.jsonl.1,
+        audit.jsonl.1 becomes audit.jsonl.2, and so on up to backup_count files.
+
+        Parameters:
+        - file_path (str): The path of the log file.
+        - max_bytes (int): Optional. Size in bytes from which the log is rotated, 0 to never rotate.
+        - backup_count (int): Optional. Number of rotated files kept.
+        - queue_size (int): Optional. Number of events that may wait for the writer.
+        - batch_size (int): Optional. Maximum number of events written at once.
+        """
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        # The last error of the writer, e.g. a full disk. Events of a failed batch are lost.
+        self.error = None
+        self._thread = None
+        # Writes the events still queued at exit, whether or not the writer was restarted since
+        atexit.register(self.close)
+
+    def record(self, action: str, actor: str, outcome='success', **details):
+        """
+        Queue an event, waiting only if the queue is full.
+
+        Parameters:
+        - action (str): What was done, e.g. 'create_user'.
+        - actor (str): The username of who did it.
+        - outcome (str): Optional. 'success' or 'failure'.
+        - details: Optional. JSON serializable fields of the event, never passwords.
+        """
+        self._start()
+        self.queue.put({'time': get_current_datetime(), 'action': action,
+                        'actor': actor, 'outcome': outcome, **details})
+
+    def flush(self):
+        """
+        Wait until every event queued so far was written to disk.
+        """
+        if self._thread is not None:
+            self.queue.join()
+
+    def close(self):
+        """
+        Write the queued events and stop the writer. Recording another event starts it again.
+        """
+        with self.lock:
+            thread, self._thread = self._thread, None
+
+        if thread is not None and thread.is_alive():
+            self.queue.put(_STOP)
+            thread.join()
+
+    def _start(self):
+        """
+        Start the writer on the first event.
+        """
+        if self._thread is not None:
+            return
+
+        with self.lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stopped = False
+
+        while not stopped:
+            events = [self.queue.get()]
+
+            # Events queued while the previous batch was written go into the next one
+            while len(events) < self.batch_size:
+                try:
+                    events.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if _STOP in events:
+                stopped = True
+                events = [event for event in events if event is not _STOP]
+
+            try:
+                if events:
+                    self._write(events)
+                self.error = None
+            except (OSError, TypeError, ValueError) as e:
+                self.error = e
+            finally:
+                for _ in range(len(events) + stopped):
+                    self.queue.task_done()
+
+    def _write(self, events: list[dict]):
+        """
+        Append a batch of events to the log and sync it to disk.
+
+        Parameters:
+        - events (list[dict]): The events.
+        """
+        data = ''.join(json.dumps(event, default=str) + '\n' for event in events).encode('utf-8')
+
+        if self.max_bytes and os.path.exists(self.file_path) and \
+                os.path.getsize(self.file_path) + len(data) > self.max_bytes:
+            self._rotate()
+
+        os.makedirs(os.path.dirname(self.file_path) or '.', exist_ok=True)
+
+        with open(self.file_path, 'ab') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _rotate(self):
+        """
+        Shift the rotated files by one and start a new log.
+        """
+        for index in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.file_path}.{index}"):
+                os.replace(f"{self.file_path}.{index}", f"{self.file_path}.{index + 1}")
+
+        if self.backup_count:
+            os.replace(self.file_path, f"{self.file_path}.1")
+        else:
+            os.remove(self.file_path)
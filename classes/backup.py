@@ -0,0 +1,319 @@
+import os
+import re
+import gzip
+import json
+import shutil
+import hashlib
+from contextlib import ExitStack
+from classes.table_file import FileLock
+from utils.utilities import get_current_datetime
+
+# Bytes before the backed up offset whose checksum tells an appended file from a rewritten one
+CHECKSUM_WINDOW = 64 * 2 ** 10
+# Files of a database folder that are backed up, temporary files of rewrites are skipped
+BACKUP_SUFFIXES = ('.csv', '.json', '.blk')
+# Enrollment shards, whose lock writers hold while they append to other tables
+SHARD_PATTERN = re.compile(r'enrollments(?:\.(\d+))?\.csv')
+
+
+def get_lock_order(name: str):
+    """
+    Get the position of a table in the order backups take the locks in. Writers hold the
+    lock of an enrollment shard while they append to the waitlist and the change feed, so
+    shards come first, in the order reshard_enrollments takes them, and the change feed last.
+
+    Parameters:
+    - name (str): The file name of the table.
+
+    Returns:
+    - tuple: The sort key.
+    """
+    match = SHARD_PATTERN.fullmatch(name)
+    if match:
+        return (0, int(match.group(1) or 0), name)
+
+    return (2 if name == 'changes.csv' else 1, 0, name)
+
+
+def get_checksum(file, end: int):
+    """
+    Get the checksum of the bytes of a file just before an offset.
+
+    Parameters:
+    - file (BinaryIO): The open file.
+    - end (int): The offset.
+
+    Returns:
+    - str: The SHA-256 hex digest of the last CHECKSUM_WINDOW bytes before end.
+    """
+    start = max(0, end - CHECKSUM_WINDOW)
+    file.seek(start)
+    return hashlib.sha256(file.read(end - start)).hexdigest()
+
+
+def get_record_end(file, size: int):
+    """
+    Get the end of the last complete line of a file, so a record still being appended
+    isn't backed up halfway.
+
+    Parameters:
+    - file (BinaryIO): The open file.
+    - size (int): The size of the file.
+
+    Returns:
+    - int: The offset following the last line ending before size, 0 if there is none.
+    """
+    end = size
+
+    while end > 0:
+        start = max(0, end - CHECKSUM_WINDOW)
+        file.seek(start)
+        position = file.read(end - start).rfind(b'\n')
+        if position >= 0:
+            return start + position + 1
+        end = start
+
+    return 0
+
+
+def copy_range(source, target, start: int, end: int):
+    """
+    Copy a byte range of a file to the position of another file, a block at a time.
+
+    Parameters:
+    - source (BinaryIO): The open file to copy from.
+    - target (BinaryIO): The open file to copy to.
+    - start (int): The offset of the first byte to copy.
+    - end (int): The offset to stop copying at.
+
+    Raises:
+    - ValueError: If the file shrank below end while it was copied.
+    """
+    source.seek(start)
+    remaining = end - start
+
+    while remaining:
+        block = source.read(min(remaining, 2 ** 20))
+        if not block:
+            raise ValueError(f"Invalid copy. '{source.name}' shrank while it was copied.")
+        target.write(block)
+        remaining -= len(block)
+
+
+class BackupStore:
+    def __init__(self, backup_path: str):
+        """
+        Initialize a BackupStore object, a folder of incremental backups of a database folder.
+
+        Tables only grow by appends, so each backup copies only the bytes appended to each
+        file since the previous backup into a compressed segment. A file is copied in full
+        the first time, and again once it shrank or the bytes before its last backed up
+        offset changed, e.g. after a compaction, a migration or a reshard.
+
+        Every file of a backup is taken at the same point in time: the file locks of all the
+        tables are held while the files are opened and their sizes read, so a backup never
+        pairs an enrollment with a change feed, waitlist or schema written before or after it.
+
+        Parameters:
+        - backup_path (str): The folder of the backups.
+        """
+        self.backup_path = backup_path
+        self.manifest_file = os.path.join(backup_path, 'manifest.json')
+        self.segments_path = os.path.join(backup_path, 'segments')
+
+    def _read_manifest(self):
+        """
+        Read the list of backups.
+
+        Returns:
+        - dict: The manifest, with the list of backups and the last backed up offset and checksum of every file.
+        """
+        try:
+            with open(self.manifest_file, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'backups': [], 'files': {}}
+
+    def _write_manifest(self, manifest: dict):
+        """
+        Atomically replace the list of backups.
+
+        Parameters:
+        - manifest (dict): The manifest.
+        """
+        temp_path = f"{self.manifest_file}.tmp"
+
+        with open(temp_path, 'w') as file:
+            json.dump(manifest, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, self.manifest_file)
+
+    def get_backups(self):
+        """
+        Get the backups, oldest first.
+
+        Returns:
+        - list[dict]: The number (id), time (created_at), and segments (segments) of each backup.
+        """
+        return self._read_manifest()['backups']
+
+    def _write_segment(self, source, start: int, end: int, name: str):
+        """
+        Copy a byte range of a file into a compressed segment.
+
+        Parameters:
+        - source (BinaryIO): The open file.
+        - start (int): The offset of the first byte to copy.
+        - end (int): The offset to stop copying at.
+        - name (str): The file name of the segment.
+        """
+        with gzip.open(os.path.join(self.segments_path, name), 'wb') as target:
+            copy_range(source, target, start, end)
+            target.flush()
+            os.fsync(target.fileobj.fileno())
+
+    def _get_file_names(self, folder_path: str):
+        """
+        Get the names of the files of a database folder that are backed up.
+
+        Parameters:
+        - folder_path (str): The database folder.
+
+        Returns:
+        - list[str]: The file names, sorted.
+        """
+        return sorted(entry.name for entry in os.scandir(folder_path)
+                      if entry.is_file() and entry.name.endswith(BACKUP_SUFFIXES))
+
+    def _snapshot(self, folder_path: str, stack: ExitStack):
+        """
+        Open every backed up file of a database folder at one point in time, holding the file
+        lock of every table meanwhile. Appends only add bytes past the sizes read and rewrites
+        replace files, so the open files keep the snapshot once the locks are released.
+
+        Parameters:
+        - folder_path (str): The database folder.
+        - stack (ExitStack): Closes the files once they are copied.
+
+        Returns:
+        - list[tuple[str, BinaryIO, int]]: The name, open file and size of each file.
+        """
+        while True:
+            names = self._get_file_names(folder_path)
+
+            with ExitStack() as locks:
+                for name in sorted((name for name in names if name.endswith('.csv')), key=get_lock_order):
+                    locks.enter_context(FileLock(os.path.join(folder_path, f"{name}.lock")))
+
+                # A reshard may have added or removed shards before its locks were released
+                if self._get_file_names(folder_path) != names:
+                    continue
+
+                files = []
+                for name in names:
+                    source = stack.enter_context(open(os.path.join(folder_path, name), 'rb'))
+                    files.append((name, source, os.fstat(source.fileno()).st_size))
+
+                return files
+
+    def backup(self, folder_path: str):
+        """
+        Back up the bytes written to a database folder since the previous backup. Every file
+        is backed up as it was at one point in time, see BackupStore.
+
+        Parameters:
+        - folder_path (str): The database folder.
+
+        Returns:
+        - dict: The new backup, see get_backups.
+        """
+        os.makedirs(self.segments_path, exist_ok=True)
+        manifest = self._read_manifest()
+        id = manifest['backups'][-1]['id'] + 1 if manifest['backups'] else 1
+        backup = {'id': id, 'created_at': get_current_datetime(), 'files': {}, 'bytes_copied': 0}
+
+        with ExitStack() as stack:
+            for name, source, end in self._snapshot(folder_path, stack):
+                # Tables stop at their last complete record, other files are replaced whole
+                if name.endswith('.csv'):
+                    end = get_record_end(source, end)
+                state = manifest['files'].get(name)
+
+                # Appended files still hold the same bytes before the backed up offset
+                if state and state['size'] <= end and get_checksum(source, state['size']) == state['checksum']:
+                    kind, start = 'tail', state['size']
+                else:
+                    kind, start = 'full', 0
+
+                segment = None
+                if end > start or kind == 'full':
+                    segment = f"{id:08d}.{name}.{kind}.gz"
+                    self._write_segment(source, start, end, segment)
+                    backup['bytes_copied'] += end - start
+
+                backup['files'][name] = {'segment': segment, 'kind': kind, 'start': start, 'end': end}
+                manifest['files'][name] = {'size': end, 'checksum': get_checksum(source, end)}
+
+        # Files deleted since, e.g. by a reshard, are left out of this backup and copied in full if they return
+        for name in set(manifest['files']) - set(backup['files']):
+            del manifest['files'][name]
+
+        manifest['backups'].append(backup)
+        self._write_manifest(manifest)
+
+        return backup
+
+    def restore(self, folder_path: str, id=None):
+        """
+        Rebuild a database folder as it was at a backup.
+
+        Parameters:
+        - folder_path (str): The folder to restore to, which must be empty or not exist.
+        - id (int): Optional. The number of the backup, the latest by default.
+
+        Returns:
+        - dict: The restored backup, see get_backups.
+
+        Raises:
+        - ValueError: If the folder isn't empty or there is no such backup.
+        """
+        backups = self.get_backups()
+
+        if id is None and backups:
+            id = backups[-1]['id']
+
+        position = next((index for index, backup in enumerate(backups) if backup['id'] == id), None)
+
+        if position is None:
+            raise ValueError(
+                "Invalid backup. Use the number of an existing backup.")
+
+        if os.path.isdir(folder_path) and os.listdir(folder_path):
+            raise ValueError(
+                "Invalid folder. Backups must be restored to an empty folder.")
+
+        os.makedirs(folder_path, exist_ok=True)
+
+        for name in backups[position]['files']:
+            # The latest full copy up to the backup, followed by the tails appended after it
+            segments = []
+            for backup in reversed(backups[:position + 1]):
+                file = backup['files'].get(name)
+                if file is None:
+                    break
+                if file['segment']:
+                    segments.append(file['segment'])
+                if file['kind'] == 'full':
+                    break
+
+            with open(os.path.join(folder_path, name), 'wb') as target:
+                for segment in reversed(segments):
+                    with gzip.open(os.path.join(self.segments_path, segment), 'rb') as source:
+                        shutil.copyfileobj(source, target, 2 ** 20)
+
+                target.flush()
+                os.fsync(target.fileno())
+
+        return backups[position]
@@ -0,0 +1,214 @@
+import io
+import os
+import csv
+import json
+import lzma
+import zlib
+import struct
+from classes.table_file import TableFile
+
+MAGIC = b'MCBLOCK1'
+FOOTER = struct.Struct('<Q8s')
+
+CODECS = {
+    'zlib': (zlib.compress, zlib.decompress),
+    'lzma': (lzma.compress, lzma.decompress),
+}
+
+
+class BlockTable:
+    def __init__(self, file_path: str):
+        """
+        Initialize a BlockTable object, a read-only table stored as compressed blocks of rows.
+
+        The file holds the compressed blocks followed by a JSON block index with the
+        offset, length, row count and min/max id of every block, the length of that
+        index and a magic number.
+
+        Parameters:
+        - file_path (str): The path of the block file.
+
+        Raises:
+        - ValueError: If the file is not a block file.
+        """
+        self.file_path = file_path
+
+        with open(file_path, 'rb') as file:
+            file.seek(-FOOTER.size, os.SEEK_END)
+            index_length, magic = FOOTER.unpack(file.read(FOOTER.size))
+
+            if magic != MAGIC:
+                raise ValueError(f"'{file_path}' is not a block file.")
+
+            file.seek(-FOOTER.size - index_length, os.SEEK_END)
+            index = json.loads(file.read(index_length))
+
+        self.codec = index['codec']
+        self.header = index['header']
+        self.block_rows = index['block_rows']
+        self.blocks = index['blocks']
+        self._decompress = CODECS[self.codec][1]
+
+    def __len__(self):
+        return sum(block['rows'] for block in self.blocks)
+
+    def _read_block(self, file, block: dict):
+        """
+        Read and decompress a single block.
+
+        Parameters:
+        - file (BinaryIO): The open block file.
+        - block (dict): The block index entry.
+
+        Returns:
+        - list[dict]: The rows of the block.
+        """
+        file.seek(block['offset'])
+        text = self._decompress(file.read(block['length'])).decode('utf-8')
+        return [dict(zip(self.header, fields)) for fields in csv.reader(io.StringIO(text, newline=''))]
+
+    def iter_rows(self):
+        """
+        Read every row, decompressing one block at a time.
+
+        Yields:
+        - dict: A dictionary for each row.
+        """
+        with open(self.file_path, 'rb') as file:
+            for block in self.blocks:
+                yield from self._read_block(file, block)
+
+    def read(self, id: str):
+        """
+        Read a row by id, decompressing only the blocks whose id range holds it.
+
+        Parameters:
+        - id (str): The id of the row.
+
+        Returns:
+        - dict or None: The row if it exists, None otherwise.
+        """
+        with open(self.file_path, 'rb') as file:
+            for block in self.blocks:
+                if block['min_id'] <= id <= block['max_id']:
+                    for row in self._read_block(file, block):
+                        if row['id'] == id:
+                            return row
+
+    def read_row(self, row_number: int):
+        """
+        Read a row by its position in the table, decompressing a single block.
+
+        Parameters:
+        - row_number (int): The zero-based position of the row.
+
+        Returns:
+        - dict or None: The row if it exists, None otherwise.
+        """
+        block_number, position = divmod(row_number, self.block_rows)
+
+        if row_number < 0 or block_number >= len(self.blocks):
+            return None
+
+        with open(self.file_path, 'rb') as file:
+            rows = self._read_block(file, self.blocks[block_number])
+
+        return rows[position] if position < len(rows) else None
+
+    @staticmethod
+    def write(file_path: str, header: list[str], rows, codec='zlib', block_rows=1024):
+        """
+        Write rows to a new block file, replacing it atomically.
+
+        Parameters:
+        - file_path (str): The path of the block file.
+        - header (list[str]): The field names of the rows.
+        - rows (Iterable[dict]): The rows to write.
+        - codec (str): Optional. The compression codec, zlib or lzma.
+        - block_rows (int): Optional. The number of rows per block.
+
+        Returns:
+        - BlockTable: The written table.
+
+        Raises:
+        - ValueError: If codec is invalid.
+        """
+        if codec not in CODECS:
+            raise ValueError(
+                f"Invalid codec. Allowed codecs: {', '.join(CODECS)}")
+
+        compress = CODECS[codec][0]
+        blocks = []
+        temp_path = f"{file_path}.tmp"
+
+        with open(temp_path, 'wb') as file:
+            def write_block(block: list[dict]):
+                buffer = io.StringIO(newline='')
+                writer = csv.DictWriter(buffer, fieldnames=header, extrasaction='ignore')
+                writer.writerows(block)
+                data = compress(buffer.getvalue().encode('utf-8'))
+                ids = [row['id'] for row in block]
+                blocks.append({'offset': file.tell(), 'length': len(data), 'rows': len(block),
+                               'min_id': min(ids), 'max_id': max(ids)})
+                file.write(data)
+
+            block = []
+            for row in rows:
+                block.append(row)
+                if len(block) == block_rows:
+                    write_block(block)
+                    block = []
+
+            if block:
+                write_block(block)
+
+            index = json.dumps({'codec': codec, 'header': header,
+                                'block_rows': block_rows, 'blocks': blocks}).encode('utf-8')
+            file.write(index)
+            file.write(FOOTER.pack(len(index), MAGIC))
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, file_path)
+
+        return BlockTable(file_path)
+
+
+def csv_to_blocks(csv_path: str, file_path: str, codec='zlib', block_rows=1024):
+    """
+    Convert a table CSV file to a block file, keeping only the latest version of every row.
+
+    Parameters:
+    - csv_path (str): The path of the CSV file.
+    - file_path (str): The path of the block file to write.
+    - codec (str): Optional. The compression codec, zlib or lzma.
+    - block_rows (int): Optional. The number of rows per block.
+
+    Returns:
+    - BlockTable: The written table.
+    """
+    with open(csv_path, 'r', newline='') as file:
+        header = next(csv.reader(file))
+
+    table = TableFile(csv_path, header)
+
+    return BlockTable.write(file_path, table.refresh().header, table.live_records(), codec, block_rows)
+
+
+def blocks_to_csv(file_path: str, csv_path: str):
+    """
+    Convert a block file back to a table CSV file.
+
+    Parameters:
+    - file_path (str): The path of the block file.
+    - csv_path (str): The path of the CSV file to write.
+    """
+    table = BlockTable(file_path)
+    temp_path = f"{csv_path}.tmp"
+
+    with open(temp_path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=table.header)
+        writer.writeheader()
+        writer.writerows(table.iter_rows())
+
+    os.replace(temp_path, csv_path)
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import threading
+from classes.table_file import FileLock, encode_record, iter_records
+
+# Fields of the change log, the sequence number of an event is its byte offset in the file
+CHANGE_FIELD_NAMES = ['type', 'operation', 'id', 'created_at', 'data']
+
+
+class ChangeFeed:
+    def __init__(self, file_path: str, poll_interval=0.25):
+        """
+        Initialize a ChangeFeed object, an append-only log of write events.
+
+        Every event is a single line appended to the log, and its sequence number is the
+        byte offset of that line. Writers append under a lock shared across processes, so
+        sequence numbers increase with every event, whichever process wrote it. A cursor is
+        the sequence number to read from, so resuming from a saved cursor is a single
+        seek and reading costs only the events after it.
+
+        Parameters:
+        - file_path (str): The path of the log file, created on the first event.
+        - poll_interval (float): Optional. Seconds between checks for events written by other processes while long-polling.
+        """
+        self.file_path = file_path
+        self.poll_interval = poll_interval
+        # Taken by appends, so the header is written once and events are never interleaved
+        self.file_lock = FileLock(f"{file_path}.lock")
+        # Wakes up readers waiting for events written by this process
+        self.condition = threading.Condition()
+
+    def get_cursor(self):
+        """
+        Get the cursor following the last event, to read only events written from now on.
+
+        Returns:
+        - int: The cursor.
+        """
+        try:
+            return os.path.getsize(self.file_path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, record_type: str, operation: str, id: str, created_at: str, data=None):
+        """
+        Append an event to the log.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, or enrollment).
+        - operation (str): 'create', 'update' or 'delete'.
+        - id (str): The id of the record.
+        - created_at (str): The time of the event.
+        - data (dict): Optional. The written record, None for deletions.
+        """
+        record = encode_record([record_type, operation, id, created_at, json.dumps(data) if data is not None else ''])
+
+        with self.file_lock, open(self.file_path, 'ab') as file:
+            if file.tell() == 0:
+                record = encode_record(CHANGE_FIELD_NAMES) + record
+            file.write(record)
+
+        with self.condition:
+            self.condition.notify_all()
+
+    def _read(self, cursor: int, limit: int):
+        """
+        Read the events following a cursor.
+
+        Parameters:
+        - cursor (int): The cursor to read from.
+        - limit (int): The maximum number of events.
+
+        Returns:
+        - tuple[list[dict], int]: The events and the cursor following them.
+
+        Raises:
+        - ValueError: If cursor is not the position of an event in the log.
+        """
+        try:
+            file = open(self.file_path, 'rb')
+        except FileNotFoundError:
+            if cursor:
+                raise ValueError("Invalid cursor. The change log doesn't exist.")
+            return [], cursor
+
+        events = []
+
+        with file:
+            size = os.fstat(file.fileno()).st_size
+
+            if cursor < 0 or cursor > size:
+                raise ValueError(f"Invalid cursor. Cursors range from 0 to {size}.")
+
+            # Events are single lines, the JSON data never holds a raw line ending
+            if cursor:
+                file.seek(cursor - 1)
+                if file.read(1) != b'\n':
+                    raise ValueError("Invalid cursor. It doesn't point to the start of an event.")
+
+            for offset, end, fields in iter_records(file, cursor):
+                if offset > 0:
+                    record = dict(zip(CHANGE_FIELD_NAMES, fields))
+                    events.append({
+                        'seq': offset,
+                        **record,
+                        'data': json.loads(record['data']) if record['data'] else None,
+                    })
+                cursor = end
+
+                if len(events) >= limit:
+                    break
+
+        return events, cursor
+
+    def read(self, cursor=0, limit=100, timeout=0):
+        """
+        Read a batch of events following a cursor, waiting for new events if there are none.
+
+        Parameters:
+        - cursor (int): Optional. The cursor to read from, 0 for the start of the log.
+        - limit (int): Optional. The maximum number of events.
+        - timeout (float): Optional. Seconds to wait for an event when there are none yet, 0 to return at once.
+
+        Returns:
+        - tuple[list[dict], int]: The events, in sequence order, and the cursor to read the next batch from.
+
+        Raises:
+        - ValueError: If cursor or limit is invalid.
+        """
+        if limit < 1:
+            raise ValueError("Invalid limit. Read at least one event.")
+
+        events, cursor = self._read(cursor, limit)
+        deadline = time.monotonic() + timeout
+
+        while not events and (remaining := deadline - time.monotonic()) > 0:
+            with self.condition:
+                # Events of this process wake the reader up, those of others are found by polling
+                if self.get_cursor() == cursor:
+                    self.condition.wait(min(self.poll_interval, remaining))
+
+            events, cursor = self._read(cursor, limit)
+
+        return events, cursor
@@ -1,8 +1,12 @@
-import classes.database as database_module
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import classes.database as database_module
 
 
 class Course:
-    def __init__(self, id: str, name: str, description: str, creator: str, created_at: str, updated_at: str):
+    def __init__(self, id: str, name: str, description: str, creator: str, created_at: str, updated_at: str, capacity=''):
         """
         Initialize a Course object.
 
@@ -13,6 +17,7 @@ class Course:
         - creator (str): The name of admin that created the record.
         - created_at (str): The timestamp indicating when the course was created.
         - updated_at (str): The timestamp indicating when the course was last updated.
+        - capacity (str): Optional. The maximum number of enrollments, empty for no limit.
         """
         self.id = id
         self.name = name
@@ -20,6 +25,7 @@ class Course:
         self.creator = creator
         self.created_at = created_at
         self.updated_at = updated_at
+        self.capacity = capacity
 
     def __str__(self):
         """
@@ -40,10 +46,10 @@ class Course:
         Returns:
         - list[Student]: A list of students enrolled to the course.
         """
-        enrollments = db.query_enrollments(course_id=self.id)
-
         students = []
-        for enrollment in enrollments:
+
+        # Point reads seek straight to each user, instead of scanning every user for one course
+        for enrollment in db.query_enrollments(course_id=self.id):
             student = db.read_user(id=enrollment.user_id)
             if student:
                 students.append(student)
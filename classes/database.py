@@ -1,32 +1,131 @@
 import os
+import gc
 import csv
+import sys
+import zlib
+import heapq
+import shutil
+import threading
+from contextlib import ExitStack
+from datetime import datetime
+from itertools import chain, islice, repeat
 import classes.course as course_class
 import classes.enrollment as enrollment_class
 import classes.user as user_class
+from classes.change_feed import ChangeFeed
+from classes.migration import get_migrations, get_schema_version, migrate_table, read_schema_versions, write_schema_versions
+from classes.partition import (PARTITIONS_FILE, TERM_PATTERN, get_key_range, get_partition_file_name, iter_partition_rows, overlaps,
+                               read_partitions, write_partitions)
+from classes.query import And, CountIndex, Eq, QueryPlan, SecondaryIndex, to_predicate
+from classes.table_file import TableFile, estimate_dict_size, scan_chunk, scan_live_records
 from utils.utilities import get_current_datetime, get_unique_id, hash_password
 
 
+class CourseFullError(ValueError):
+    """Exception raised when enrolling to a course that has no seat left."""
+    pass
+
+
 class Database:
-    def __init__(self, folder_path='data'):
+    def __init__(self, folder_path='data', compaction_threshold=0.5, compaction_min_rows=1000,
+                 enrollment_shards=None, max_workers=None, parallel_scan_threshold=64 * 2 ** 20, executor=None, indexed_fields=None, read_only=False):
         """
-        Initialize the Database object with file paths for users, courses, and enrollments.
+        Initialize the Database object with file paths for users, courses, enrollments, and waitlists.
 
         Parameters:
         - folder_path (str): Folder path to store all csv files
+        - compaction_threshold (float): Optional. Share of dead rows in a file that triggers a compaction.
+        - compaction_min_rows (int): Optional. Minimum number of rows in a file before it is compacted.
+        - enrollment_shards (int): Optional. Number of files to split enrollments into, defaults to the layout on disk.
+        - max_workers (int): Optional. Number of worker processes used for parallel scans.
+        - parallel_scan_threshold (int): Optional. File size in bytes from which scans are split across worker processes.
+        - executor (ProcessPoolExecutor): Optional. A process pool shared with other databases, used instead of starting one.
+        - indexed_fields (dict[str, list[str]]): Optional. Fields of each record type with a secondary index, usernames and the courses of waitlist entries by default.
+        - read_only (bool): Optional. Open the files of another copy, such as a replica, without creating or writing any file.
+
+        Raises:
+        - ValueError: If enrollment_shards doesn't match the layout of existing enrollments, or a read-only folder has no database.
         """
         self.folder_path = folder_path
         self.users_file = os.path.join(folder_path, 'users.csv')
         self.courses_file = os.path.join(folder_path, "courses.csv")
         self.enrollments_file = os.path.join(folder_path, "enrollments.csv")
+        self.waitlist_file = os.path.join(folder_path, "waitlist.csv")
+        self.changes_file = os.path.join(folder_path, "changes.csv")
+        self.schema_file = os.path.join(folder_path, "schema.json")
+        # Enrollments of past terms, moved out of the enrollment shards by close_term
+        self.partitions_file = os.path.join(folder_path, PARTITIONS_FILE)
+        self.enrollments_files = self._get_enrollments_layout(enrollment_shards)
         self.defualt_field_names = ['creator', 'created_at', 'updated_at']
         self.users_field_names = ['id', 'name', 'username',
                                   'password', 'role', *self.defualt_field_names]
+        # Capacity is the maximum number of enrollments, empty for no limit
         self.courses_field_names = ['id', 'name', 'description',
-                                    *self.defualt_field_names]
-        self.enrollments_field_names = ['id', 'user_id', 'username', 'course_id', 'course_name',
+                                    *self.defualt_field_names, 'capacity']
+        # Enrollments store only ids, usernames and course names are read through self._display_names
+        self.enrollments_field_names = ['id', 'user_id', 'course_id',
                                         *self.defualt_field_names]
-
-        self._check_and_create_files()
+        # Students waiting for a seat in a full course, promoted in creation order
+        self.waitlist_field_names = ['id', 'user_id', 'course_id',
+                                     *self.defualt_field_names]
+        # Columns whose values repeat across many rows, plus the ids they are
+        # joined on. Values read from these columns are interned so every row
+        # shares one object and joins can match keys by identity.
+        self.interned_field_names = {
+            self.users_file: ['id', 'role', 'creator'],
+            self.courses_file: ['id', 'creator'],
+            **{file_path: ['user_id', 'course_id', 'creator'] for file_path in self.enrollments_files},
+            self.waitlist_file: ['user_id', 'course_id', 'creator'],
+        }
+
+        self.compaction_threshold = compaction_threshold
+        self.compaction_min_rows = compaction_min_rows
+        self._compactions: dict[str, threading.Thread] = {}
+        self.max_workers = max_workers
+        self.parallel_scan_threshold = parallel_scan_threshold
+        self._executor = executor
+        self._owns_executor = executor is None
+        # Secondary indexes are built on first use, keyed by file path and field
+        self.indexed_fields = indexed_fields if indexed_fields is not None else {
+            'user': ['username'], 'waitlist': ['course_id']}
+        self._indexes: dict[tuple[str, str], SecondaryIndex] = {}
+        # Enrollments of each course, counted on first use and keyed by enrollment file
+        self._enrollment_counts: dict[str, CountIndex] = {}
+        # Migrations the rows of each file need when read, and the file identity they were found for
+        self._row_upgrades: dict[str, tuple[tuple, list | None]] = {}
+        self.read_only = read_only
+
+        if read_only:
+            self._check_files()
+        else:
+            self._check_and_create_files()
+
+        # Log of every write, read by other systems through read_changes
+        self.change_feed = ChangeFeed(self.changes_file)
+
+        self._tables = {
+            self.users_file: TableFile(self.users_file, self.users_field_names, read_only),
+            self.courses_file: TableFile(self.courses_file, self.courses_field_names, read_only),
+            **{file_path: TableFile(file_path, self.enrollments_field_names, read_only) for file_path in self.enrollments_files},
+            self.waitlist_file: TableFile(self.waitlist_file, self.waitlist_field_names, read_only),
+        }
+
+        # Cached id to name maps of users and courses. Entries are dropped as soon as the
+        # table index sees a new version of the record, whichever process wrote it.
+        self._display_names: dict[str, dict[str, str]] = {
+            self.users_file: {},
+            self.courses_file: {},
+        }
+        for file_path, names in self._display_names.items():
+            self._tables[file_path].listeners.append(
+                self._invalidate_display_name(names))
+
+        # Callables subscribed to changes of each record type, see subscribe
+        self._listeners: dict[str, list] = {
+            'user': [], 'course': [], 'enrollment': [], 'waitlist': []}
+        for record_type in self._listeners:
+            for file_path in self._get_file_paths(record_type):
+                self._watch_table(record_type, file_path)
 
     def _check_folder_path(self):
         # Create the folder if it doesn't exist
@@ -37,7 +136,7 @@ class Database:
         Check if the CSV files exist, and create them if they don't.
         """
         file_paths = [self.users_file,
-                      self.courses_file, self.enrollments_file]
+                      self.courses_file, *self.enrollments_files, self.waitlist_file]
 
         self._check_folder_path()
 
@@ -45,6 +144,119 @@ class Database:
             if not os.path.exists(file_path):
                 self._create_file_with_header(file_path)
 
+    def _check_files(self):
+        """
+        Check that the CSV files of a read-only database exist, without creating them.
+
+        Raises:
+        - ValueError: If a file is missing.
+        """
+        for file_path in [self.users_file, self.courses_file, *self.enrollments_files, self.waitlist_file]:
+            if not os.path.exists(file_path):
+                raise ValueError(
+                    f"Invalid folder. {file_path} doesn't exist, a read-only database doesn't create it.")
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError(
+                f"Invalid write. The database in {self.folder_path} is read-only, write to the primary.")
+
+    def _get_enrollments_file_paths(self, shards: int):
+        """
+        Get the enrollment file paths for a number of shards.
+
+        Parameters:
+        - shards (int): The number of shards, 1 keeps every enrollment in enrollments.csv.
+
+        Returns:
+        - list[str]: The enrollment file paths, indexed by shard.
+        """
+        if shards == 1:
+            return [self.enrollments_file]
+
+        return [os.path.join(self.folder_path, f"enrollments.{shard}.csv") for shard in range(shards)]
+
+    def _get_enrollments_layout(self, shards=None):
+        """
+        Get the enrollment file paths to use, checking them against the files on disk.
+
+        Parameters:
+        - shards (int): Optional. The requested number of shards.
+
+        Returns:
+        - list[str]: The enrollment file paths, indexed by shard.
+
+        Raises:
+        - ValueError: If shards doesn't match the layout of existing enrollments.
+        """
+        existing_shards = 0
+        while os.path.exists(os.path.join(self.folder_path, f"enrollments.{existing_shards}.csv")):
+            existing_shards += 1
+
+        if not existing_shards and os.path.exists(self.enrollments_file):
+            existing_shards = 1
+
+        if shards is None:
+            return self._get_enrollments_file_paths(existing_shards or 1)
+
+        if shards < 1:
+            raise ValueError("enrollment_shards must be at least 1.")
+
+        if existing_shards and existing_shards != shards:
+            raise ValueError(
+                f"Enrollments are stored in {existing_shards} shard(s). Use reshard_enrollments to change it.")
+
+        return self._get_enrollments_file_paths(shards)
+
+    def _get_enrollments_file(self, course_id: str):
+        """
+        Get the enrollment file holding the enrollments of a course.
+
+        Parameters:
+        - course_id (str): The course ID.
+
+        Returns:
+        - str: The path of the enrollment shard.
+        """
+        shard = zlib.crc32(course_id.encode('utf-8')) % len(self.enrollments_files)
+        return self.enrollments_files[shard]
+
+    def _get_executor(self):
+        """
+        Get the process pool used for parallel scans, starting it on first use.
+
+        Returns:
+        - ProcessPoolExecutor: The process pool.
+        """
+        if self._executor is None:
+            # Loading multiprocessing is slow, so it waits for the first parallel scan
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        return self._executor
+
+    def memory_usage(self):
+        """
+        Estimate the memory held by the table indexes, secondary indexes, enrollment counts and cached names.
+
+        Returns:
+        - int: The estimated size in bytes.
+        """
+        return sum(table.memory_usage() for table in self._tables.values()) + \
+            sum(index.memory_usage() for index in [*self._indexes.values(), *self._enrollment_counts.values()]) + \
+            sum(estimate_dict_size(names) for names in self._display_names.values())
+
+    def close(self):
+        """
+        Wait for background compactions and stop the process pool, unless it is shared.
+        """
+        for compaction in list(self._compactions.values()):
+            compaction.join()
+
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
     def _create_file_with_header(self, file_path: str):
         """
         Create a CSV file with the appropriate header.
@@ -63,12 +275,18 @@ class Database:
         elif 'enrollments' in file_path:
             field_names = self.enrollments_field_names
 
+        elif 'waitlist' in file_path:
+            field_names = self.waitlist_field_names
+
         with open(file_path, 'w', newline='') as file:
             writer = csv.DictWriter(file, fieldnames=field_names)
             writer.writeheader()
             if "users" in file_path:
                 self._create_super_admin()
 
+        # New files start with the current columns
+        self._set_schema_versions([file_path])
+
     def _create_super_admin(self):
         """
         Create a super admin with defualt info
@@ -88,240 +306,1898 @@ class Database:
                 writer.writeheader()
             writer.writerow(data)
 
-    def is_field_unique(self, record_type: str, field: str, value: str):
+    def _get_file_paths(self, record_type: str):
         """
-        Check if a particular field is unique for a given record type.
+        Get the CSV file paths for a record type.
 
         Parameters:
-        - record_type (str): The type of record (user, course, or enrollment).
-        - field (str): The field to check for uniqueness.
-        - value (str): The value to check for uniqueness.
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
 
         Returns:
-        - bool: True if the field is unique, False otherwise.
+        - list[str]: The paths of the CSV files.
 
         Raises:
         - ValueError: If record_type is invalid.
         """
-        if record_type not in ['user', 'course', 'enrollment']:
+        if record_type not in ['user', 'course', 'enrollment', 'waitlist']:
             raise ValueError(
-                "Invalid record type. Allowed types: user, course, enrollment")
+                "Invalid record type. Allowed types: user, course, enrollment, waitlist")
 
-        file_name = None
         if record_type == 'user':
-            file_name = self.users_file
-        elif record_type == 'course':
-            file_name = self.courses_file
-        elif record_type == 'enrollment':
-            file_name = self.enrollments_file
+            return [self.users_file]
 
-        if not file_name:
-            raise ValueError(f"Invalid record type '{record_type}'")
+        if record_type == 'course':
+            return [self.courses_file]
 
-        with open(file_name, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row[field] == value:
-                    return False
+        if record_type == 'waitlist':
+            return [self.waitlist_file]
 
-        return True
+        return self.enrollments_files
 
-    def is_enrollment_unique(self, user_id, course_id):
+    def _intern_row(self, file_path: str, row: dict):
         """
-        Check if an enrollment with the given user_id and course_id is unique.
+        Intern values of repeated columns in a row.
 
         Parameters:
-        - user_id (str): The user ID to check for uniqueness.
-        - course_id (str): The course ID to check for uniqueness.
+        - file_path (str): The path of the CSV file the row was read from.
+        - row (dict): The row to intern.
 
         Returns:
-        - bool: True if the enrollment is unique, False otherwise.
+        - dict: The row with interned values.
         """
-        with open(self.enrollments_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['user_id'] == user_id and row['course_id'] == course_id:
-                    return False
+        for field in self.interned_field_names.get(file_path, []):
+            value = row.get(field)
+            if value:
+                row[field] = sys.intern(value)
 
-        return True
+        return row
 
-    def read_users(self):
+    def _get_record_type(self, file_path: str):
         """
-        Read user records from the users CSV file.
+        Get the type of record stored in a CSV file.
+
+        Parameters:
+        - file_path (str): The path of the CSV file.
 
         Returns:
-        - list[User]: A list of either Admin or Student based on the role.
-          """
-        users: list[user_class.Admin | user_class.Student] = []
+        - str: The type of record (user, course, enrollment, or waitlist).
+        """
+        if file_path == self.users_file:
+            return 'user'
 
-        with open(self.users_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                user = user_class.User(**row)
-                users.append(user.to_admin_or_student())
+        if file_path == self.courses_file:
+            return 'course'
 
-        return users
+        if file_path == self.waitlist_file:
+            return 'waitlist'
 
-    def read_user(self, id="", username=""):
+        return 'enrollment'
+
+    def _get_field_names(self, record_type: str):
         """
-        Read a user record from the users CSV file based on id or username.
+        Get the current fields of a record type.
 
         Parameters:
-        - id (str): Optional. The user ID to filter by.
-        - username (str): Optional. The username to filter by.
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
 
         Returns:
-        - Admin, Student or None: Admin or Student record if a match is found, None otherwise.
+        - list[str]: The field names.
         """
-        if (not id and not username):
-            return None
+        return {'user': self.users_field_names, 'course': self.courses_field_names,
+                'enrollment': self.enrollments_field_names, 'waitlist': self.waitlist_field_names}[record_type]
 
-        with open(self.users_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['id'] == id or row['username'] == username:
-                    return user_class.User(**row).to_admin_or_student()
+    def _set_schema_versions(self, file_paths: list[str]):
+        """
+        Record that files have the current columns of their record type.
 
-    def write_user(self, user: dict):
+        Parameters:
+        - file_paths (list[str]): The paths of the CSV files.
         """
-        Write a user record to the users CSV file.
+        versions = read_schema_versions(self.schema_file)
+
+        for file_path in file_paths:
+            versions[os.path.basename(file_path)] = get_schema_version(self._get_record_type(file_path))
+
+        write_schema_versions(self.schema_file, versions)
+
+    def _get_row_upgrade(self, file_path: str, refresh=True):
+        """
+        Get the migrations the rows of a CSV file need to match the current fields. The
+        answer is kept until the file is replaced, e.g. once a migration is done.
 
         Parameters:
-        - user (dict): A dictionary representing a user record.
+        - file_path (str): The path of the CSV file.
+        - refresh (bool): Optional. Check the file for changes first, callers that just read it can skip it.
+
+        Returns:
+        - list[Migration] or None: The migrations to apply to every row, None if the rows already match.
+        """
+        table = self._tables[file_path]
+
+        with table.lock:
+            if refresh:
+                table.refresh()
+            identity, header = table.identity, table.header
+
+        cached = self._row_upgrades.get(file_path)
+        if cached and cached[0] == identity:
+            return cached[1]
+
+        record_type = self._get_record_type(file_path)
+        migrations = None
+
+        if header != self._get_field_names(record_type):
+            version = read_schema_versions(self.schema_file).get(os.path.basename(file_path), 0)
+            migrations = get_migrations(record_type, version)
+
+        self._row_upgrades[file_path] = (identity, migrations)
+
+        return migrations
+
+    def _upgrade_row(self, file_path: str, row: dict, migrations: list):
+        """
+        Upgrade a row of a file that isn't migrated yet to the current fields. Fields
+        the migrations don't know about are dropped and missing ones are left empty.
+
+        Parameters:
+        - file_path (str): The path of the CSV file the row was read from.
+        - row (dict): The row.
+        - migrations (list[Migration]): The migrations the file needs.
+
+        Returns:
+        - dict: The upgraded row.
+        """
+        for migration in migrations:
+            migration.upgrade_row(row)
+
+        return {field: row.get(field, '') for field in self._get_field_names(self._get_record_type(file_path))}
+
+    def migrate(self, record_type=None):
+        """
+        Apply the pending migrations of the tables of a record type, or of every table.
+
+        Each file is streamed through its migrations into a temporary file that atomically
+        replaces it, with bounded memory. Readers and writers keep working meanwhile, rows
+        of a file that isn't migrated yet are upgraded as they are read.
+
+        Parameters:
+        - record_type (str): Optional. The type of record (user, course, enrollment, or waitlist), every type by default.
+
+        Returns:
+        - list[tuple[str, int, int, int]]: The path, previous version, new version and number of rewritten records of each migrated file.
 
         Raises:
-        - ValueError: If username is not unique.
+        - ValueError: If record_type is invalid or the database is read-only.
         """
-        if (not self.is_field_unique('user', 'username', user['username'])):
-            raise ValueError("username must be unique")
+        self._check_writable()
+        migrated = []
 
-        with open(self.users_file, 'a', newline='') as file:
-            writer = csv.DictWriter(
-                file, fieldnames=self.users_field_names)
-            if file.tell() == 0:
-                writer.writeheader()
-            writer.writerow(user)
+        for file_path in [path for type in ([record_type] if record_type else ['user', 'course', 'enrollment', 'waitlist'])
+                          for path in self._get_file_paths(type)]:
+            type = self._get_record_type(file_path)
+            version = read_schema_versions(self.schema_file).get(os.path.basename(file_path), 0)
 
-    def read_courses(self):
+            if version >= get_schema_version(type):
+                continue
+
+            records = 0
+            # Files whose columns already match only need their version recorded
+            if self._get_row_upgrade(file_path) is not None:
+                records = migrate_table(self._tables[file_path], get_migrations(type, version))
+
+            self._set_schema_versions([file_path])
+            migrated.append((file_path, version, get_schema_version(type), records))
+
+        return migrated
+
+    def _read_rows(self, file_path: str):
         """
-        Read course records from the courses CSV file.
+        Read the latest version of every row from a CSV file, interning values of repeated columns.
+
+        Parameters:
+        - file_path (str): The path of the CSV file to read.
+
+        Yields:
+        - dict: A dictionary for each row in the file.
+        """
+        migrations = self._get_row_upgrade(file_path)
+
+        for row in self._tables[file_path].live_records():
+            if migrations is not None:
+                row = self._upgrade_row(file_path, row, migrations)
+            yield self._intern_row(file_path, row)
+
+    def _read_row(self, file_path: str, id: str):
+        """
+        Read the latest version of a row from a CSV file using the index.
+
+        Parameters:
+        - file_path (str): The path of the CSV file to read.
+        - id (str): The id of the row.
 
         Returns:
-        - list[Course]: A list of courses.
-          """
-        courses: list[course_class.Course] = []
+        - dict or None: The row if it exists, None otherwise.
+        """
+        row = self._tables[file_path].read(id)
 
-        with open(self.courses_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                course = course_class.Course(**row)
-                courses.append(course)
+        if row:
+            migrations = self._get_row_upgrade(file_path, refresh=False)
+            if migrations is not None:
+                row = self._upgrade_row(file_path, row, migrations)
+            return self._intern_row(file_path, row)
 
-        return courses
+    def _invalidate_display_name(self, names: dict[str, str]):
+        """
+        Create an index listener that drops cached names of changed records.
 
-    def read_course(self, id: str):
+        Parameters:
+        - names (dict[str, str]): The cached id to name map.
+
+        Returns:
+        - Callable: A listener taking the id of a changed record, or None when every record may have changed.
         """
-        Read a course record from the users CSV file based on id.
+        def invalidate(id):
+            if id is None:
+                names.clear()
+            else:
+                names.pop(id, None)
+
+        return invalidate
+
+    def _watch_table(self, record_type: str, file_path: str):
+        """
+        Forward changes seen by the index of a table to the subscribers of its record type.
 
         Parameters:
-        - id (str): The course ID to filter by.
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - file_path (str): The path of the CSV file.
+        """
+        listeners = self._listeners[record_type]
+
+        def notify(id):
+            for listener in listeners:
+                listener(id)
+
+        self._tables[file_path].listeners.append(notify)
+
+    def subscribe(self, record_type: str, listener):
+        """
+        Subscribe to changes of a record type, whichever process wrote them.
+
+        Listeners are called with the id of every record written, updated or deleted, or
+        with None when any record may have changed, e.g. after another process compacted the
+        file. They run while the table is locked, so they must be quick and must not use the
+        database. Changes are seen when the table is next read, or on refresh.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - listener (Callable): Called with the id of each changed record, or None.
+
+        Raises:
+        - ValueError: If record_type is invalid.
+        """
+        self._get_file_paths(record_type)
+        self._listeners[record_type].append(listener)
+
+    def unsubscribe(self, record_type: str, listener):
+        """
+        Stop notifying a listener of changes of a record type.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - listener (Callable): The subscribed listener.
+        """
+        self._listeners[record_type].remove(listener)
+
+    def get_version(self, *record_types: str):
+        """
+        Get the version of the data of record types. Any write to their files changes it,
+        whichever process made it, so it can key caches of data read from them.
+
+        Parameters:
+        - record_types (str): The types of record (user, course, enrollment, or waitlist).
 
         Returns:
-        - Course or None: Course record if a match is found, None otherwise.
+        - tuple: The version of every file of the record types.
+
+        Raises:
+        - ValueError: If a record type is invalid.
+        """
+        return tuple(self._tables[file_path].get_version()
+                     for record_type in record_types for file_path in self._get_file_paths(record_type))
+
+    def refresh(self, record_type: str):
         """
+        Catch up with changes written to the files of a record type since they were last
+        read, notifying subscribers. Only newly appended rows are read.
 
-        with open(self.courses_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if (row['id'] == id):
-                    return course_class.Course(**row)
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
 
-    def write_course(self, course: dict):
+        Raises:
+        - ValueError: If record_type is invalid.
         """
-        Write a course record to the users CSV file.
+        for file_path in self._get_file_paths(record_type):
+            self._tables[file_path].refresh()
+
+    def _get_display_names(self, file_path: str):
+        """
+        Get the cached id to name map of a table, up to date with its file.
 
         Parameters:
-        - course (dict): A dictionary representing a course record.
+        - file_path (str): The path of the users or courses CSV file.
+
+        Returns:
+        - dict[str, str]: The cached id to name map.
         """
-        with open(self.courses_file, 'a', newline='') as file:
-            writer = csv.DictWriter(
-                file, fieldnames=self.courses_field_names)
-            if file.tell() == 0:
-                writer.writeheader()
-            writer.writerow(course)
+        # Refreshing the index invalidates names of records changed since the last read
+        self._tables[file_path].refresh()
+        return self._display_names[file_path]
 
-    def read_enrollments(self):
+    def _get_display_name(self, names: dict[str, str], file_path: str, field: str, id: str):
         """
-        Read enrollment records from the courses CSV file.
+        Get the name of a record, reading it through the cache.
+
+        Parameters:
+        - names (dict[str, str]): The cached id to name map.
+        - file_path (str): The path of the users or courses CSV file.
+        - field (str): The field holding the name.
+        - id (str): The id of the record.
 
         Returns:
-        - list[Enrollment]: A list of enrollments.
-          """
-        enrollments: list[enrollment_class.Enrollment] = []
+        - str: The name of the record, or an empty string if it doesn't exist.
+        """
+        name = names.get(id)
 
-        with open(self.enrollments_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                enrollment = enrollment_class.Enrollment(**row)
-                enrollments.append(enrollment)
+        if name is None:
+            row = self._read_row(file_path, id)
+            name = names[id] = row[field] if row else ''
 
-        return enrollments
+        return name
 
-    def read_enrollment(self, id: str):
+    def _scan_enrollments(self, row_filter=None):
         """
-        Read a enrollment record from the users CSV file based on id.
+        Read the latest version of enrollment rows from every shard. Shards are
+        scanned in parallel by the process pool and merged in creation order.
 
         Parameters:
-        - id (str): The enrollment ID to filter by.
+        - row_filter (Callable): Optional. A picklable callable that returns True for the rows to keep.
 
         Returns:
-        - Enrollment or None: Enrollment record if a match is found, None otherwise.
+        - list[dict]: The matching enrollment rows.
         """
-        with open(self.enrollments_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if (row['id'] == id):
-                    return enrollment_class.Enrollment(**row)
+        if len(self.enrollments_files) == 1:
+            return list(self._scan(self.enrollments_file, row_filter))
+
+        # Workers read raw rows, so shards that still need migrating are read here
+        if any(self._get_row_upgrade(file_path) is not None for file_path in self.enrollments_files):
+            return list(heapq.merge(*(self._scan(file_path, row_filter) for file_path in self.enrollments_files),
+                                    key=lambda row: row['created_at']))
+
+        results = self._get_executor().map(
+            scan_live_records, self.enrollments_files, repeat(self.enrollments_field_names), repeat(row_filter))
 
-    def query_enrollments(self, user_id="", username="", course_id=""):
+        return [self._intern_row(self.enrollments_files[0], row)
+                for row in heapq.merge(*results, key=lambda row: row['created_at'])]
+
+    def _find_enrollments_file(self, id: str):
         """
-        Read enrollment records from the enrollments CSV file based on user_id, username, or course_id.
+        Find the enrollment shard holding an enrollment, using the shard indexes.
 
         Parameters:
-        - user_id (str): Optional. The user ID to filter by.
-        - username (str): Optional. The username to filter by.
-        - course_id (str): Optional. The course ID to filter by.
+        - id (str): The enrollment ID.
 
         Returns:
-        - list[Enrollment]: A list of Enrollment records that match the given criteria.
+        - str or None: The path of the enrollment shard if the enrollment exists, None otherwise.
         """
-        enrollments: list[enrollment_class.Enrollment] = []
+        for file_path in self.enrollments_files:
+            if id in self._tables[file_path]:
+                return file_path
 
-        with open(self.enrollments_file, 'r', newline='') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['user_id'] == user_id or row['username'] == username or row['course_id'] == course_id:
-                    enrollment = enrollment_class.Enrollment(**row)
-                    enrollments.append(enrollment)
+    def reshard_enrollments(self, shards: int):
+        """
+        Move every enrollment into a new number of shard files, streaming
+        the latest version of each row into the shard of its course.
 
-        return enrollments
+        Parameters:
+        - shards (int): The new number of shards, 1 keeps every enrollment in enrollments.csv.
 
-    def write_enrollment(self, enrollment: dict):
+        Raises:
+        - ValueError: If shards is less than 1 or the database is read-only.
         """
-        Write a enrollment record to the enrollment CSV file.
+        if shards < 1:
+            raise ValueError("shards must be at least 1.")
+
+        self._check_writable()
+        old_files = self.enrollments_files
+        new_files = self._get_enrollments_file_paths(shards)
+
+        # The file locks keep other processes from appending to the shards being replaced
+        tables = [self._tables[file_path] for file_path in old_files]
+        for table in tables:
+            table.file_lock.acquire()
+
+        try:
+            targets = [open(f"{file_path}.reshard", 'w', newline='') for file_path in new_files]
+            try:
+                writers = [csv.DictWriter(target, fieldnames=self.enrollments_field_names, extrasaction='ignore')
+                           for target in targets]
+                for writer in writers:
+                    writer.writeheader()
+
+                for file_path in old_files:
+                    for row in self._read_rows(file_path):
+                        shard = zlib.crc32(row['course_id'].encode('utf-8')) % shards
+                        writers[shard].writerow(row)
+
+                for target in targets:
+                    target.flush()
+                    os.fsync(target.fileno())
+
+            finally:
+                for target in targets:
+                    target.close()
+
+            for file_path in new_files:
+                os.replace(f"{file_path}.reshard", file_path)
+            self._set_schema_versions(new_files)
+
+            for file_path in old_files:
+                if file_path not in new_files:
+                    os.remove(file_path)
+                    del self._tables[file_path]
+                    del self.interned_field_names[file_path]
+                    for key in [key for key in self._indexes if key[0] == file_path]:
+                        del self._indexes[key]
+                    self._enrollment_counts.pop(file_path, None)
+
+            for file_path in new_files:
+                if file_path not in self._tables:
+                    self._tables[file_path] = TableFile(file_path, self.enrollments_field_names, self.read_only)
+                    self.interned_field_names[file_path] = ['user_id', 'course_id', 'creator']
+                    self._watch_table('enrollment', file_path)
+
+            self.enrollments_files = new_files
+
+        finally:
+            for table in tables:
+                table.file_lock.release()
+
+    def get_partitions(self):
+        """
+        Get the enrollment partitions of the past terms, see close_term.
+
+        Returns:
+        - list[dict]: The name (term), lowest and highest created_at of its rows (start, last), end of the term (end),
+          file name (file), number of rows (rows) and schema version (version) of each partition, oldest first.
+        """
+        return read_partitions(self.partitions_file)
+
+    def _read_history(self, partitions: list[dict]):
+        """
+        Read the rows of enrollment partitions, upgraded to the current fields.
 
         Parameters:
-        - enrollment (dict): A dictionary representing a enrollment record.
+        - partitions (list[dict]): The partitions, see get_partitions.
+
+        Yields:
+        - dict: A dictionary for each row, oldest partition first.
+        """
+        for partition in partitions:
+            file_path = os.path.join(self.folder_path, partition['file'])
+
+            # Archived since the partitions were read
+            if not os.path.exists(file_path):
+                partition = next((current for current in self.get_partitions() if current['term'] == partition['term']), partition)
+                file_path = os.path.join(self.folder_path, partition['file'])
+
+            migrations = get_migrations('enrollment', partition['version'])
+
+            for row in iter_partition_rows(file_path):
+                yield self._upgrade_row(file_path, row, migrations) if migrations else row
+
+    def close_term(self, term: str, end: str):
+        """
+        Move the enrollments created before the end of a term out of the enrollment shards,
+        into a partition file of the term listed in partitions.json with its created_at range.
+        Queries then read only the enrollments of the active terms, unless they ask for
+        history, so their cost stays the same however many terms have passed.
+
+        Past terms are read-only: their enrollments no longer count towards the capacity of
+        a course nor block enrolling to it again, and can't be deleted.
+
+        Parameters:
+        - term (str): The name of the term, made of letters, digits, '-' and '_'.
+        - end (str): The ISO date and time the next term starts at, in the past.
+
+        Returns:
+        - dict: The partition, see get_partitions.
 
         Raises:
-        - ValueError: If user is already enrolled.
+        - ValueError: If the term is invalid or was already closed, end isn't after the previous term, or the database is read-only.
         """
-        if (not self.is_enrollment_unique(enrollment['user_id'], enrollment['course_id'])):
-            raise ValueError("user is already enrolled to that course.")
+        if not TERM_PATTERN.fullmatch(term):
+            raise ValueError(
+                "Invalid term. Use letters, digits, '-' and '_'.")
 
-        with open(self.enrollments_file, 'a', newline='') as file:
-            writer = csv.DictWriter(
-                file, fieldnames=self.enrollments_field_names)
-            if file.tell() == 0:
-                writer.writeheader()
-            writer.writerow(enrollment)
+        try:
+            datetime.fromisoformat(end)
+        except ValueError:
+            raise ValueError(
+                "Invalid end. Use an ISO date, e.g. 2025-01-01.")
+
+        self._check_writable()
+        partitions = self.get_partitions()
+        previous_end = partitions[-1]['end'] if partitions else ''
+
+        if any(partition['term'] == term for partition in partitions):
+            raise ValueError(
+                "Invalid term. A term with that name was already closed.")
+
+        if not previous_end < end <= get_current_datetime():
+            raise ValueError(
+                f"Invalid end. Terms end in the past, after the previous term{f' ({previous_end})' if previous_end else ''}.")
+
+        file_path = os.path.join(self.folder_path, get_partition_file_name(term))
+        rows = 0
+        # The key range of the moved rows, which can be older than the previous term too
+        start = last = None
+
+        with ExitStack() as stack:
+            for shard in self.enrollments_files:
+                stack.enter_context(self._lock_shard(shard))
+
+            with ExitStack() as files:
+                target = files.enter_context(open(f"{file_path}.partition", 'w', newline=''))
+                shards = [files.enter_context(open(f"{shard}.partition", 'w', newline=''))
+                          for shard in self.enrollments_files]
+                writer = csv.DictWriter(target, fieldnames=self.enrollments_field_names, extrasaction='ignore')
+                shard_writers = [csv.DictWriter(shard, fieldnames=self.enrollments_field_names, extrasaction='ignore')
+                                 for shard in shards]
+                for each in [writer, *shard_writers]:
+                    each.writeheader()
+
+                # Rows a close interrupted before its manifest was written already moved
+                moved = set()
+                if os.path.exists(file_path):
+                    for row in iter_partition_rows(file_path):
+                        writer.writerow(row)
+                        moved.add(row['id'])
+                        start, last = get_key_range(start, last, row['created_at'])
+                        rows += 1
+
+                for shard, shard_writer in zip(self.enrollments_files, shard_writers):
+                    for row in self._read_rows(shard):
+                        if row['created_at'] >= end:
+                            shard_writer.writerow(row)
+                        elif row['id'] not in moved:
+                            writer.writerow(row)
+                            start, last = get_key_range(start, last, row['created_at'])
+                            rows += 1
+
+                for file in [target, *shards]:
+                    file.flush()
+                    os.fsync(file.fileno())
+
+            # The partition is complete before any row leaves the shards
+            os.replace(f"{file_path}.partition", file_path)
+            for shard in self.enrollments_files:
+                os.replace(f"{shard}.partition", shard)
+            self._set_schema_versions(self.enrollments_files)
+
+            partition = {'term': term, 'start': start, 'last': last, 'end': end, 'file': os.path.basename(file_path),
+                         'rows': rows, 'version': get_schema_version('enrollment')}
+            write_partitions(self.partitions_file, [*partitions, partition])
+
+        return partition
+
+    def archive_term(self, term: str, codec='zlib'):
+        """
+        Compress the enrollment partition of a past term into blocks, see BlockTable.
+
+        Parameters:
+        - term (str): The name of the term.
+        - codec (str): Optional. The compression codec, zlib or lzma.
+
+        Returns:
+        - dict: The partition, see get_partitions.
+
+        Raises:
+        - ValueError: If no term with that name was closed or codec is invalid.
+        """
+        partitions = self.get_partitions()
+        position = next((index for index, partition in enumerate(partitions) if partition['term'] == term), None)
+
+        if position is None:
+            raise ValueError(
+                "Invalid term. No closed term with that name was found.")
+
+        partition = partitions[position]
+
+        if partition['file'].endswith('.blk'):
+            return partition
+
+        from classes.block_table import csv_to_blocks
+
+        csv_path = os.path.join(self.folder_path, partition['file'])
+        file_name = get_partition_file_name(term, archived=True)
+        csv_to_blocks(csv_path, os.path.join(self.folder_path, file_name), codec)
+
+        # Readers of the manifest find the blocks before the CSV file is removed
+        partitions[position] = {**partition, 'file': file_name}
+        write_partitions(self.partitions_file, partitions)
+        os.remove(csv_path)
+
+        return partitions[position]
+
+    def _to_enrollments(self, rows):
+        """
+        Convert enrollment rows to Enrollment objects, filling in usernames and course names.
+
+        Parameters:
+        - rows (Iterable[dict]): The enrollment rows.
+
+        Returns:
+        - list[Enrollment]: A list of enrollments.
+        """
+        usernames = self._get_display_names(self.users_file)
+        course_names = self._get_display_names(self.courses_file)
+
+        enrollments: list[enrollment_class.Enrollment] = []
+
+        for row in rows:
+            enrollment = enrollment_class.Enrollment(
+                id=row['id'],
+                user_id=row['user_id'],
+                username=self._get_display_name(
+                    usernames, self.users_file, 'username', row['user_id']),
+                course_id=row['course_id'],
+                course_name=self._get_display_name(
+                    course_names, self.courses_file, 'name', row['course_id']),
+                creator=row['creator'],
+                created_at=row['created_at'],
+                updated_at=row['updated_at'])
+            enrollments.append(enrollment)
+
+        return enrollments
+
+    def iter_rows(self, record_type: str, row_filter=None):
+        """
+        Read the latest version of every row of a record type, one row at a time, so
+        callers can stream tables of any size. Enrollment rows also get the username and
+        course_name of their ids.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - row_filter (Callable): Optional. A callable that returns True for the rows to keep.
+
+        Yields:
+        - dict: A dictionary for each matching row.
+
+        Raises:
+        - ValueError: If record_type is invalid.
+        """
+        usernames = self._get_display_names(self.users_file)
+        course_names = self._get_display_names(self.courses_file)
+
+        for file_path in self._get_file_paths(record_type):
+            for row in self._read_rows(file_path):
+                if record_type == 'enrollment':
+                    row['username'] = self._get_display_name(
+                        usernames, self.users_file, 'username', row['user_id'])
+                    row['course_name'] = self._get_display_name(
+                        course_names, self.courses_file, 'name', row['course_id'])
+
+                if row_filter is None or row_filter(row):
+                    yield row
+
+    def _parallel_scan_file(self, file_path: str, row_filter=None, field_names=None):
+        """
+        Read the latest version of matching rows from a CSV file, split into
+        row-aligned chunks that are parsed in parallel by the process pool.
+
+        Parameters:
+        - file_path (str): The path of the CSV file to read.
+        - row_filter (Callable): Optional. A picklable callable that returns True for the rows to keep.
+        - field_names (list[str]): Optional. The fields to keep in each row, all of them by default.
+
+        Returns:
+        - list[dict]: The matching rows, in file order.
+        """
+        if self._get_row_upgrade(file_path) is not None:
+            rows = (row for row in self._read_rows(file_path) if row_filter is None or row_filter(row))
+            return [row if field_names is None else {field: row[field] for field in field_names} for row in rows]
+
+        executor = self._get_executor()
+        table = self._tables[file_path]
+
+        with table.lock:
+            table.refresh()
+            offsets, header = table.offsets, table.header
+            chunks = table.get_chunks((self.max_workers or os.cpu_count() or 1) * 4)
+
+        results = executor.map(scan_chunk, repeat(file_path), *zip(*chunks), repeat(header),
+                               repeat(row_filter), repeat(field_names)) if chunks else []
+
+        # A chunk sees every version of a row, only the one the index points to is kept
+        return [self._intern_row(file_path, row)
+                for matches in results
+                for offset, id, row in matches
+                if offsets.get(id) == offset]
+
+    def parallel_scan(self, record_type: str, row_filter=None, field_names=None):
+        """
+        Read the latest version of matching rows of a record type, parsing
+        row-aligned chunks of its files in parallel.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - row_filter (Callable): Optional. A picklable callable that returns True for the rows to keep.
+        - field_names (list[str]): Optional. The fields to keep in each row, all of them by default.
+
+        Returns:
+        - list[dict]: The matching rows.
+
+        Raises:
+        - ValueError: If record_type is invalid.
+        """
+        return [row for file_path in self._get_file_paths(record_type)
+                for row in self._parallel_scan_file(file_path, row_filter, field_names)]
+
+    def _scan(self, file_path: str, row_filter=None):
+        """
+        Read the latest version of matching rows from a CSV file, in parallel
+        once the file is larger than parallel_scan_threshold.
+
+        Parameters:
+        - file_path (str): The path of the CSV file to read.
+        - row_filter (Callable): Optional. A picklable callable that returns True for the rows to keep.
+
+        Returns:
+        - Iterable[dict]: The matching rows, in file order.
+        """
+        if os.path.getsize(file_path) >= self.parallel_scan_threshold:
+            return self._parallel_scan_file(file_path, row_filter)
+
+        rows = self._read_rows(file_path)
+
+        if row_filter is None:
+            return rows
+
+        return (row for row in rows if row_filter(row))
+
+    def _get_index(self, file_path: str, field: str):
+        """
+        Get the secondary index of a field of a CSV file, creating it on first use.
+
+        Parameters:
+        - file_path (str): The path of the CSV file.
+        - field (str): The indexed field.
+
+        Returns:
+        - SecondaryIndex: The index.
+        """
+        index = self._indexes.get((file_path, field))
+
+        if index is None:
+            index = self._indexes[(file_path, field)] = SecondaryIndex(self._tables[file_path], field)
+
+        return index
+
+    def _plan(self, record_type: str, where):
+        """
+        Choose how to find the rows matching a condition: read them by id, look them up in
+        a secondary index, scan only the enrollment shards of the queried courses, or scan
+        every file. Of the secondary indexes, the one with the fewest candidates is used.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - where (Predicate or None): The condition rows must match.
+
+        Returns:
+        - QueryPlan: The plan.
+        """
+        file_paths = self._get_file_paths(record_type)
+
+        ids = where.get_values('id') if where else None
+        if ids is not None:
+            plan = QueryPlan(record_type, where, 'id lookup', file_paths)
+            for id in ids:
+                file_path = self._find_enrollments_file(id) if record_type == 'enrollment' else file_paths[0]
+                if file_path and id in self._tables[file_path]:
+                    plan.ids.setdefault(file_path, set()).add(id)
+            plan.file_paths = list(plan.ids)
+            return plan
+
+        best = None
+        for field in self.indexed_fields.get(record_type, []) if where else []:
+            values = where.get_values(field)
+            if values is None:
+                continue
+            candidates = {file_path: self._get_index(file_path, field).lookup(values) for file_path in file_paths}
+            count = sum(len(ids) for ids in candidates.values())
+            if best is None or count < best[0]:
+                best = (count, field, candidates)
+
+        if best:
+            _, field, candidates = best
+            plan = QueryPlan(record_type, where, f'index on {field}', [
+                file_path for file_path, ids in candidates.items() if ids])
+            plan.ids = {file_path: ids for file_path, ids in candidates.items() if ids}
+            return plan
+
+        course_ids = where.get_values('course_id') if where and record_type == 'enrollment' else None
+        if course_ids is not None:
+            shards = {self._get_enrollments_file(course_id) for course_id in course_ids}
+            return QueryPlan(record_type, where, 'shard scan', [file_path for file_path in file_paths if file_path in shards])
+
+        return QueryPlan(record_type, where, 'full scan', file_paths)
+
+    def _read_plan(self, plan: QueryPlan):
+        """
+        Read the matching rows of a plan one at a time, in file order, with the fields the
+        result and the sort need.
+
+        Parameters:
+        - plan (QueryPlan): The plan.
+
+        Returns:
+        - Iterator[dict]: The rows.
+        """
+        joined_fields = ['username', 'course_name'] if plan.record_type == 'enrollment' else []
+        wanted = plan.fields or None
+        # Scans keep only the fields the result and the sort need
+        scan_fields = None
+        if wanted:
+            scan_fields = list(dict.fromkeys(
+                field for field in [*wanted, *(field.lstrip('-') for field in plan.order_by), 'id', *(['user_id', 'course_id'] if joined_fields else [])]
+                if field not in joined_fields))
+
+        if plan.ids:
+            def read_rows():
+                for file_path, ids in plan.ids.items():
+                    table = self._tables[file_path]
+                    # Read in file order, like a scan
+                    for id in sorted(ids, key=lambda id: table.offsets.get(id, -1)):
+                        row = self._read_row(file_path, id)
+                        plan.rows_examined += 1
+                        if row and (plan.where is None or plan.where(row)):
+                            yield row if scan_fields is None else {field: row[field] for field in scan_fields}
+
+            rows = read_rows()
+
+        elif (plan.record_type == 'enrollment' and len(plan.file_paths) > 1 and (plan.order_by or plan.limit is None)
+              and all(self._get_row_upgrade(file_path) is None for file_path in plan.file_paths)):
+            # Every shard is read to the end, so they are scanned side by side by the process pool
+            plan.parallel = True
+            plan.rows_examined = sum(len(self._tables[file_path]) for file_path in plan.file_paths)
+            results = self._get_executor().map(
+                scan_live_records, plan.file_paths, repeat(self.enrollments_field_names), repeat(plan.where))
+            rows = (self._intern_row(plan.file_paths[0], row) for rows in results for row in rows)
+
+        else:
+            def scan_rows():
+                for file_path in plan.file_paths:
+                    if os.path.getsize(file_path) >= self.parallel_scan_threshold:
+                        plan.rows_examined += len(self._tables[file_path])
+                        yield from self._parallel_scan_file(file_path, plan.where, scan_fields)
+                        continue
+
+                    # Sequential scans stop as soon as the result is complete
+                    for row in self._read_rows(file_path):
+                        plan.rows_examined += 1
+                        if plan.where is None or plan.where(row):
+                            yield row if scan_fields is None else {field: row[field] for field in scan_fields}
+
+            rows = scan_rows()
+
+        if plan.history:
+            def history_rows():
+                for row in self._read_history(plan.history):
+                    plan.rows_examined += 1
+                    if plan.where is None or plan.where(row):
+                        yield row if scan_fields is None else {field: row[field] for field in scan_fields}
+
+            # Past terms come first, like older rows of a file
+            rows = chain(history_rows(), rows)
+
+        if joined_fields and (wanted is None or any(field in joined_fields for field in [*wanted, *plan.order_by])):
+            usernames = self._get_display_names(self.users_file)
+            course_names = self._get_display_names(self.courses_file)
+
+            def join(rows):
+                for row in rows:
+                    row['username'] = self._get_display_name(usernames, self.users_file, 'username', row['user_id'])
+                    row['course_name'] = self._get_display_name(course_names, self.courses_file, 'name', row['course_id'])
+                    yield row
+
+            rows = join(rows)
+
+        return rows
+
+    def _execute(self, plan: QueryPlan):
+        """
+        Read the rows of a plan, projecting them and applying its order, offset and limit.
+
+        Parameters:
+        - plan (QueryPlan): The plan.
+
+        Returns:
+        - list[dict]: The rows.
+        """
+        rows = self._read_plan(plan)
+        wanted = plan.fields or None
+        end = None if plan.limit is None else plan.offset + plan.limit
+
+        if plan.order_by:
+            from utils.external_sort import get_sort_key
+            key, reverse = get_sort_key(plan.order_by)
+            if end is None:
+                rows = sorted(rows, key=key, reverse=reverse)
+            else:
+                # Only the first offset + limit rows are kept in a heap
+                rows = (heapq.nlargest if reverse else heapq.nsmallest)(end, rows, key=key)
+
+        result = list(islice(rows, plan.offset, end))
+
+        if wanted:
+            result = [{field: row[field] for field in wanted} for row in result]
+
+        plan.rows_returned = len(result)
+
+        return result
+
+    def _prepare_query(self, record_type: str, where, order_by, limit, offset, fields, include_history=False):
+        """
+        Validate a query and plan it.
+
+        Returns:
+        - QueryPlan: The plan.
+
+        Raises:
+        - ValueError: If record_type or a field is invalid.
+        """
+        stored_field_names = {'user': self.users_field_names, 'course': self.courses_field_names,
+                              'enrollment': self.enrollments_field_names,
+                              'waitlist': self.waitlist_field_names}.get(record_type)
+
+        if stored_field_names is None:
+            raise ValueError(
+                "Invalid record type. Allowed types: user, course, enrollment, waitlist")
+
+        where = to_predicate(where)
+        order_by = list(order_by or [])
+        field_names = [*stored_field_names, *(['username', 'course_name'] if record_type == 'enrollment' else [])]
+
+        for field in [*(where.get_fields() if where else []), *(field.lstrip('-') for field in order_by), *(fields or [])]:
+            if field not in field_names:
+                raise ValueError(
+                    f"Invalid field '{field}'. Allowed fields: {', '.join(field_names)}")
+
+        if where and not where.get_fields() <= set(stored_field_names):
+            raise ValueError(
+                "Conditions on usernames and course names of enrollments are not supported, use user_id and course_id.")
+
+        plan = self._plan(record_type, where)
+
+        # Partitions whose created_at range is outside the condition are skipped
+        if include_history and record_type == 'enrollment':
+            partitions = self.get_partitions()
+            bounds = where.get_bounds('created_at') if where else None
+            plan.history = [partition for partition in partitions if overlaps(partition, bounds)]
+            plan.partitions = len(partitions)
+
+        plan.fields = list(fields) if fields else None
+        plan.order_by = order_by
+        plan.limit = limit
+        plan.offset = offset
+
+        return plan
+
+    def query(self, record_type: str, where=None, order_by=None, limit=None, offset=0, fields=None, include_history=False):
+        """
+        Read the rows of a record type that match a condition.
+
+        Rows are found through an id lookup, a secondary index or an enrollment shard
+        when the condition allows it, and a scan otherwise. Without order_by, rows come
+        in file order and reading stops once limit rows were found. With order_by and a
+        limit, only the first offset + limit rows are kept while reading. Enrollments of
+        past terms are only read with include_history, from the partitions whose created_at
+        range the condition overlaps.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - where (Predicate or dict): Optional. Eq, In and Range predicates combined with And and Or (or & and |),
+          or a dictionary of field values that must all match. Every row matches by default.
+        - order_by (list[str]): Optional. The fields to sort by, prefixed with '-' to sort in descending order.
+        - limit (int): Optional. The maximum number of rows to return.
+        - offset (int): Optional. The number of rows to skip.
+        - fields (list[str]): Optional. The fields to return, all of them by default. Enrollments also have
+          username and course_name fields.
+        - include_history (bool): Optional. Also read the enrollments of past terms, see close_term.
+
+        Returns:
+        - list[dict]: The matching rows.
+
+        Raises:
+        - ValueError: If record_type or a field is invalid.
+        """
+        return self._execute(self._prepare_query(record_type, where, order_by, limit, offset, fields, include_history))
+
+    def iter_query(self, record_type: str, where=None, include_history=False):
+        """
+        Read the rows of a record type that match a condition one at a time, so callers can
+        stream results of any size. Rows are found like with query, and come in file order.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - where (Predicate or dict): Optional. The condition rows must match, see query.
+        - include_history (bool): Optional. Also read the enrollments of past terms, see close_term.
+
+        Returns:
+        - Iterator[dict]: The matching rows, enrollments with their username and course_name.
+
+        Raises:
+        - ValueError: If record_type or a field is invalid.
+        """
+        return self._read_plan(self._prepare_query(record_type, where, None, None, 0, None, include_history))
+
+    def explain(self, record_type: str, where=None, order_by=None, limit=None, offset=0, fields=None, include_history=False):
+        """
+        Run a query and describe how it read its rows. Takes the same parameters as query.
+
+        Returns:
+        - QueryPlan: The plan, with the number of rows examined and returned. Print it for a summary.
+
+        Raises:
+        - ValueError: If record_type or a field is invalid.
+        """
+        plan = self._prepare_query(record_type, where, order_by, limit, offset, fields, include_history)
+        self._execute(plan)
+        return plan
+
+    def _record_change(self, record_type: str, operation: str, id: str, row=None):
+        """
+        Append a write to the change feed. Password hashes are left out.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - operation (str): 'create', 'update' or 'delete'.
+        - id (str): The id of the record.
+        - row (dict): Optional. The written row, None for deletions.
+        """
+        data = {field: value for field, value in row.items() if field != 'password'} if row is not None else None
+        self.change_feed.append(record_type, operation, id, get_current_datetime(), data)
+
+    def get_change_cursor(self):
+        """
+        Get the cursor of the end of the change feed, to read only changes made from now on.
+
+        Returns:
+        - int: The cursor.
+        """
+        return self.change_feed.get_cursor()
+
+    def read_changes(self, cursor=0, limit=100, timeout=0):
+        """
+        Read a batch of the users, courses and enrollments created, updated or deleted after a cursor.
+
+        Each change is a dictionary with its sequence number (seq), the record type (type),
+        the operation ('create', 'update' or 'delete'), the record id, the time of the change
+        (created_at) and the written record without its password (data, None for deletions).
+        Sequence numbers increase with every change, whichever process made it. Save the
+        returned cursor to resume from it later.
+
+        Parameters:
+        - cursor (int): Optional. The cursor returned by the previous batch, 0 for the first change.
+        - limit (int): Optional. The maximum number of changes.
+        - timeout (float): Optional. Seconds to wait for a change when there are none yet, 0 to return at once.
+
+        Returns:
+        - tuple[list[dict], int]: The changes, in sequence order, and the cursor of the next batch.
+
+        Raises:
+        - ValueError: If cursor or limit is invalid.
+        """
+        return self.change_feed.read(cursor, limit, timeout)
+
+    def _new_version(self, row: dict, changes: dict, allowed_fields: list[str]):
+        """
+        Build a new version of a row.
+
+        Parameters:
+        - row (dict): The current version of the row.
+        - changes (dict): The field values to change.
+        - allowed_fields (list[str]): The fields that may be changed.
+
+        Returns:
+        - dict: The new version of the row.
+
+        Raises:
+        - ValueError: If a field can't be changed.
+        """
+        for field in changes:
+            if field not in allowed_fields:
+                raise ValueError(
+                    f"Invalid field '{field}'. Allowed fields: {', '.join(allowed_fields)}")
+
+        return {**row, **changes, 'updated_at': get_current_datetime()}
+
+    def _maybe_compact(self, file_path: str):
+        """
+        Start a background compaction of a CSV file once its dead rows pass the threshold.
+
+        Parameters:
+        - file_path (str): The path of the CSV file.
+        """
+        table = self._tables[file_path].refresh()
+
+        if table.rows < self.compaction_min_rows or table.dead_rows < table.rows * self.compaction_threshold:
+            return
+
+        compaction = self._compactions.get(file_path)
+        if compaction and compaction.is_alive():
+            return
+
+        compaction = threading.Thread(target=table.compact, daemon=True)
+        self._compactions[file_path] = compaction
+        compaction.start()
+
+    def compact(self, record_type: str):
+        """
+        Rewrite the CSV file of a record type without superseded versions and deleted rows.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+
+        Raises:
+        - ValueError: If record_type is invalid.
+        """
+        for file_path in self._get_file_paths(record_type):
+            self._tables[file_path].compact()
+
+    def _read_enrollment_references(self, file_path: str):
+        """
+        Read the references of every enrollment version in a file, as stored, in chunks of rows.
+        Files larger than parallel_scan_threshold are split into chunks parsed by the process pool.
+
+        Parameters:
+        - file_path (str): The path of the CSV file.
+
+        Returns:
+        - tuple[dict[str, int], Iterable[list[tuple]]]: The offset of the latest version of each live
+          enrollment, and the references of each chunk, see read_enrollment_references.
+        """
+        from classes.integrity import read_enrollment_references
+
+        table = self._tables[file_path]
+
+        with table.lock:
+            table.refresh()
+            offsets, header = table.offsets, table.header
+            parallel = table.size >= self.parallel_scan_threshold
+            # Chunks of one checkpoint interval keep reads in this process small
+            chunks = table.get_chunks((self.max_workers or os.cpu_count() or 1) * 4 if parallel else len(table.checkpoints))
+
+        if parallel and len(chunks) > 1:
+            return offsets, self._get_executor().map(
+                read_enrollment_references, repeat(file_path), *zip(*chunks), repeat(header))
+
+        return offsets, (read_enrollment_references(file_path, start, end, header) for start, end in chunks)
+
+    def check_integrity(self):
+        """
+        Check the references between users, courses and enrollments in one pass over each table,
+        hash joining enrollments on in-memory maps of the users and courses.
+
+        Reports enrollments of missing users or courses, enrollments of a user in a course
+        after the first, usernames shared by several users, and usernames or course names
+        stored in enrollments that differ from the current ones.
+
+        Returns:
+        - IntegrityReport: The problems found.
+        """
+        # The check allocates millions of tuples and no reference cycles, so collecting
+        # garbage meanwhile would only rescan them over and over
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            return self._check_integrity()
+
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _check_integrity(self):
+        """
+        Run an integrity check, see check_integrity.
+
+        Returns:
+        - IntegrityReport: The problems found.
+        """
+        from classes.integrity import IntegrityReport
+
+        report = IntegrityReport()
+        usernames: dict[str, str] = {}
+        user_ids: dict[str, list[str]] = {}
+
+        for row in self._scan(self.users_file):
+            usernames[row['id']] = row['username']
+            user_ids.setdefault(row['username'], []).append(row['id'])
+
+        report.users_checked = len(usernames)
+        report.duplicate_usernames = {username: ids for username, ids in user_ids.items() if len(ids) > 1}
+        course_names = {row['id']: row['name'] for row in self._scan(self.courses_file)}
+        report.courses_checked = len(course_names)
+        enrollment_ids: dict[tuple[str, str], str] = {}
+
+        for file_path in self.enrollments_files:
+            # Enrollments of a course all live in one shard, so duplicates can't span shards
+            if len(self.enrollments_files) > 1:
+                enrollment_ids.clear()
+
+            offsets, chunks = self._read_enrollment_references(file_path)
+
+            # Problems are rare, so each chunk is checked with set and dictionary operations,
+            # and only the rows of a chunk that has a problem are looked at one by one
+            for references in chunks:
+                # Only the version the index points to is live, tombstones aren't indexed
+                live = [reference for reference in references if offsets.get(reference[1]) == reference[0]]
+                report.enrollments_checked += len(live)
+                ids = [reference[1] for reference in live]
+                pairs = [reference[2:4] for reference in live]
+
+                missing_users = {user_id for user_id, _ in pairs}.difference(usernames)
+                missing_courses = {course_id for _, course_id in pairs}.difference(course_names)
+                if missing_users or missing_courses:
+                    for id, (user_id, course_id) in zip(ids, pairs):
+                        if user_id in missing_users:
+                            report.orphaned_enrollments.append((id, 'user'))
+                        if course_id in missing_courses:
+                            report.orphaned_enrollments.append((id, 'course'))
+
+                # The earliest enrollment of each pair is kept, files are in write order
+                first_ids = dict(zip(reversed(pairs), reversed(ids)))
+                seen_pairs = enrollment_ids.keys() & first_ids.keys()
+                for pair in seen_pairs:
+                    first_ids[pair] = enrollment_ids[pair]
+                if seen_pairs or len(first_ids) < len(pairs):
+                    report.duplicate_enrollments.extend(
+                        (id, first_ids[pair]) for id, pair in zip(ids, pairs) if first_ids[pair] is not id)
+                enrollment_ids.update(first_ids)
+
+                # Only files that aren't migrated yet still store names
+                if live and len(live[0]) > 4:
+                    for _, id, user_id, course_id, username, course_name in live:
+                        for field, stored, current in [('username', username, usernames.get(user_id)),
+                                                       ('course_name', course_name, course_names.get(course_id))]:
+                            if stored and current is not None and stored != current:
+                                report.stale_names.append((id, field, stored, current))
+
+        return report
+
+    def write_repaired_copy(self, folder_path: str, report=None):
+        """
+        Write a cleaned copy of the database to another folder. Orphaned enrollments and
+        every duplicate enrollment but the earliest are left out, stored names are dropped,
+        and only the latest version of each record is written. Duplicate usernames are only
+        reported, choosing which account to rename is left to an admin.
+
+        Parameters:
+        - folder_path (str): The folder of the copy, which must be empty or not exist.
+        - report (IntegrityReport): Optional. The problems to repair, checked again by default.
+
+        Returns:
+        - IntegrityReport: The repaired problems.
+
+        Raises:
+        - ValueError: If folder_path isn't empty.
+        """
+        if os.path.isdir(folder_path) and os.listdir(folder_path):
+            raise ValueError(
+                "Invalid folder. The repaired copy must be written to an empty folder.")
+
+        report = report if report is not None else self.check_integrity()
+        removed_ids = report.get_removed_enrollments()
+        os.makedirs(folder_path, exist_ok=True)
+
+        for record_type in ['user', 'course', 'enrollment', 'waitlist']:
+            for file_path in self._get_file_paths(record_type):
+                with open(os.path.join(folder_path, os.path.basename(file_path)), 'w', newline='') as target:
+                    writer = csv.DictWriter(target, fieldnames=self._get_field_names(record_type))
+                    writer.writeheader()
+                    for row in self._read_rows(file_path):
+                        if row['id'] not in removed_ids:
+                            writer.writerow(row)
+
+        write_schema_versions(os.path.join(folder_path, os.path.basename(self.schema_file)), {
+            os.path.basename(file_path): get_schema_version(self._get_record_type(file_path))
+            for file_path in [self.users_file, self.courses_file, *self.enrollments_files, self.waitlist_file]})
+
+        # Past terms aren't checked, they are copied as they are
+        partitions = self.get_partitions()
+        for partition in partitions:
+            shutil.copyfile(os.path.join(self.folder_path, partition['file']), os.path.join(folder_path, partition['file']))
+        if partitions:
+            write_partitions(os.path.join(folder_path, PARTITIONS_FILE), partitions)
+
+        return report
+
+    def is_field_unique(self, record_type: str, field: str, value: str):
+        """
+        Check if a particular field is unique for a given record type.
+
+        Parameters:
+        - record_type (str): The type of record (user, course, enrollment, or waitlist).
+        - field (str): The field to check for uniqueness.
+        - value (str): The value to check for uniqueness.
+
+        Returns:
+        - bool: True if the field is unique, False otherwise.
+
+        Raises:
+        - ValueError: If record_type is invalid.
+        """
+        return not self.query(record_type, Eq(field, value), limit=1, fields=['id'])
+
+    def is_enrollment_unique(self, user_id, course_id):
+        """
+        Check if an enrollment with the given user_id and course_id is unique.
+
+        Parameters:
+        - user_id (str): The user ID to check for uniqueness.
+        - course_id (str): The course ID to check for uniqueness.
+
+        Returns:
+        - bool: True if the enrollment is unique, False otherwise.
+        """
+        return not self.query('enrollment', {'course_id': course_id, 'user_id': user_id}, limit=1, fields=['id'])
+
+    def read_users(self):
+        """
+        Read user records from the users CSV file.
+
+        Returns:
+        - list[User]: A list of either Admin or Student based on the role.
+          """
+        users: list[user_class.Admin | user_class.Student] = []
+
+        for row in self._scan(self.users_file):
+            user = user_class.User(**row)
+            users.append(user.to_admin_or_student())
+
+        return users
+
+    def read_user(self, id="", username=""):
+        """
+        Read a user record from the users CSV file based on id or username.
+
+        Parameters:
+        - id (str): Optional. The user ID to filter by.
+        - username (str): Optional. The username to filter by.
+
+        Returns:
+        - Admin, Student or None: Admin or Student record if a match is found, None otherwise.
+        """
+        if (not id and not username):
+            return None
+
+        if id:
+            row = self._read_row(self.users_file, id)
+            if row:
+                return user_class.User(**row).to_admin_or_student()
+
+        if username:
+            for row in self.query('user', Eq('username', username), limit=1):
+                return user_class.User(**row).to_admin_or_student()
+
+    def write_user(self, user: dict):
+        """
+        Write a user record to the users CSV file.
+
+        Parameters:
+        - user (dict): A dictionary representing a user record.
+
+        Raises:
+        - ValueError: If username is not unique.
+        """
+        with self._tables[self.users_file].lock:
+            if (not self.is_field_unique('user', 'username', user['username'])):
+                raise ValueError("username must be unique")
+
+            self._tables[self.users_file].append(user)
+            self._record_change('user', 'create', user['id'], user)
+
+    def update_user(self, id: str, changes: dict):
+        """
+        Update a user record by appending its new version to the users CSV file.
+
+        Parameters:
+        - id (str): The id of the user to update.
+        - changes (dict): The field values to change (name, username, password or role).
+
+        Returns:
+        - Admin | Student: The updated user.
+
+        Raises:
+        - ValueError: If the user doesn't exist, a field can't be changed or username is not unique.
+        """
+        with self._tables[self.users_file].lock:
+            row = self._read_row(self.users_file, id)
+
+            if not row:
+                raise ValueError("Invalid id. No user with that id was found in the database.")
+
+            user = self._new_version(
+                row, changes, ['name', 'username', 'password', 'role'])
+
+            if user['username'] != row['username'] and not self.is_field_unique('user', 'username', user['username']):
+                raise ValueError("username must be unique")
+
+            self._tables[self.users_file].append(user)
+            self._record_change('user', 'update', id, user)
+            self._maybe_compact(self.users_file)
+
+        return user_class.User(**user).to_admin_or_student()
+
+    def upgrade_password_hash(self, id: str, hashed_password: str, new_hashed_password: str):
+        """
+        Replace the password hash of a user by a new hash of the same password, e.g. one with
+        stronger settings computed on login. Unlike update_user, updated_at is kept and no
+        change is recorded, since neither the user nor an admin changed anything.
+
+        Parameters:
+        - id (str): The id of the user.
+        - hashed_password (str): The hash the password was verified against.
+        - new_hashed_password (str): The new hash.
+
+        Returns:
+        - bool: True if the hash was replaced, False if the user was deleted or its password changed meanwhile.
+        """
+        with self._tables[self.users_file].lock:
+            row = self._read_row(self.users_file, id)
+
+            if not row or row['password'] != hashed_password:
+                return False
+
+            self._tables[self.users_file].append({**row, 'password': new_hashed_password})
+            self._maybe_compact(self.users_file)
+
+        return True
+
+    def delete_user(self, id: str):
+        """
+        Delete a user record by appending a tombstone to the users CSV file.
+
+        Parameters:
+        - id (str): The id of the user to delete.
+
+        Raises:
+        - ValueError: If the user doesn't exist.
+        """
+        with self._tables[self.users_file].lock:
+            if id not in self._tables[self.users_file]:
+                raise ValueError("Invalid id. No user with that id was found in the database.")
+
+            self._tables[self.users_file].delete(id)
+            self._record_change('user', 'delete', id)
+            self._maybe_compact(self.users_file)
+
+    def read_courses(self):
+        """
+        Read course records from the courses CSV file.
+
+        Returns:
+        - list[Course]: A list of courses.
+          """
+        courses: list[course_class.Course] = []
+
+        for row in self._read_rows(self.courses_file):
+            course = course_class.Course(**row)
+            courses.append(course)
+
+        return courses
+
+    def read_course(self, id: str):
+        """
+        Read a course record from the users CSV file based on id.
+
+        Parameters:
+        - id (str): The course ID to filter by.
+
+        Returns:
+        - Course or None: Course record if a match is found, None otherwise.
+        """
+        row = self._read_row(self.courses_file, id)
+
+        if row:
+            return course_class.Course(**row)
+
+    def _check_capacity(self, capacity: str):
+        """
+        Check that a course capacity is a whole number of seats, or empty for no limit.
+
+        Parameters:
+        - capacity (str): The capacity.
+
+        Raises:
+        - ValueError: If capacity is invalid.
+        """
+        if capacity and not (capacity.isascii() and capacity.isdigit()):
+            raise ValueError(
+                "Invalid capacity. Use a whole number of seats, or nothing for no limit.")
+
+    def _migrate_courses(self):
+        """
+        Migrate the courses CSV file if it predates a column of courses, since new course
+        versions can't be appended to a file without their columns.
+        """
+        if self._get_row_upgrade(self.courses_file) is not None:
+            self.migrate('course')
+
+    def get_capacity(self, course_id: str):
+        """
+        Get the maximum number of enrollments of a course.
+
+        Parameters:
+        - course_id (str): The course ID.
+
+        Returns:
+        - int or None: The capacity, None if the course has no limit or doesn't exist.
+        """
+        row = self._read_row(self.courses_file, course_id)
+
+        if row and row.get('capacity'):
+            return int(row['capacity'])
+
+    def write_course(self, course: dict):
+        """
+        Write a course record to the users CSV file.
+
+        Parameters:
+        - course (dict): A dictionary representing a course record.
+
+        Raises:
+        - ValueError: If the capacity is invalid.
+        """
+        course = {**course, 'capacity': str(course.get('capacity') or '')}
+        self._check_capacity(course['capacity'])
+        self._migrate_courses()
+
+        with self._tables[self.courses_file].lock:
+            self._tables[self.courses_file].append(course)
+            self._record_change('course', 'create', course['id'], course)
+
+    def update_course(self, id: str, changes: dict):
+        """
+        Update a course record by appending its new version to the courses CSV file.
+
+        Parameters:
+        - id (str): The id of the course to update.
+        - changes (dict): The field values to change (name, description, or capacity).
+
+        Returns:
+        - Course: The updated course.
+
+        Raises:
+        - ValueError: If the course doesn't exist, a field can't be changed, or the capacity is invalid.
+        """
+        if 'capacity' in changes:
+            changes = {**changes, 'capacity': str(changes['capacity'] or '')}
+            self._check_capacity(changes['capacity'])
+        self._migrate_courses()
+
+        with self._tables[self.courses_file].lock:
+            row = self._read_row(self.courses_file, id)
+
+            if not row:
+                raise ValueError("Invalid id. No course with that id was found in the database.")
+
+            course = self._new_version(row, changes, ['name', 'description', 'capacity'])
+
+            self._tables[self.courses_file].append(course)
+            self._record_change('course', 'update', id, course)
+            self._maybe_compact(self.courses_file)
+
+        # Seats added by a larger capacity go to the waitlist. The courses file is unlocked
+        # first, since promoting locks the course and then reads the courses file.
+        if course['capacity'] != row.get('capacity', ''):
+            with self._lock_course(id):
+                self._promote_waitlist(id)
+
+        return course_class.Course(**course)
+
+    def delete_course(self, id: str):
+        """
+        Delete a course record by appending a tombstone to the courses CSV file.
+
+        Parameters:
+        - id (str): The id of the course to delete.
+
+        Raises:
+        - ValueError: If the course doesn't exist.
+        """
+        with self._tables[self.courses_file].lock:
+            if id not in self._tables[self.courses_file]:
+                raise ValueError("Invalid id. No course with that id was found in the database.")
+
+            self._tables[self.courses_file].delete(id)
+            self._record_change('course', 'delete', id)
+            self._maybe_compact(self.courses_file)
+
+    def read_enrollments(self, include_history=False):
+        """
+        Read enrollment records from the courses CSV file.
+
+        Parameters:
+        - include_history (bool): Optional. Also read the enrollments of past terms, see close_term.
+
+        Returns:
+        - list[Enrollment]: A list of enrollments.
+          """
+        rows = self._scan_enrollments()
+
+        if include_history:
+            rows = [*self._read_history(self.get_partitions()), *rows]
+
+        return self._to_enrollments(rows)
+
+    def read_enrollment(self, id: str):
+        """
+        Read a enrollment record from the users CSV file based on id.
+
+        Parameters:
+        - id (str): The enrollment ID to filter by.
+
+        Returns:
+        - Enrollment or None: Enrollment record if a match is found, None otherwise.
+        """
+        file_path = self._find_enrollments_file(id)
+        row = self._read_row(file_path, id) if file_path else None
+
+        if row:
+            return self._to_enrollments([row])[0]
+
+    def query_enrollments(self, user_id="", username="", course_id="", include_history=False):
+        """
+        Read enrollment records from the enrollments CSV file based on user_id, username, and course_id.
+        Every given argument must match, empty arguments are ignored.
+
+        Parameters:
+        - user_id (str): Optional. The user ID to filter by.
+        - username (str): Optional. The username to filter by.
+        - course_id (str): Optional. The course ID to filter by.
+        - include_history (bool): Optional. Also read the enrollments of past terms, see close_term.
+
+        Returns:
+        - list[Enrollment]: A list of Enrollment records that match the given criteria, in creation order.
+        """
+        conditions = []
+
+        # Enrollments store only ids, so a username is matched through its user id
+        if username:
+            user = self.read_user(username=username)
+            if not user:
+                return []
+            conditions.append(Eq('user_id', user.id))
+
+        if user_id:
+            conditions.append(Eq('user_id', user_id))
+
+        if course_id:
+            conditions.append(Eq('course_id', course_id))
+
+        if not conditions:
+            return []
+
+        rows = self.query('enrollment', And(*conditions), order_by=['created_at'], fields=self.enrollments_field_names,
+                          include_history=include_history)
+
+        return self._to_enrollments(rows)
+
+    def _lock_shard(self, file_path: str):
+        """
+        Get the lock of an enrollment file and of the waitlist entries of its courses, held
+        by one thread of one process at a time. It is the file lock of the table, which
+        every append to the file takes too.
+
+        Parameters:
+        - file_path (str): The path of the enrollment shard.
+
+        Returns:
+        - FileLock: The lock.
+        """
+        return self._tables[file_path].file_lock
+
+    def _lock_course(self, course_id: str):
+        """
+        Get the lock of the enrollments and waitlist entries of a course. It is shared by
+        every course of an enrollment file, so two processes can't both take the last seat
+        of a course.
+
+        Parameters:
+        - course_id (str): The course ID.
+
+        Returns:
+        - FileLock: The lock.
+        """
+        return self._lock_shard(self._get_enrollments_file(course_id))
+
+    def count_enrollments(self, course_id: str):
+        """
+        Count the enrollments of a course. Counts are kept up to date as enrollments are
+        written, by this process or another, so no enrollment is read.
+
+        Parameters:
+        - course_id (str): The course ID.
+
+        Returns:
+        - int: The number of enrollments.
+        """
+        file_path = self._get_enrollments_file(course_id)
+        counts = self._enrollment_counts.get(file_path)
+
+        if counts is None:
+            counts = self._enrollment_counts.setdefault(file_path, CountIndex(self._tables[file_path], 'course_id'))
+
+        return counts.count(course_id)
+
+    def write_enrollment(self, enrollment: dict):
+        """
+        Write a enrollment record to the enrollment CSV file.
+
+        Parameters:
+        - enrollment (dict): A dictionary representing a enrollment record.
+
+        Raises:
+        - ValueError: If user is already enrolled.
+        - CourseFullError: If the course has as many enrollments as its capacity.
+        """
+        course_id = enrollment['course_id']
+        table = self._tables[self._get_enrollments_file(course_id)]
+
+        with self._lock_course(course_id), table.lock:
+            if (not self.is_enrollment_unique(enrollment['user_id'], course_id)):
+                raise ValueError("user is already enrolled to that course.")
+
+            capacity = self.get_capacity(course_id)
+            if capacity is not None and self.count_enrollments(course_id) >= capacity:
+                raise CourseFullError("course is full.")
+
+            # Only ids are stored, files created before that keep empty name columns
+            row = {field: enrollment[field] for field in self.enrollments_field_names}
+            table.append(row)
+            self._record_change('enrollment', 'create', row['id'], row)
+
+    def delete_enrollment(self, id: str):
+        """
+        Delete an enrollment record by appending a tombstone to the enrollments CSV file.
+
+        Parameters:
+        - id (str): The id of the enrollment to delete.
+
+        Raises:
+        - ValueError: If the enrollment doesn't exist.
+        """
+        file_path = self._find_enrollments_file(id)
+        row = self._read_row(file_path, id) if file_path else None
+
+        if not row:
+            raise ValueError("Invalid id. No enrollment with that id was found in the database.")
+
+        with self._lock_course(row['course_id']), self._tables[file_path].lock:
+            if id not in self._tables[file_path]:
+                raise ValueError("Invalid id. No enrollment with that id was found in the database.")
+
+            self._tables[file_path].delete(id)
+            self._record_change('enrollment', 'delete', id)
+            self._maybe_compact(file_path)
+
+            # The freed seat goes to the first student waiting for it
+            self._promote_waitlist(row['course_id'])
+
+    def get_waitlist(self, course_id: str):
+        """
+        Read the students waiting for a seat in a course.
+
+        Parameters:
+        - course_id (str): The course ID.
+
+        Returns:
+        - list[dict]: The waitlist entries, in the order they will be promoted.
+        """
+        return self.query('waitlist', Eq('course_id', course_id), order_by=['created_at', 'id'])
+
+    def write_waitlist_entry(self, entry: dict):
+        """
+        Write a waitlist entry to the waitlist CSV file.
+
+        Parameters:
+        - entry (dict): A dictionary representing a waitlist entry.
+
+        Returns:
+        - int: The position of the student on the waitlist, 1 being the next promoted.
+
+        Raises:
+        - ValueError: If the user is already enrolled or waiting, or the course has a seat left.
+        """
+        course_id = entry['course_id']
+
+        with self._lock_course(course_id):
+            if not self.is_enrollment_unique(entry['user_id'], course_id):
+                raise ValueError("user is already enrolled to that course.")
+
+            capacity = self.get_capacity(course_id)
+            if capacity is None or self.count_enrollments(course_id) < capacity:
+                raise ValueError("course isn't full, enroll the user instead.")
+
+            waitlist = self.get_waitlist(course_id)
+            if any(row['user_id'] == entry['user_id'] for row in waitlist):
+                raise ValueError("user is already on the waitlist of that course.")
+
+            row = {field: entry[field] for field in self.waitlist_field_names}
+            self._tables[self.waitlist_file].append(row)
+            self._record_change('waitlist', 'create', row['id'], row)
+
+        return len(waitlist) + 1
+
+    def delete_waitlist_entry(self, id: str):
+        """
+        Delete a waitlist entry by appending a tombstone to the waitlist CSV file.
+
+        Parameters:
+        - id (str): The id of the waitlist entry to delete.
+
+        Raises:
+        - ValueError: If the waitlist entry doesn't exist.
+        """
+        table = self._tables[self.waitlist_file]
+        row = self._read_row(self.waitlist_file, id)
+
+        if not row:
+            raise ValueError("Invalid id. No waitlist entry with that id was found in the database.")
+
+        with self._lock_course(row['course_id']), table.lock:
+            if id not in table:
+                raise ValueError("Invalid id. No waitlist entry with that id was found in the database.")
+
+            table.delete(id)
+            self._record_change('waitlist', 'delete', id)
+            self._maybe_compact(self.waitlist_file)
+
+    def _promote_waitlist(self, course_id: str):
+        """
+        Enroll the students waiting for a course, first come first served, while it has
+        seats left. Call it with the course locked, see _lock_course.
+
+        Parameters:
+        - course_id (str): The course ID.
+
+        Returns:
+        - list[dict]: The enrollments of the promoted students.
+        """
+        capacity = self.get_capacity(course_id)
+        waitlist = self.get_waitlist(course_id)
+        promoted = []
+
+        if capacity is not None:
+            waitlist = waitlist[:max(0, capacity - self.count_enrollments(course_id))]
+
+        for entry in waitlist:
+            now = get_current_datetime()
+            enrollment = {'id': get_unique_id(), 'user_id': entry['user_id'], 'course_id': course_id,
+                          'creator': entry['creator'], 'created_at': now, 'updated_at': now}
+
+            try:
+                self.write_enrollment(enrollment)
+                promoted.append(enrollment)
+            except CourseFullError:
+                break
+            except ValueError:
+                # Enrolled meanwhile, the entry is only dropped
+                pass
+
+            self.delete_waitlist_entry(entry['id'])
+
+        return promoted
@@ -0,0 +1,145 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import classes.database as database_module
+
+
+class DatabasePool:
+    def __init__(self, root_path='tenants', memory_budget=256 * 2 ** 20, max_tenants=None, max_workers=None, **database_options):
+        """
+        Initialize a DatabasePool object, a registry of tenant databases stored in
+        one folder each under root_path.
+
+        Databases are opened on first use and kept open, with their indexes and caches,
+        in least recently used order. The least recently used tenants are closed once the
+        estimated memory of the open tenants exceeds memory_budget, or once there are more
+        than max_tenants. Every tenant runs its parallel scans on one shared process pool.
+
+        Parameters:
+        - root_path (str): Optional. The folder holding a folder for each tenant.
+        - memory_budget (int): Optional. Estimated bytes of indexes and caches to keep in memory.
+        - max_tenants (int): Optional. Maximum number of open tenants, unlimited by default.
+        - max_workers (int): Optional. Number of worker processes shared by every tenant.
+        - database_options: Optional. Other keyword arguments passed to every Database.
+        """
+        self.root_path = root_path
+        self.memory_budget = memory_budget
+        self.max_tenants = max_tenants
+        self.max_workers = max_workers
+        self.database_options = database_options
+        self.lock = threading.RLock()
+        # Worker processes only start once a scan is submitted
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        # Open databases from least to most recently used, and their estimated memory when last measured
+        self._databases: OrderedDict[str, database_module.Database] = OrderedDict()
+        self._memory: dict[str, int] = {}
+        self._total_memory = 0
+
+        os.makedirs(root_path, exist_ok=True)
+
+    def __len__(self):
+        return len(self._databases)
+
+    def __contains__(self, name: str):
+        return name in self._databases
+
+    def get_tenant_names(self):
+        """
+        Get the names of every tenant stored under the root folder, open or not.
+
+        Returns:
+        - list[str]: The tenant names.
+        """
+        return sorted(entry.name for entry in os.scandir(self.root_path) if entry.is_dir())
+
+    def _measure(self, name: str):
+        """
+        Update the memory estimate of an open tenant. The lock must be held.
+
+        Parameters:
+        - name (str): The tenant name.
+        """
+        memory = self._databases[name].memory_usage()
+        self._total_memory += memory - self._memory.get(name, 0)
+        self._memory[name] = memory
+
+    def get(self, name: str):
+        """
+        Get the database of a tenant, opening it if needed.
+
+        Parameters:
+        - name (str): The tenant name, also the name of its folder.
+
+        Returns:
+        - Database: The tenant database.
+
+        Raises:
+        - ValueError: If name is not a valid folder name.
+        """
+        if not name or name in ('.', '..') or os.sep in name or (os.altsep and os.altsep in name):
+            raise ValueError(
+                "Invalid tenant name. Names must be plain folder names.")
+
+        with self.lock:
+            # The most recently used tenant is the one whose indexes may have grown since it was measured
+            if self._databases:
+                self._measure(next(reversed(self._databases)))
+
+            db = self._databases.get(name)
+
+            if db is None:
+                db = database_module.Database(
+                    folder_path=os.path.join(self.root_path, name), max_workers=self.max_workers,
+                    executor=self.executor, **self.database_options)
+                self._databases[name] = db
+
+            self._databases.move_to_end(name)
+            self._measure(name)
+            self._evict()
+
+        return db
+
+    def _evict(self):
+        """
+        Close the least recently used tenants until the open ones fit the limits. The most
+        recently used tenant is always kept. The lock must be held.
+        """
+        while len(self._databases) > 1 and (self._total_memory > self.memory_budget or
+                                            (self.max_tenants is not None and len(self._databases) > self.max_tenants)):
+            self.evict(next(iter(self._databases)))
+
+    def evict(self, name: str):
+        """
+        Close the database of a tenant if it is open. Its files stay on disk.
+
+        Parameters:
+        - name (str): The tenant name.
+        """
+        with self.lock:
+            db = self._databases.pop(name, None)
+            self._total_memory -= self._memory.pop(name, 0)
+
+        if db is not None:
+            db.close()
+
+    def memory_usage(self):
+        """
+        Get the estimated memory of the open tenants, as last measured.
+
+        Returns:
+        - int: The estimated size in bytes.
+        """
+        return self._total_memory
+
+    def close(self):
+        """
+        Close every open tenant and stop the shared process pool.
+        """
+        with self.lock:
+            names = list(self._databases)
+
+        for name in names:
+            self.evict(name)
+
+        self.executor.shutdown()
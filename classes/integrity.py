@@ -0,0 +1,107 @@
+import io
+from operator import itemgetter
+from classes.table_file import iter_records
+
+
+class IntegrityReport:
+    def __init__(self):
+        """
+        Initialize an IntegrityReport object, the problems found by Database.check_integrity.
+        """
+        # Enrollment id and the missing reference ('user' or 'course')
+        self.orphaned_enrollments: list[tuple[str, str]] = []
+        # Enrollment id of a repeated user and course pair, and the id of its earliest enrollment
+        self.duplicate_enrollments: list[tuple[str, str]] = []
+        # User ids sharing a username, in file order
+        self.duplicate_usernames: dict[str, list[str]] = {}
+        # Enrollment id, name column, stored name and current name
+        self.stale_names: list[tuple[str, str, str, str]] = []
+        self.users_checked = 0
+        self.courses_checked = 0
+        self.enrollments_checked = 0
+
+    def __bool__(self):
+        return bool(self.orphaned_enrollments or self.duplicate_enrollments or
+                    self.duplicate_usernames or self.stale_names)
+
+    def get_removed_enrollments(self):
+        """
+        Get the enrollments a repair drops: orphans and every duplicate but the earliest.
+
+        Returns:
+        - set[str]: The enrollment ids.
+        """
+        return {id for id, _ in self.orphaned_enrollments} | {id for id, _ in self.duplicate_enrollments}
+
+    def __str__(self):
+        return self.format()
+
+    def format(self, limit=None):
+        """
+        Describe the problems found.
+
+        Parameters:
+        - limit (int): Optional. The maximum number of problems listed of each kind, every problem by default.
+
+        Returns:
+        - str: The report.
+        """
+        sections = [
+            ("Orphaned enrollments", [f"{id}: no {reference} with that id"
+                                      for id, reference in self.orphaned_enrollments[:limit]], len(self.orphaned_enrollments)),
+            ("Duplicate enrollments", [f"{id}: same user and course as {kept_id}"
+                                       for id, kept_id in self.duplicate_enrollments[:limit]], len(self.duplicate_enrollments)),
+            ("Duplicate usernames", [f"{username}: {', '.join(ids)}"
+                                     for username, ids in list(self.duplicate_usernames.items())[:limit]], len(self.duplicate_usernames)),
+            ("Stale names", [f"{id}: {field} is '{stored}' instead of '{current}'"
+                             for id, field, stored, current in self.stale_names[:limit]], len(self.stale_names)),
+        ]
+        lines = [f"Checked {self.users_checked} user(s), {self.courses_checked} course(s) "
+                 f"and {self.enrollments_checked} enrollment(s)."]
+
+        for title, problems, count in sections:
+            lines.append(f"{title}: {count}")
+            lines.extend(f"  {problem}" for problem in problems)
+            if count > len(problems):
+                lines.append(f"  ... and {count - len(problems)} more")
+
+        return "\n".join(lines)
+
+
+def read_enrollment_references(file_path: str, start: int, end: int, header: list[str]):
+    """
+    Read the references of every enrollment version in a byte range of an enrollments file.
+    Meant to run in a worker process, returning tuples keeps the results cheap to send back.
+
+    Parameters:
+    - file_path (str): The path of the CSV file.
+    - start (int): The offset of the first record, at a record boundary.
+    - end (int): The offset to stop reading at, at a record boundary.
+    - header (list[str]): The field names of the file.
+
+    Returns:
+    - list[tuple]: The offset, id, user id and course id of each record, followed by its
+      stored username and course name if the file has name columns.
+    """
+    fields = ['id', 'user_id', 'course_id', *(field for field in ['username', 'course_name'] if field in header)]
+    get_references = itemgetter(*(header.index(field) for field in fields))
+
+    with open(file_path, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    # Without quotes, every line is a record and every comma separates fields, which is
+    # much faster to split than to parse. ASCII keeps character and byte offsets equal.
+    if b'"' in data or not data.isascii():
+        return [(start + offset, *get_references(record)) for offset, _, record in iter_records(io.BytesIO(data))]
+
+    references = []
+    offset = start
+
+    for line in data.decode('ascii').split('\n')[:-1]:
+        record = line.rstrip('\r')
+        if record:
+            references.append((offset, *get_references(record.split(','))))
+        offset += len(line) + 1
+
+    return references
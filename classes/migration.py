@@ -0,0 +1,200 @@
+import os
+import json
+from classes.table_file import encode_record, iter_records
+
+
+class Migration:
+    def __init__(self, version: int, record_type: str, description: str, add=None, drop=None, rename=None):
+        """
+        Initialize a Migration object, a change to the columns of the files of a record type.
+
+        Migrations are idempotent: upgrading a row or a header that was already upgraded
+        leaves it unchanged, so readers can upgrade rows while a file is being migrated.
+
+        Parameters:
+        - version (int): The schema version the migration upgrades to.
+        - record_type (str): The type of record (user, course, or enrollment).
+        - description (str): What the migration changes.
+        - add (dict[str, str]): Optional. New fields and the value of rows written before them.
+        - drop (list[str]): Optional. Fields to remove.
+        - rename (dict[str, str]): Optional. New names of fields, keyed by their old names.
+        """
+        self.version = version
+        self.record_type = record_type
+        self.description = description
+        self.add = add or {}
+        self.drop = drop or []
+        self.rename = rename or {}
+
+    def __repr__(self):
+        return f"Migration({self.version}, {self.record_type!r}, {self.description!r})"
+
+    def upgrade_header(self, header: list[str]):
+        """
+        Get the fields of a file after the migration.
+
+        Parameters:
+        - header (list[str]): The fields before the migration.
+
+        Returns:
+        - list[str]: The fields after the migration.
+        """
+        header = [self.rename.get(field, field) for field in header if field not in self.drop]
+        return [*header, *(field for field in self.add if field not in header)]
+
+    def upgrade_row(self, row: dict):
+        """
+        Upgrade a row in place.
+
+        Parameters:
+        - row (dict): The row.
+
+        Returns:
+        - dict: The upgraded row.
+        """
+        for field in self.drop:
+            row.pop(field, None)
+
+        for old_field, new_field in self.rename.items():
+            if old_field in row:
+                row[new_field] = row.pop(old_field)
+
+        for field, default in self.add.items():
+            row.setdefault(field, default)
+
+        return row
+
+
+# Every schema change, in version order. Append new migrations, never edit released ones.
+MIGRATIONS = [
+    Migration(1, 'enrollment', "Drop the username and course_name columns, names are read from users and courses",
+              drop=['username', 'course_name']),
+    Migration(1, 'course', "Add the capacity column, empty for courses without an enrollment limit",
+              add={'capacity': ''}),
+]
+
+
+def get_schema_version(record_type: str):
+    """
+    Get the current schema version of a record type.
+
+    Parameters:
+    - record_type (str): The type of record (user, course, or enrollment).
+
+    Returns:
+    - int: The version of the latest migration of the record type, 0 if it has none.
+    """
+    return max((migration.version for migration in MIGRATIONS if migration.record_type == record_type), default=0)
+
+
+def get_migrations(record_type: str, version: int):
+    """
+    Get the migrations a file of a record type still needs.
+
+    Parameters:
+    - record_type (str): The type of record (user, course, or enrollment).
+    - version (int): The schema version of the file.
+
+    Returns:
+    - list[Migration]: The migrations to apply, in version order.
+    """
+    return sorted((migration for migration in MIGRATIONS
+                   if migration.record_type == record_type and migration.version > version),
+                  key=lambda migration: migration.version)
+
+
+def read_schema_versions(file_path: str):
+    """
+    Read the schema version of every table file of a database.
+
+    Parameters:
+    - file_path (str): The path of the schema file.
+
+    Returns:
+    - dict[str, int]: The schema versions, keyed by file name. Files without a version are at version 0.
+    """
+    try:
+        with open(file_path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def write_schema_versions(file_path: str, versions: dict[str, int]):
+    """
+    Atomically replace the schema versions of a database.
+
+    Parameters:
+    - file_path (str): The path of the schema file.
+    - versions (dict[str, int]): The schema versions, keyed by file name.
+    """
+    temp_path = f"{file_path}.tmp"
+
+    with open(temp_path, 'w') as file:
+        json.dump(versions, file, indent=2, sort_keys=True)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temp_path, file_path)
+
+
+def migrate_table(table, migrations: list[Migration]):
+    """
+    Rewrite a table file through migrations without blocking its readers and writers.
+
+    Records are streamed one at a time into a temporary file, so memory use doesn't grow
+    with the table. Records appended meanwhile are copied once the bulk is done, the last
+    ones while holding the file lock of the table, which every process takes to append,
+    and the temporary file then atomically replaces the original. Every version and tombstone is kept, compact the table to drop them.
+
+    Parameters:
+    - table (TableFile): The table.
+    - migrations (list[Migration]): The migrations to apply, in version order.
+
+    Returns:
+    - int: The number of records migrated.
+    """
+    temp_path = f"{table.file_path}.migrate"
+
+    while True:
+        migrated = 0
+
+        with open(table.file_path, 'rb') as source:
+            header, position = next(((fields, end) for _, end, fields in iter_records(source)), (table.field_names, 0))
+            new_header = header
+            for migration in migrations:
+                new_header = migration.upgrade_header(new_header)
+            id_position = header.index('id')
+
+            def copy(target):
+                nonlocal position, migrated
+                for _, end, fields in iter_records(source, position):
+                    # Tombstones stay tombstones, whatever default values new fields have
+                    if not any(value for index, value in enumerate(fields) if index != id_position):
+                        record = [fields[id_position] if field == 'id' else '' for field in new_header]
+                    else:
+                        row = dict(zip(header, fields))
+                        for migration in migrations:
+                            migration.upgrade_row(row)
+                        record = [row.get(field, '') for field in new_header]
+                    target.write(encode_record(record))
+                    position = end
+                    migrated += 1
+
+            with open(temp_path, 'wb') as target:
+                target.write(encode_record(new_header))
+                copy(target)
+
+                with table.file_lock:
+                    copy(target)
+
+                    # A compaction replaced the file meanwhile, start over from the new one
+                    stat, source_stat = os.stat(table.file_path), os.fstat(source.fileno())
+                    if (stat.st_dev, stat.st_ino) != (source_stat.st_dev, source_stat.st_ino):
+                        continue
+
+                    target.flush()
+                    os.fsync(target.fileno())
+                    os.replace(temp_path, table.file_path)
+
+        return migrated
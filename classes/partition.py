@@ -0,0 +1,117 @@
+import os
+import re
+import csv
+import json
+
+# Manifest of the enrollment partitions of past terms, oldest first
+PARTITIONS_FILE = 'partitions.json'
+# Term names end up in file names
+TERM_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+
+
+def get_partition_file_name(term: str, archived=False):
+    """
+    Get the file name of the enrollment partition of a term.
+
+    Parameters:
+    - term (str): The name of the term.
+    - archived (bool): Optional. Whether the partition is compressed into blocks.
+
+    Returns:
+    - str: The file name, which never matches the name of an enrollment shard.
+    """
+    return f"enrollments.term-{term}.{'blk' if archived else 'csv'}"
+
+
+def read_partitions(file_path: str):
+    """
+    Read the enrollment partitions of the past terms of a database.
+
+    Parameters:
+    - file_path (str): The path of the partition manifest.
+
+    Returns:
+    - list[dict]: The name (term), key range of created_at (start, last), both None if the partition is empty,
+      end of the term (end), file name (file), number of rows (rows) and schema version (version) of each
+      partition, oldest first. Empty if no term was closed.
+    """
+    try:
+        with open(file_path, 'r') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return []
+
+
+def write_partitions(file_path: str, partitions: list[dict]):
+    """
+    Atomically replace the enrollment partitions of a database.
+
+    Parameters:
+    - file_path (str): The path of the partition manifest.
+    - partitions (list[dict]): The partitions, see read_partitions.
+    """
+    temp_path = f"{file_path}.tmp"
+
+    with open(temp_path, 'w') as file:
+        json.dump(partitions, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temp_path, file_path)
+
+
+def get_key_range(start, last, value: str):
+    """
+    Widen the key range of a partition to a value.
+
+    Parameters:
+    - start (str or None): The lowest value so far, None if there is none.
+    - last (str or None): The highest value so far, None if there is none.
+    - value (str): The value.
+
+    Returns:
+    - tuple[str, str]: The new lowest and highest values.
+    """
+    return (value if start is None else min(start, value)), (value if last is None else max(last, value))
+
+
+def overlaps(partition: dict, bounds):
+    """
+    Check if the key range of a partition overlaps the created_at range of a query.
+
+    Parameters:
+    - partition (dict): The partition.
+    - bounds (tuple[str, str] or None): The range of the query, see Predicate.get_bounds. None if unbounded.
+
+    Returns:
+    - bool: True if the partition may hold matching rows, False otherwise.
+    """
+    if partition['start'] is None:
+        return False
+
+    if bounds is None:
+        return True
+
+    low, high = bounds
+
+    return (high is None or partition['start'] < high) and (low is None or low <= partition['last'])
+
+
+def iter_partition_rows(file_path: str):
+    """
+    Read every row of a partition file, plain CSV or compressed blocks. Partitions only
+    hold the latest version of each row, so no version is skipped.
+
+    Parameters:
+    - file_path (str): The path of the partition file.
+
+    Yields:
+    - dict: A dictionary for each row.
+    """
+    if file_path.endswith('.blk'):
+        from classes.block_table import BlockTable
+        yield from BlockTable(file_path).iter_rows()
+        return
+
+    with open(file_path, 'r', newline='') as file:
+        yield from csv.DictReader(file)
@@ -0,0 +1,442 @@
+from classes.table_file import estimate_dict_size
+
+
+class Predicate:
+    """
+    Base class of query conditions. Predicates are callables that take a row and can be
+    sent to worker processes. Combine them with & and |.
+    """
+
+    def __call__(self, row: dict):
+        raise NotImplementedError
+
+    def __and__(self, other: 'Predicate'):
+        return And(self, other)
+
+    def __or__(self, other: 'Predicate'):
+        return Or(self, other)
+
+    def get_fields(self):
+        """
+        Get the fields the predicate reads.
+
+        Returns:
+        - set[str]: The field names.
+        """
+        raise NotImplementedError
+
+    def get_values(self, field: str):
+        """
+        Get the values a field must have for a row to match, the keys to look up in an index on that field.
+
+        Parameters:
+        - field (str): The field name.
+
+        Returns:
+        - set[str] or None: The possible values, None if the predicate doesn't restrict the field to a set of values.
+        """
+        return None
+
+    def get_bounds(self, field: str):
+        """
+        Get the range a field must be in for a row to match, to skip files whose values are all outside it.
+
+        Parameters:
+        - field (str): The field name.
+
+        Returns:
+        - tuple[str, str] or None: The lowest possible value and the first value above the range, either None
+          if unbounded. None if the predicate doesn't restrict the field.
+        """
+        values = self.get_values(field)
+
+        if values is None:
+            return None
+
+        # The smallest string above a value is the value followed by the lowest character
+        return (min(values), max(values) + '\0') if values else ('', '')
+
+
+class Eq(Predicate):
+    def __init__(self, field: str, value: str):
+        """
+        Initialize an Eq object, matching rows whose field equals a value.
+
+        Parameters:
+        - field (str): The field name.
+        - value (str): The value.
+        """
+        self.field = field
+        self.value = value
+
+    def __call__(self, row: dict):
+        return row.get(self.field) == self.value
+
+    def __repr__(self):
+        return f"Eq({self.field!r}, {self.value!r})"
+
+    def get_fields(self):
+        return {self.field}
+
+    def get_values(self, field: str):
+        return {self.value} if field == self.field else None
+
+
+class In(Predicate):
+    def __init__(self, field: str, values):
+        """
+        Initialize an In object, matching rows whose field has one of several values.
+
+        Parameters:
+        - field (str): The field name.
+        - values (Iterable[str]): The values.
+        """
+        self.field = field
+        self.values = frozenset(values)
+
+    def __call__(self, row: dict):
+        return row.get(self.field) in self.values
+
+    def __repr__(self):
+        return f"In({self.field!r}, {sorted(self.values)!r})"
+
+    def get_fields(self):
+        return {self.field}
+
+    def get_values(self, field: str):
+        return set(self.values) if field == self.field else None
+
+
+class Range(Predicate):
+    def __init__(self, field: str, low=None, high=None):
+        """
+        Initialize a Range object, matching rows whose field is at least low and below high.
+        Values are compared as strings, which orders ISO dates and ULIDs by time.
+
+        Parameters:
+        - field (str): The field name.
+        - low (str): Optional. The lowest matching value, unbounded by default.
+        - high (str): Optional. The first value above the range, unbounded by default.
+        """
+        self.field = field
+        self.low = low
+        self.high = high
+
+    def __call__(self, row: dict):
+        value = row.get(self.field)
+        return value is not None and (self.low is None or value >= self.low) and (self.high is None or value < self.high)
+
+    def __repr__(self):
+        return f"Range({self.field!r}, {self.low!r}, {self.high!r})"
+
+    def get_fields(self):
+        return {self.field}
+
+    def get_bounds(self, field: str):
+        return (self.low, self.high) if field == self.field else None
+
+
+class And(Predicate):
+    def __init__(self, *predicates: Predicate):
+        """
+        Initialize an And object, matching rows that match every predicate.
+
+        Parameters:
+        - predicates (Predicate): The predicates.
+        """
+        self.predicates = predicates
+
+    def __call__(self, row: dict):
+        return all(predicate(row) for predicate in self.predicates)
+
+    def __repr__(self):
+        return f"And({', '.join(map(repr, self.predicates))})"
+
+    def get_fields(self):
+        return set().union(*(predicate.get_fields() for predicate in self.predicates))
+
+    def get_values(self, field: str):
+        values = None
+
+        for predicate in self.predicates:
+            predicate_values = predicate.get_values(field)
+            if predicate_values is not None:
+                values = predicate_values if values is None else values & predicate_values
+
+        return values
+
+    def get_bounds(self, field: str):
+        low = high = None
+        bounded = False
+
+        for predicate in self.predicates:
+            bounds = predicate.get_bounds(field)
+            if bounds is None:
+                continue
+            bounded = True
+            if bounds[0] is not None and (low is None or bounds[0] > low):
+                low = bounds[0]
+            if bounds[1] is not None and (high is None or bounds[1] < high):
+                high = bounds[1]
+
+        return (low, high) if bounded else None
+
+
+class Or(Predicate):
+    def __init__(self, *predicates: Predicate):
+        """
+        Initialize an Or object, matching rows that match any predicate.
+
+        Parameters:
+        - predicates (Predicate): The predicates.
+        """
+        self.predicates = predicates
+
+    def __call__(self, row: dict):
+        return any(predicate(row) for predicate in self.predicates)
+
+    def __repr__(self):
+        return f"Or({', '.join(map(repr, self.predicates))})"
+
+    def get_fields(self):
+        return set().union(*(predicate.get_fields() for predicate in self.predicates))
+
+    def get_values(self, field: str):
+        values = set()
+
+        for predicate in self.predicates:
+            predicate_values = predicate.get_values(field)
+            # One branch that can match any value leaves the field unrestricted
+            if predicate_values is None:
+                return None
+            values |= predicate_values
+
+        return values
+
+    def get_bounds(self, field: str):
+        bounds = [predicate.get_bounds(field) for predicate in self.predicates]
+
+        if not bounds or None in bounds:
+            return None
+
+        lows, highs = [low for low, _ in bounds], [high for _, high in bounds]
+
+        return (None if None in lows else min(lows), None if None in highs else max(highs))
+
+
+def to_predicate(where):
+    """
+    Convert a query condition to a predicate.
+
+    Parameters:
+    - where (Predicate, dict or None): A predicate, or a dictionary of field values that must all match.
+
+    Returns:
+    - Predicate or None: The predicate, None if every row matches.
+    """
+    if isinstance(where, dict):
+        return And(*(Eq(field, value) for field, value in where.items())) if where else None
+
+    return where
+
+
+class SecondaryIndex:
+    def __init__(self, table, field: str):
+        """
+        Initialize a SecondaryIndex object, a hash index from the values of a field of a
+        table file to the ids of the live records that have them.
+
+        The index is built by one scan on first use and kept up to date through the table
+        listeners, rereading only the records that changed since it was last used.
+
+        Parameters:
+        - table (TableFile): The indexed table.
+        - field (str): The indexed field.
+        """
+        self.table = table
+        self.field = field
+        self._ids: dict[str, set[str]] | None = None
+        self._values: dict[str, str] = {}
+        self._changed: set[str] = set()
+        table.listeners.append(self._invalidate)
+
+    def _invalidate(self, id):
+        """
+        Remember a changed record, or drop the whole index when every record may have changed.
+
+        Parameters:
+        - id (str or None): The id of the changed record, or None.
+        """
+        if id is None:
+            self._ids = None
+        elif self._ids is not None:
+            self._changed.add(id)
+
+    def _set(self, id: str, value):
+        """
+        Point the index at the current value of a record.
+
+        Parameters:
+        - id (str): The id of the record.
+        - value (str or None): The value of the field, None if the record was deleted.
+        """
+        previous = self._values.pop(id, None)
+
+        if previous is not None:
+            ids = self._ids[previous]
+            ids.discard(id)
+            if not ids:
+                del self._ids[previous]
+
+        if value is not None:
+            self._values[id] = value
+            self._ids.setdefault(value, set()).add(id)
+
+    def lookup(self, values):
+        """
+        Get the ids of the records whose field has one of several values.
+
+        Parameters:
+        - values (Iterable[str]): The values to look up.
+
+        Returns:
+        - set[str]: The ids of the matching live records.
+        """
+        with self.table.lock:
+            self._catch_up()
+            return set().union(*(self._ids.get(value, ()) for value in values))
+
+    def _catch_up(self):
+        """
+        Bring the index up to date with the table, building it on first use. Call it with the table locked.
+        """
+        self.table.refresh()
+
+        if self._ids is None:
+            self._ids = {}
+            self._values = {}
+            self._changed.clear()
+            for row in self.table.live_records():
+                self._set(row['id'], row.get(self.field))
+
+        for id in self._changed:
+            row = self.table.read(id)
+            self._set(id, row.get(self.field) if row else None)
+        self._changed.clear()
+
+    def memory_usage(self):
+        """
+        Estimate the memory held by the index.
+
+        Returns:
+        - int: The estimated size in bytes, 0 if it wasn't built yet.
+        """
+        with self.table.lock:
+            ids, values = self._ids, self._values
+
+        return estimate_dict_size(ids or {}) + estimate_dict_size(values)
+
+
+class CountIndex(SecondaryIndex):
+    def __init__(self, table, field: str):
+        """
+        Initialize a CountIndex object, the number of live records of a table file having
+        each value of a field, e.g. the enrollments of each course.
+
+        Like a SecondaryIndex, it is built by one scan on first use and then kept up to date
+        by rereading only the records that changed, whichever process wrote them. Counting
+        therefore costs no scan, and counts read while holding a lock that every writer
+        takes are exact. The value of every live record is kept, to know which count a
+        deletion decreases.
+
+        Parameters:
+        - table (TableFile): The indexed table.
+        - field (str): The counted field.
+        """
+        super().__init__(table, field)
+        # The number of live records, keyed by value, instead of their ids
+        self._ids: dict[str, int] | None = None
+
+    def _set(self, id: str, value):
+        """
+        Move a record to the count of its current value.
+
+        Parameters:
+        - id (str): The id of the record.
+        - value (str or None): The value of the field, None if the record was deleted.
+        """
+        previous = self._values.pop(id, None)
+
+        if previous is not None:
+            self._ids[previous] -= 1
+            if not self._ids[previous]:
+                del self._ids[previous]
+
+        if value is not None:
+            self._values[id] = value
+            self._ids[value] = self._ids.get(value, 0) + 1
+
+    def count(self, value: str):
+        """
+        Get the number of live records having a value.
+
+        Parameters:
+        - value (str): The value.
+
+        Returns:
+        - int: The number of records.
+        """
+        with self.table.lock:
+            self._catch_up()
+            return self._ids.get(value, 0)
+
+
+class QueryPlan:
+    def __init__(self, record_type: str, where, access: str, file_paths: list[str]):
+        """
+        Initialize a QueryPlan object, describing how a query reads its rows.
+
+        Parameters:
+        - record_type (str): The type of record queried.
+        - where (Predicate or None): The condition rows must match.
+        - access (str): How rows are found: 'id lookup', 'index on <field>', 'shard scan' or 'full scan'.
+        - file_paths (list[str]): The files read.
+        """
+        self.record_type = record_type
+        self.where = where
+        self.access = access
+        self.file_paths = file_paths
+        # Partitions of past terms read after pruning, None if history isn't read, and their total number
+        self.history: list[dict] | None = None
+        self.partitions = 0
+        # Ids to read by id lookup or index, keyed by file path
+        self.ids: dict[str, set[str]] = {}
+        self.fields: list[str] | None = None
+        self.order_by: list[str] = []
+        self.limit = None
+        self.offset = 0
+        # Whether the files were scanned side by side by the process pool
+        self.parallel = False
+        self.rows_examined = 0
+        self.rows_returned = 0
+
+    def __str__(self):
+        lines = [
+            f"query {self.record_type}",
+            f"  access: {self.access} of {', '.join(self.file_paths) or 'no files'}{' in parallel' if self.parallel else ''}",
+            f"  filter: {self.where!r}",
+            *([f"  history: {len(self.history)} of {self.partitions} partition(s) scanned{': ' if self.history else ''}"
+               f"{', '.join(partition['file'] for partition in self.history)}"] if self.history is not None else []),
+            f"  fields: {', '.join(self.fields) if self.fields else 'all'}",
+        ]
+
+        if self.order_by:
+            method = "top-k heap" if self.limit is not None else "sort"
+            lines.append(f"  order by: {', '.join(self.order_by)} ({method})")
+        if self.limit is not None or self.offset:
+            stop = "stops reading early" if not self.order_by else "bounded by the heap"
+            lines.append(f"  limit: {self.limit}, offset: {self.offset} ({stop})")
+
+        lines.append(f"  rows examined: {self.rows_examined}, rows returned: {self.rows_returned}")
+
+        return "\n".join(lines)
@@ -0,0 +1,93 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class RenderCache:
+    def __init__(self, max_bytes=8 * 2 ** 20):
+        """
+        Initialize a RenderCache object, an LRU cache of rendered text bounded by its size in memory.
+
+        Keys should include the version of the data the text was rendered from, so a
+        changed table misses the cache and its stale entries age out.
+
+        Parameters:
+        - max_bytes (int): Optional. Maximum memory of the cached text, in bytes.
+        """
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """
+        Get the memory of the cached text.
+
+        Returns:
+        - int: The size in bytes.
+        """
+        return self._bytes
+
+    def get(self, key: tuple):
+        """
+        Get cached text, marking it as recently used.
+
+        Parameters:
+        - key (tuple): The cache key.
+
+        Returns:
+        - str or None: The cached text if there is one, None otherwise.
+        """
+        with self.lock:
+            text = self._entries.get(key)
+
+            if text is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return text
+
+    def put(self, key: tuple, text: str):
+        """
+        Cache text, evicting the least recently used entries to stay within max_bytes.
+        Text larger than max_bytes is not cached.
+
+        Parameters:
+        - key (tuple): The cache key.
+        - text (str): The rendered text.
+
+        Returns:
+        - str: The text.
+        """
+        size = sys.getsizeof(text)
+
+        with self.lock:
+            if key in self._entries:
+                self._bytes -= sys.getsizeof(self._entries.pop(key))
+
+            if size > self.max_bytes:
+                return text
+
+            while self._entries and self._bytes + size > self.max_bytes:
+                self._bytes -= sys.getsizeof(self._entries.popitem(last=False)[1])
+
+            self._entries[key] = text
+            self._bytes += size
+
+        return text
+
+    def clear(self):
+        """
+        Remove every cached entry.
+        """
+        with self.lock:
+            self._entries.clear()
+            self._bytes = 0
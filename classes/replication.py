@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import threading
+from contextlib import ExitStack
+import classes.database as database_class
+from classes.backup import BACKUP_SUFFIXES, copy_range, get_checksum, get_record_end
+
+# State of a folder written by a LogShipper, never shipped itself
+REPLICATION_STATE_FILE = 'replication.json'
+# Files read first can only reference rows of files read after them, since a change is
+# logged after its row and an enrollment or waitlist entry is written after its user and course
+SHIP_ORDER = ('changes', 'enrollments', 'waitlist', 'courses', 'users')
+
+
+def get_ship_rank(name: str):
+    """
+    Get the position of a file in the order files are read in.
+
+    Parameters:
+    - name (str): The file name.
+
+    Returns:
+    - int: The rank, lower ranks are read first.
+    """
+    return next((rank for rank, prefix in enumerate(SHIP_ORDER) if name.startswith(prefix)), len(SHIP_ORDER))
+
+
+class LogShipper:
+    def __init__(self, source_path: str, target_path: str):
+        """
+        Initialize a LogShipper object, which keeps a folder a copy of a database folder.
+
+        Tables only grow by appends, so each call to ship copies only the records appended
+        to each file since the previous one. A file is copied in full the first time, and
+        again once it shrank or the bytes before its last shipped offset changed, e.g. after
+        a compaction, a migration or a reshard. The target folder records how far each file
+        was shipped, so shipping resumes from there after a restart.
+
+        Shipping from the primary into a transport folder (e.g. a mounted share), and from
+        there into the folder of a replica, keeps the replica off the files of the primary.
+
+        Parameters:
+        - source_path (str): The database folder, or a folder shipped from it.
+        - target_path (str): The folder to copy it to.
+        """
+        self.source_path = source_path
+        self.target_path = target_path
+        self.state_file = os.path.join(target_path, REPLICATION_STATE_FILE)
+        self.state = self._read_state(self.state_file)
+
+    def _read_state(self, file_path: str):
+        """
+        Read the replication state of a folder.
+
+        Parameters:
+        - file_path (str): The path of the state file.
+
+        Returns:
+        - dict: The shipped offset, checksum and source file status of each file (files),
+          and the time the source was read at (snapshot_time), None if it never was.
+        """
+        try:
+            with open(file_path, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {'files': {}, 'snapshot_time': None}
+
+    def _write_state(self):
+        """
+        Atomically replace the replication state of the target folder.
+        """
+        temp_path = f"{self.state_file}.tmp"
+
+        with open(temp_path, 'w') as file:
+            json.dump(self.state, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(temp_path, self.state_file)
+
+    def _get_source_files(self):
+        """
+        Get the files to ship, in the order they are read in.
+
+        Returns:
+        - list[str]: The file names.
+        """
+        names = [entry.name for entry in os.scandir(self.source_path)
+                 if entry.is_file() and entry.name.endswith(BACKUP_SUFFIXES) and entry.name != REPLICATION_STATE_FILE]
+
+        return sorted(names, key=lambda name: (get_ship_rank(name), name))
+
+    def ship(self):
+        """
+        Copy what was written to the source folder since the previous call.
+
+        Returns:
+        - dict: The number of bytes copied (bytes_copied), and the names of the files
+          copied in full (copied), added (added) and removed (removed).
+        """
+        os.makedirs(self.target_path, exist_ok=True)
+        files = self.state['files']
+        shipped = {'bytes_copied': 0, 'copied': [], 'added': [], 'removed': []}
+
+        # The source may itself be a shipped copy, whose data is as old as its own snapshot
+        source_state = self._read_state(os.path.join(self.source_path, REPLICATION_STATE_FILE))
+        snapshot_time = source_state['snapshot_time'] or time.time()
+
+        with ExitStack() as stack:
+            # Every end is found before anything is copied, in the order of SHIP_ORDER
+            sources = []
+            for name in self._get_source_files():
+                try:
+                    source = stack.enter_context(open(os.path.join(self.source_path, name), 'rb'))
+                except FileNotFoundError:
+                    continue
+
+                stat = os.fstat(source.fileno())
+                status = [stat.st_ino, stat.st_size, stat.st_mtime_ns]
+                state = files.get(name)
+
+                # Untouched since the previous call, nothing to read
+                if state and state['status'] == status and os.path.exists(os.path.join(self.target_path, name)):
+                    sources.append((name, None, status, state['size']))
+                    continue
+
+                end = stat.st_size
+                # Tables may have a record being appended, other files are replaced whole
+                if name.endswith('.csv'):
+                    end = get_record_end(source, end)
+                sources.append((name, source, status, end))
+
+            for name, source, status, end in sources:
+                if source is None:
+                    continue
+
+                target_file = os.path.join(self.target_path, name)
+                state = files.get(name)
+
+                # Appended files still hold the same bytes before the shipped offset
+                if state and state['size'] <= end and os.path.exists(target_file) and \
+                        get_checksum(source, state['size']) == state['checksum']:
+                    with open(target_file, 'r+b') as target:
+                        # Drops bytes copied before a crash that the state doesn't cover yet
+                        if os.fstat(target.fileno()).st_size != state['size']:
+                            target.truncate(state['size'])
+                        target.seek(state['size'])
+                        copy_range(source, target, state['size'], end)
+                        target.flush()
+                        os.fsync(target.fileno())
+                    shipped['bytes_copied'] += end - state['size']
+
+                else:
+                    # Readers of the target see either the old file or the whole new one
+                    with open(f"{target_file}.replica", 'wb') as target:
+                        copy_range(source, target, 0, end)
+                        target.flush()
+                        os.fsync(target.fileno())
+                    os.replace(f"{target_file}.replica", target_file)
+                    shipped['bytes_copied'] += end
+                    shipped['added' if state is None else 'copied'].append(name)
+
+                # A record still being appended keeps the status changed, so it is read again
+                if end != status[1]:
+                    status = None
+                files[name] = {'size': end, 'checksum': get_checksum(source, end), 'status': status}
+
+        # Files deleted from the source, e.g. by a reshard
+        for name in set(files) - {name for name, *_ in sources}:
+            try:
+                os.remove(os.path.join(self.target_path, name))
+            except FileNotFoundError:
+                pass
+            del files[name]
+            shipped['removed'].append(name)
+
+        self.state['snapshot_time'] = snapshot_time
+        self._write_state()
+
+        return shipped
+
+    def get_lag(self):
+        """
+        Get how far the target folder is behind the source folder.
+
+        Returns:
+        - dict: The seconds since the data of the target was read from the primary (seconds,
+          None before the first call to ship), and roughly the bytes written to the source
+          since (pending_bytes).
+        """
+        pending_bytes = 0
+
+        for name in self._get_source_files():
+            try:
+                stat = os.stat(os.path.join(self.source_path, name))
+            except FileNotFoundError:
+                continue
+
+            state = self.state['files'].get(name)
+            if state and state['status'] == [stat.st_ino, stat.st_size, stat.st_mtime_ns]:
+                continue
+            pending_bytes += stat.st_size - state['size'] if state and stat.st_size >= state['size'] else stat.st_size
+
+        snapshot_time = self.state['snapshot_time']
+
+        return {
+            'seconds': time.time() - snapshot_time if snapshot_time is not None else None,
+            'pending_bytes': pending_bytes,
+        }
+
+
+class Replica:
+    def __init__(self, log_path: str, folder_path='replica', interval=0.25, **options):
+        """
+        Initialize a Replica object, a read-only database kept up to date from a folder
+        shipped from the primary, see LogShipper.
+
+        The replica applies what was shipped every interval seconds in a background thread
+        once started, into its own folder with its own table indexes. Read through db, write
+        to the primary: the database of the replica is read-only, it never creates files,
+        such as a default super admin, that the shipped ones would overwrite.
+
+        Parameters:
+        - log_path (str): The folder shipped from the primary, or the folder of the primary itself.
+        - folder_path (str): Optional. The folder of the replica.
+        - interval (float): Optional. Seconds between two applies.
+        - options: Optional. Keyword arguments of the Database, e.g. max_workers.
+
+        Raises:
+        - ValueError: If nothing was shipped from the primary yet.
+        """
+        self.shipper = LogShipper(log_path, folder_path)
+        self.interval = interval
+        self.options = options
+        # The last error of the background thread, e.g. an unreachable transport folder
+        self.error = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.shipper.ship()
+        self.db = database_class.Database(folder_path=folder_path, read_only=True, **options)
+
+    def apply(self):
+        """
+        Apply what was shipped since the previous call.
+
+        Returns:
+        - dict: What was copied, see LogShipper.ship.
+        """
+        shipped = self.shipper.ship()
+
+        # A reshard on the primary adds and removes enrollment files, the database is
+        # reopened with the new layout while the other files keep being refreshed in place
+        if shipped['added'] or shipped['removed']:
+            db, self.db = self.db, database_class.Database(
+                folder_path=self.shipper.target_path, read_only=True, **self.options)
+            db.close()
+
+        return shipped
+
+    def get_lag(self):
+        """
+        Get how far the replica is behind the primary.
+
+        Returns:
+        - dict: The lag in seconds (seconds) and bytes (pending_bytes), see LogShipper.get_lag.
+        """
+        return self.shipper.get_lag()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.apply()
+                self.error = None
+            except (OSError, ValueError) as e:
+                # Retried at the next interval, the lag keeps growing meanwhile
+                self.error = e
+
+    def start(self):
+        """
+        Start applying what is shipped in a background thread.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """
+        Stop the background thread and close the database.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        self.db.close()
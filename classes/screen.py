@@ -0,0 +1,184 @@
+import os
+import sys
+import shutil
+from getpass import getpass
+
+CLEAR_SCREEN = '\x1b[H\x1b[2J'
+CLEAR_LINE = '\x1b[K'
+CLEAR_BELOW = '\x1b[J'
+
+
+def move_to(row: int):
+    """
+    Get the escape sequence that moves the cursor to the start of a terminal row.
+
+    Parameters:
+    - row (int): The one-based terminal row.
+
+    Returns:
+    - str: The ANSI escape sequence.
+    """
+    return f'\x1b[{row};1H'
+
+
+class Screen:
+    def __init__(self, banner='', stream=None):
+        """
+        Initialize a Screen object, a terminal renderer that draws the banner once
+        and redraws only the rows of the screen that changed between frames.
+
+        Output is buffered and written in a single write when the program waits for
+        input, so every menu step costs one write and no subprocess.
+
+        Parameters:
+        - banner (str): Optional. Text drawn once at the top of the screen.
+        - stream (TextIO): Optional. The stream to draw on, defaults to sys.stdout.
+        """
+        self.banner = banner
+        self.stream = stream or sys.stdout
+        # Text printed since the last flush
+        self._pending: list[str] = []
+        # Rows of the current and previous frame below the banner, None where the content is unknown
+        self._rows: list[str | None] = []
+        self._previous: list[str | None] = []
+        self._top = 0
+        self._drawn = False
+        self._awaiting_input = False
+
+    def is_terminal(self):
+        """
+        Check if the screen draws on a terminal that understands ANSI escape sequences.
+
+        Returns:
+        - bool: True if the stream is an ANSI terminal, False otherwise.
+        """
+        return self.stream.isatty() and os.environ.get('TERM') != 'dumb'
+
+    def reset(self):
+        """
+        Start a new frame. The banner is drawn on the first frame only, rows of
+        the previous frame stay on screen until they are overwritten.
+        """
+        self.flush()
+
+        if self._drawn:
+            self._end_input()
+            self._previous = self._rows
+            self._rows = []
+            return
+
+        if self.is_terminal():
+            self.stream.write(CLEAR_SCREEN + self.banner)
+            self._top = self.banner.count('\n')
+        else:
+            self.stream.write(self.banner)
+
+        self.stream.flush()
+        self._drawn = True
+        self._rows = []
+        self._previous = []
+
+    def print(self, *values, sep=' ', end='\n'):
+        """
+        Buffer text for the current frame, like the builtin print.
+
+        Parameters:
+        - values: The values to print.
+        - sep (str): Optional. The separator between values.
+        - end (str): Optional. The text appended after the last value.
+        """
+        self._pending.append(sep.join(str(value) for value in values) + end)
+
+    def input(self, prompt=''):
+        """
+        Draw the frame and read a line of input, like the builtin input.
+
+        Parameters:
+        - prompt (str): Optional. The prompt to show.
+
+        Returns:
+        - str: The line entered by the user.
+        """
+        self.print(prompt, end='')
+        self.flush()
+        return input()
+
+    def getpass(self, prompt=''):
+        """
+        Draw the frame and read a password without echoing it.
+
+        Parameters:
+        - prompt (str): Optional. The prompt to show.
+
+        Returns:
+        - str: The password entered by the user.
+        """
+        self.print(prompt, end='')
+        self.flush()
+        return getpass(prompt='')
+
+    def _end_input(self):
+        """
+        Account for the row used by the last prompt and the user's input.
+        """
+        if self._awaiting_input:
+            self._rows[-1] = None
+            self._awaiting_input = False
+
+    def flush(self):
+        """
+        Write the buffered text in a single write, skipping rows that already show the same content.
+        """
+        text = ''.join(self._pending)
+        self._pending = []
+
+        if not text:
+            return
+
+        if not self._drawn or not self.is_terminal():
+            self.stream.write(text)
+            self.stream.flush()
+            return
+
+        self._end_input()
+        lines = text.split('\n')
+        prompt = lines.pop()
+        columns, height = shutil.get_terminal_size()
+
+        # Rows are addressed absolutely, which only holds while nothing scrolls or wraps
+        if self._top + len(self._rows) + len(lines) + 1 >= height or any(len(line) >= columns for line in [*lines, prompt]):
+            self.stream.write(move_to(self._top + len(self._rows) + 1) + CLEAR_BELOW + text)
+            self.stream.flush()
+            # The screen scrolled, so draw everything from scratch on the next frame
+            self._drawn = False
+            return
+
+        frame = []
+
+        for line in lines:
+            row = len(self._rows)
+            if row >= len(self._previous) or self._previous[row] != line:
+                frame.append(move_to(self._top + row + 1) + line + CLEAR_LINE)
+            self._rows.append(line)
+
+        if prompt:
+            row = len(self._rows)
+            frame.append(move_to(self._top + row + 1) + prompt + CLEAR_BELOW)
+            self._rows.append(prompt)
+            self._previous = self._previous[:row]
+            self._awaiting_input = True
+        else:
+            frame.append(move_to(self._top + len(self._rows) + 1))
+
+        self.stream.write(''.join(frame))
+        self.stream.flush()
+
+    def close(self):
+        """
+        Write any buffered text and clear what is left of the previous frame.
+        """
+        self.flush()
+
+        if self._drawn and self.is_terminal():
+            self.stream.write(CLEAR_BELOW)
+            self.stream.flush()
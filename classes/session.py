@@ -0,0 +1,167 @@
+from __future__ import annotations
+import math
+import time
+import secrets
+import threading
+from typing import TYPE_CHECKING
+from collections import OrderedDict
+from utils.utilities import authenticate_user
+
+if TYPE_CHECKING:
+    import classes.database as database_module
+
+
+class SessionStore:
+    def __init__(self, db: database_module.Database, ttl=30 * 60, max_sessions=10_000):
+        """
+        Initialize a SessionStore object, issuing opaque tokens on login and caching
+        the logged in Admin or Student for each of them.
+
+        Sessions expire after ttl seconds without use, and the least recently used
+        session is dropped once there are more than max_sessions. A cached user is
+        reloaded by id when its record changes, and the session ends if the user was
+        deleted or its password changed, so using a session never scans the users file.
+
+        Parameters:
+        - db (Database): The Database instance.
+        - ttl (float): Optional. Seconds a session stays valid without being used, None to never expire.
+        - max_sessions (int): Optional. Maximum number of sessions kept.
+        """
+        self.db = db
+        self.ttl = ttl if ttl is not None else math.inf
+        self.max_sessions = max_sessions
+        self.lock = threading.Lock()
+        # Sessions from least to most recently used: token -> [user id, user or None, password hash, expiry]
+        self._sessions: OrderedDict[str, list] = OrderedDict()
+        # Tokens of every user with a session, keyed by user id
+        self._tokens: dict[str, set[str]] = {}
+
+        db.subscribe('user', self._invalidate)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _invalidate(self, id):
+        """
+        Drop the cached user of a changed record, keeping its sessions.
+
+        Parameters:
+        - id (str or None): The id of the changed user, or None if any user may have changed.
+        """
+        with self.lock:
+            tokens = self._tokens.get(id, ()) if id is not None else self._sessions
+
+            for token in tokens:
+                self._sessions[token][1] = None
+
+    def _remove(self, token: str):
+        """
+        Remove a session. The lock must be held.
+
+        Parameters:
+        - token (str): The session token.
+        """
+        user_id = self._sessions.pop(token)[0]
+        tokens = self._tokens[user_id]
+        tokens.discard(token)
+
+        if not tokens:
+            del self._tokens[user_id]
+
+    def create(self, user):
+        """
+        Start a session for an authenticated user.
+
+        Parameters:
+        - user (Admin or Student): The authenticated user.
+
+        Returns:
+        - str: The session token.
+        """
+        token = secrets.token_urlsafe(32)
+        now = time.monotonic()
+
+        with self.lock:
+            # The least recently used sessions are the first to expire
+            while self._sessions and (len(self._sessions) >= self.max_sessions or next(iter(self._sessions.values()))[3] <= now):
+                self._remove(next(iter(self._sessions)))
+
+            self._sessions[token] = [user.id, user, user.password, now + self.ttl]
+            self._tokens.setdefault(user.id, set()).add(token)
+
+        return token
+
+    def login(self, username: str, password: str):
+        """
+        Check a username and password and start a session.
+
+        Parameters:
+        - username (str): The username of the user.
+        - password (str): The password of the user.
+
+        Returns:
+        - str or None: The session token if the credentials are valid, None otherwise.
+        """
+        user = authenticate_user(self.db, username, password)
+
+        if not user:
+            return None
+
+        return self.create(user)
+
+    def get(self, token: str):
+        """
+        Get the user of a session, extending it.
+
+        Parameters:
+        - token (str): The session token.
+
+        Returns:
+        - Admin, Student or None: The user if the session is valid, None otherwise.
+        """
+        # Catch up with user changes made since the last call, reading only new rows
+        self.db.refresh('user')
+
+        with self.lock:
+            session = self._sessions.get(token)
+
+            if not session:
+                return None
+
+            now = time.monotonic()
+
+            if session[3] <= now:
+                self._remove(token)
+                return None
+
+            session[3] = now + self.ttl
+            self._sessions.move_to_end(token)
+            user_id, user, password = session[:3]
+
+        if user:
+            return user
+
+        user = self.db.read_user(id=user_id)
+
+        with self.lock:
+            if token not in self._sessions:
+                return None
+
+            if not user or user.password != password:
+                self._remove(token)
+                return None
+
+            self._sessions[token][1] = user
+
+        return user
+
+    def logout(self, token: str):
+        """
+        End a session.
+
+        Parameters:
+        - token (str): The session token.
+        """
+        with self.lock:
+            if token in self._sessions:
+                self._remove(token)
@@ -0,0 +1,527 @@
+import io
+import os
+import csv
+import sys
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    # Windows has no fcntl, msvcrt locks a byte range of the file instead
+    fcntl = None
+    import msvcrt
+
+
+def iter_records(file, start=0, end=None):
+    """
+    Read complete CSV records from a binary file along with their byte offsets.
+
+    Parameters:
+    - file (BinaryIO): The open file to read from.
+    - start (int): Optional. The byte offset of the first record to read.
+    - end (int): Optional. The byte offset to stop reading at.
+
+    Yields:
+    - tuple[int, int, list[str]]: The start offset, end offset and fields of each record.
+    """
+    file.seek(start)
+    position = start
+    quotes = 0
+
+    def lines():
+        nonlocal position, quotes
+        for line in file:
+            # A line without a line ending is still being written
+            if not line.endswith(b'\n'):
+                return
+            position += len(line)
+            quotes += line.count(b'"')
+            yield line.decode('utf-8')
+
+    offset = start
+    for fields in csv.reader(lines()):
+        # An odd number of quotes means the file ended inside a quoted field
+        if quotes % 2:
+            return
+
+        if fields:
+            yield offset, position, fields
+
+        offset = position
+        if end is not None and offset >= end:
+            return
+
+
+def encode_record(fields: list):
+    """
+    Encode fields as a CSV record.
+
+    Parameters:
+    - fields (list): The field values of the record.
+
+    Returns:
+    - bytes: The encoded record, including its line ending.
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(fields)
+    return buffer.getvalue().encode('utf-8')
+
+
+def estimate_dict_size(values: dict):
+    """
+    Estimate the memory held by a dictionary and its entries, from the size of one entry.
+
+    Parameters:
+    - values (dict): The dictionary.
+
+    Returns:
+    - int: The estimated size in bytes.
+    """
+    size = sys.getsizeof(values)
+
+    for key, value in values.items():
+        return size + len(values) * (sys.getsizeof(key) + sys.getsizeof(value))
+
+    return size
+
+
+class TableFile:
+    # Number of records between two checkpoints, the offsets parallel scans split the file at
+    checkpoint_interval = 4096
+
+    def __init__(self, file_path: str, field_names: list[str], read_only=False):
+        """
+        Initialize a TableFile object, an append-only CSV file with an in-memory
+        index of the latest version of every record.
+
+        Updated records are appended as new versions with the same id and deleted
+        records are appended as tombstones, rows where every field but the id is empty.
+
+        Parameters:
+        - file_path (str): The path of the CSV file.
+        - field_names (list[str]): The field names to use when the file has no header.
+        - read_only (bool): Optional. Refuse appends and compactions, the file is written by another copy.
+        """
+        self.file_path = file_path
+        self.field_names = field_names
+        self.read_only = read_only
+        self.lock = threading.RLock()
+        # Taken by appends and rewrites, so other processes don't append to a file being replaced
+        self.file_lock = FileLock(f"{file_path}.lock", self.lock)
+        # Callables notified with the id of every record indexed, or None when the index is rebuilt
+        self.listeners = []
+        self._reset()
+
+    def _reset(self, identity=None):
+        """
+        Forget everything indexed so far.
+
+        Parameters:
+        - identity (tuple): Optional. The device and inode of the indexed file.
+        """
+        self.identity = identity
+        self.header = self.field_names
+        self.id_position = self.header.index('id')
+        # Offset of the latest version of every live record, keyed by id
+        self.offsets: dict[str, int] = {}
+        # Data rows indexed, including superseded versions and tombstones
+        self.rows = 0
+        self.data_offset = 0
+        self.size = 0
+        # Modification time of the file when it was last checked, in nanoseconds
+        self.mtime_ns = 0
+        # Offsets of every checkpoint_interval-th record, always at the start of a record
+        self.checkpoints: list[int] = []
+
+        for listener in self.listeners:
+            listener(None)
+
+    @property
+    def dead_rows(self):
+        """
+        Get the number of superseded versions and tombstones in the file.
+
+        Returns:
+        - int: The number of rows a compaction would remove.
+        """
+        return self.rows - len(self.offsets)
+
+    def refresh(self):
+        """
+        Bring the index up to date with the file, reading only newly appended records.
+        The index is rebuilt from scratch if the file was replaced or truncated.
+
+        Returns:
+        - TableFile: The refreshed TableFile.
+        """
+        with self.lock:
+            stat = os.stat(self.file_path)
+            identity = (stat.st_dev, stat.st_ino)
+
+            if identity != self.identity or stat.st_size < self.size:
+                self._reset(identity)
+            self.mtime_ns = stat.st_mtime_ns
+
+            if stat.st_size > self.size:
+                with open(self.file_path, 'rb') as file:
+                    for offset, end, fields in iter_records(file, self.size):
+                        self._index_record(offset, end, fields)
+                        self.size = end
+
+        return self
+
+    def _index_record(self, offset: int, end: int, fields: list[str]):
+        """
+        Add a record read from the file to the index.
+
+        Parameters:
+        - offset (int): The byte offset of the record.
+        - end (int): The byte offset following the record.
+        - fields (list[str]): The fields of the record.
+        """
+        if offset == 0:
+            self.header = fields
+            self.id_position = fields.index('id')
+            self.data_offset = end
+            return
+
+        id = fields[self.id_position]
+        if self.rows % self.checkpoint_interval == 0:
+            self.checkpoints.append(offset)
+        self.rows += 1
+
+        if self.is_tombstone(fields):
+            self.offsets.pop(id, None)
+        else:
+            self.offsets[id] = offset
+
+        for listener in self.listeners:
+            listener(id)
+
+    def is_tombstone(self, fields: list[str]):
+        """
+        Check if a record marks the deletion of its id.
+
+        Parameters:
+        - fields (list[str]): The fields of the record.
+
+        Returns:
+        - bool: True if every field but the id is empty, False otherwise.
+        """
+        return not any(value for position, value in enumerate(fields) if position != self.id_position)
+
+    def __contains__(self, id: str):
+        with self.lock:
+            return id in self.refresh().offsets
+
+    def __len__(self):
+        with self.lock:
+            return len(self.refresh().offsets)
+
+    def get_version(self):
+        """
+        Get the version of the file contents. Appending a record or replacing the file changes it,
+        even when the new file reuses the inode and size of the old one.
+
+        Returns:
+        - tuple: The device, inode, size and modification time of the file.
+        """
+        with self.lock:
+            self.refresh()
+            return (*self.identity, self.size, self.mtime_ns)
+
+    def memory_usage(self):
+        """
+        Estimate the memory held by the index.
+
+        Returns:
+        - int: The estimated size in bytes.
+        """
+        with self.lock:
+            offsets, checkpoints = self.offsets, self.checkpoints
+
+        return estimate_dict_size(offsets) + sys.getsizeof(checkpoints) + len(checkpoints) * sys.getsizeof(self.size)
+
+    def read(self, id: str):
+        """
+        Read the latest version of a record.
+
+        Parameters:
+        - id (str): The id of the record.
+
+        Returns:
+        - dict or None: The record if it exists, None otherwise.
+        """
+        with self.lock:
+            self.refresh()
+            offset = self.offsets.get(id)
+            if offset is None:
+                return None
+            header = self.header
+            file = open(self.file_path, 'rb')
+
+        with file:
+            for _, _, fields in iter_records(file, offset):
+                return dict(zip(header, fields))
+
+    def live_records(self):
+        """
+        Read the latest version of every record, in file order.
+
+        Yields:
+        - dict: A dictionary for each live record.
+        """
+        with self.lock:
+            self.refresh()
+            # Snapshot the index, a concurrent compaction replaces it wholesale
+            offsets, header, id_position = self.offsets, self.header, self.id_position
+            start, end = self.data_offset, self.size
+            file = open(self.file_path, 'rb')
+
+        with file:
+            if start >= end:
+                return
+
+            for offset, _, fields in iter_records(file, start, end):
+                if offsets.get(fields[id_position]) == offset:
+                    yield dict(zip(header, fields))
+
+    def get_chunks(self, count: int):
+        """
+        Split the indexed records into byte ranges that start and end on record boundaries.
+
+        Parameters:
+        - count (int): The maximum number of chunks.
+
+        Returns:
+        - list[tuple[int, int]]: The start and end offset of each chunk.
+        """
+        with self.lock:
+            checkpoints, end = self.checkpoints, self.size
+
+        if not checkpoints:
+            return []
+
+        step = max(1, -(-len(checkpoints) // count))
+        starts = checkpoints[::step]
+        return list(zip(starts, [*starts[1:], end]))
+
+    def append(self, row: dict):
+        """
+        Append a record, or a new version of an existing record, to the file.
+
+        Parameters:
+        - row (dict): A dictionary representing the record.
+
+        Raises:
+        - ValueError: If the file is read-only.
+        """
+        self._check_writable()
+
+        with self.file_lock:
+            with open(self.file_path, 'a', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=self.refresh().header)
+                if file.tell() == 0:
+                    writer.writeheader()
+                writer.writerow(row)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError(
+                f"Invalid write. {self.file_path} is read-only, write to the primary.")
+
+    def delete(self, id: str):
+        """
+        Append a tombstone for a record.
+
+        Parameters:
+        - id (str): The id of the record to delete.
+        """
+        self.append({'id': id})
+
+    def compact(self):
+        """
+        Rewrite the file without superseded versions and tombstones. Records are
+        streamed into a temporary file that atomically replaces the original. The file
+        lock is held throughout, so no process appends a record the copy would miss.
+
+        Raises:
+        - ValueError: If the file is read-only.
+        """
+        self._check_writable()
+
+        with self.file_lock:
+            self.refresh()
+            temp_path = f"{self.file_path}.compact"
+            offsets: dict[str, int] = {}
+            checkpoints: list[int] = []
+
+            with open(self.file_path, 'rb') as source, open(temp_path, 'wb') as target:
+                target.write(encode_record(self.header))
+                data_offset = target.tell()
+                if self.data_offset < self.size:
+                    for offset, _, fields in iter_records(source, self.data_offset, self.size):
+                        id = fields[self.id_position]
+                        if self.offsets.get(id) == offset:
+                            if len(offsets) % self.checkpoint_interval == 0:
+                                checkpoints.append(target.tell())
+                            offsets[id] = target.tell()
+                            target.write(encode_record(fields))
+
+                target.flush()
+                os.fsync(target.fileno())
+                size = target.tell()
+
+            os.replace(temp_path, self.file_path)
+
+            stat = os.stat(self.file_path)
+            self.identity = (stat.st_dev, stat.st_ino)
+            self.mtime_ns = stat.st_mtime_ns
+            self.offsets = offsets
+            self.checkpoints = checkpoints
+            self.rows = len(offsets)
+            self.data_offset = data_offset
+            self.size = size
+
+
+def scan_live_records(file_path: str, field_names: list[str], row_filter=None):
+    """
+    Read the latest version of every record in a table file in a single pass.
+    Meant to run in a worker process, so it builds no index.
+
+    Parameters:
+    - file_path (str): The path of the CSV file.
+    - field_names (list[str]): The field names to use when the file has no header.
+    - row_filter (Callable): Optional. A picklable callable that returns True for the rows to keep.
+
+    Returns:
+    - list[dict]: A dictionary for each matching live record, in file order.
+    """
+    table = TableFile(file_path, field_names)
+    records: dict[str, list[str]] = {}
+
+    with open(file_path, 'rb') as file:
+        for offset, _, fields in iter_records(file):
+            if offset == 0:
+                table.header = fields
+                table.id_position = fields.index('id')
+                continue
+
+            id = fields[table.id_position]
+            records.pop(id, None)
+            if not table.is_tombstone(fields):
+                records[id] = fields
+
+    rows = [dict(zip(table.header, fields)) for fields in records.values()]
+
+    if row_filter is None:
+        return rows
+
+    return [row for row in rows if row_filter(row)]
+
+
+def scan_chunk(file_path: str, start: int, end: int, header: list[str], row_filter=None, field_names=None):
+    """
+    Read every record version in a byte range of a table file. Meant to run in a worker
+    process, the caller keeps the versions its index knows to be the latest.
+
+    Parameters:
+    - file_path (str): The path of the CSV file.
+    - start (int): The offset of the first record, at a record boundary.
+    - end (int): The offset to stop reading at, at a record boundary.
+    - header (list[str]): The field names of the file.
+    - row_filter (Callable): Optional. A picklable callable that returns True for the rows to keep.
+    - field_names (list[str]): Optional. The fields to keep in each row, all of them by default.
+
+    Returns:
+    - list[tuple[int, str, dict]]: The offset, id and projected row of each matching record.
+    """
+    id_position = header.index('id')
+    matches = []
+
+    with open(file_path, 'rb') as file:
+        for offset, _, fields in iter_records(file, start, end):
+            row = dict(zip(header, fields))
+            if row_filter is not None and not row_filter(row):
+                continue
+            if field_names is not None:
+                row = {field: row[field] for field in field_names}
+            matches.append((offset, fields[id_position], row))
+
+    return matches
+
+
+class FileLock:
+    def __init__(self, file_path: str, lock=None):
+        """
+        Initialize a FileLock object, a lock held by one thread of one process at a time,
+        through an exclusive lock on a file that is created if needed.
+
+        The lock is reentrant: a thread holding it may acquire it again, and other processes
+        get it once the thread released it as many times as it acquired it.
+
+        Parameters:
+        - file_path (str): The path of the lock file.
+        - lock (RLock): Optional. The lock of the threads of this process, e.g. the lock of a
+          table, which is then always taken before the file.
+        """
+        self.file_path = file_path
+        self.lock = lock if lock is not None else threading.RLock()
+        self._file = None
+        self._depth = 0
+
+    def acquire(self):
+        """
+        Wait until no other thread or process holds the lock, and take it.
+        """
+        self.lock.acquire()
+
+        if self._depth == 0:
+            try:
+                file = open(self.file_path, 'a+b')
+                try:
+                    if fcntl is not None:
+                        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+                    else:
+                        file.seek(0)
+                        # LK_LOCK gives up after 10 attempts a second apart, so keep trying
+                        while True:
+                            try:
+                                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                                break
+                            except OSError:
+                                pass
+                except BaseException:
+                    file.close()
+                    raise
+            except BaseException:
+                self.lock.release()
+                raise
+
+            self._file = file
+
+        self._depth += 1
+
+    def release(self):
+        """
+        Release the lock once.
+        """
+        self._depth -= 1
+
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            self._file.close()
+            self._file = None
+
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -1,8 +1,12 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
 import classes.course as course_module
-import classes.database as database_module
 import classes.enrollment as enrollment_module
 from utils.utilities import get_current_datetime, get_unique_id, hash_password
 
+if TYPE_CHECKING:
+    import classes.database as database_module
+
 
 class User:
     def __init__(self, id: str, name: str, username: str, password: str, role: str, creator: str, created_at: str, updated_at: str):
@@ -89,56 +93,60 @@ class Admin(User):
         """
         return db.read_courses()
 
-    def get_all_enrollments(self, db: database_module.Database):
+    def get_all_enrollments(self, db: database_module.Database, include_history=False):
         """
         Get a list of all enrollments.
 
         Parameters:
         - db (Database): The Database instance.
+        - include_history (bool): Optional. Also get the enrollments of past terms.
 
         Returns:
         - list[Enrollment]: A list of all enrollments.
         """
-        return db.read_enrollments()
+        return db.read_enrollments(include_history)
 
-    def get_enrollments_by_user(self, db: database_module.Database, username: str):
+    def get_enrollments_by_user(self, db: database_module.Database, username: str, include_history=False):
         """
         Get a list of enrollments for a specific user.
 
         Parameters:
         - db (Database): The Database instance.
         - username (str): The username of the user.
+        - include_history (bool): Optional. Also get the enrollments of past terms.
 
         Returns:
         - list[Enrollment]: A list of enrollments for the specified user.
         """
-        return db.query_enrollments(username=username)
+        return db.query_enrollments(username=username, include_history=include_history)
 
-    def get_enrollments_by_user_id(self, db: database_module.Database, user_id: str):
+    def get_enrollments_by_user_id(self, db: database_module.Database, user_id: str, include_history=False):
         """
         Get a list of enrollments for a specific user ID.
 
         Parameters:
         - db (Database): The Database instance.
         - user_id (str): The user ID of the user.
+        - include_history (bool): Optional. Also get the enrollments of past terms.
 
         Returns:
         - list[Enrollment]: A list of enrollments for the specified user ID.
         """
-        return db.query_enrollments(user_id=user_id)
+        return db.query_enrollments(user_id=user_id, include_history=include_history)
 
-    def get_enrollments_by_course_id(self, db: database_module.Database, course_id: str):
+    def get_enrollments_by_course_id(self, db: database_module.Database, course_id: str, include_history=False):
         """
         Get a list of enrollments for a specific course ID.
 
         Parameters:
         - db (Database): The Database instance.
         - course_id (str): The course ID of the course.
+        - include_history (bool): Optional. Also get the enrollments of past terms.
 
         Returns:
         - list[Enrollment]: A list of enrollments for the specified course ID.
         """
-        return db.query_enrollments(course_id=course_id)
+        return db.query_enrollments(course_id=course_id, include_history=include_history)
 
     def create_user(self, db: database_module.Database, student_name: str, student_username: str, student_password: str, role: str):
         """
@@ -172,7 +180,7 @@ class Admin(User):
 
         return user
 
-    def create_course(self, db: database_module.Database, course_name: str, course_description: str):
+    def create_course(self, db: database_module.Database, course_name: str, course_description: str, course_capacity=''):
         """
         Create a new course.
 
@@ -180,15 +188,19 @@ class Admin(User):
         - db (Database): The Database instance.
         - course_name (str): The name of the new course.
         - course_description (str): The description of the new course.
+        - course_capacity (str): Optional. The maximum number of enrollments, empty for no limit.
 
         Returns:
         - Course: Course record.
+
+        Raises:
+        - ValueError: If the capacity is invalid.
         """
         id = get_unique_id()
         now = get_current_datetime()
 
         course = course_module.Course(id, course_name, course_description,
-                                      self.name, now, now)
+                                      self.name, now, now, course_capacity)
 
         db.write_course(course.__dict__)
 
@@ -208,6 +220,7 @@ class Admin(User):
 
         Raises:
         - ValueError: If user or course id is invalid.
+        - CourseFullError: If the course is full, see add_to_waitlist.
         """
         user = db.read_user(username=username)
 
@@ -231,6 +244,177 @@ class Admin(User):
 
         return enrollment
 
+    def add_to_waitlist(self, db: database_module.Database, username: str, course_id: str):
+        """
+        Put a student on the waitlist of a full course. They are enrolled as soon as a seat
+        frees up, after the students who were waiting before them.
+
+        Parameters:
+        - db (Database): The Database instance.
+        - username (str): The username the user.
+        - course_id (str): The id of the  course.
+
+        Returns:
+        - int: The position of the student on the waitlist, 1 being the next enrolled.
+
+        Raises:
+        - ValueError: If user or course id is invalid, the user is already enrolled or waiting, or the course isn't full.
+        """
+        user = db.read_user(username=username)
+
+        if not isinstance(user, Student):
+            raise ValueError(
+                "Invalid username. No student with that name was found in the database.")
+
+        course = db.read_course(course_id)
+
+        if not isinstance(course, course_module.Course):
+            raise ValueError(
+                "Invalid course_id. No course with that id was found in the database.")
+
+        now = get_current_datetime()
+
+        return db.write_waitlist_entry({'id': get_unique_id(), 'user_id': user.id, 'course_id': course.id,
+                                        'creator': self.name, 'created_at': now, 'updated_at': now})
+
+    def update_course(self, db: database_module.Database, course_id: str, course_name: str, course_description: str,
+                      course_capacity=None):
+        """
+        Rename a course and change its description, and optionally its capacity. Students
+        waiting for the course are enrolled into the seats a larger capacity adds.
+
+        Parameters:
+        - db (Database): The Database instance.
+        - course_id (str): The id of the course.
+        - course_name (str): The new name of the course.
+        - course_description (str): The new description of the course.
+        - course_capacity (str): Optional. The new maximum number of enrollments, empty for no limit, None to keep it.
+
+        Returns:
+        - Course: Updated course record.
+
+        Raises:
+        - ValueError: If course id or capacity is invalid.
+        """
+        changes = {"name": course_name, "description": course_description}
+
+        if course_capacity is not None:
+            changes["capacity"] = course_capacity
+
+        return db.update_course(course_id, changes)
+
+    def reset_password(self, db: database_module.Database, username: str, new_password: str):
+        """
+        Reset the password of a user.
+
+        Parameters:
+        - db (Database): The Database instance.
+        - username (str): The username of the user.
+        - new_password (str): The new password of the user.
+
+        Returns:
+        - User: Updated user record.
+
+        Raises:
+        - ValueError: If username is invalid.
+        """
+        user = db.read_user(username=username)
+
+        if not user:
+            raise ValueError(
+                "Invalid username. No user with that name was found in the database.")
+
+        return db.update_user(user.id, {"password": hash_password(new_password)})
+
+    def unenroll_user(self, db: database_module.Database, username: str, course_id: str):
+        """
+        Drop a user from a course, enrolling the first student waiting for it.
+
+        Parameters:
+        - db (Database): The Database instance.
+        - username (str): The username of the user.
+        - course_id (str): The id of the course.
+
+        Returns:
+        - Enrollment: The deleted enrollment record.
+
+        Raises:
+        - ValueError: If the user is not enrolled to the course.
+        """
+        user = db.read_user(username=username)
+
+        if user:
+            for enrollment in db.query_enrollments(user_id=user.id):
+                if enrollment.course_id == course_id:
+                    db.delete_enrollment(enrollment.id)
+                    return enrollment
+
+        raise ValueError("user is not enrolled to that course.")
+
+    def delete_user(self, db: database_module.Database, username: str):
+        """
+        Delete a user along with their enrollments and waitlist entries.
+
+        Parameters:
+        - db (Database): The Database instance.
+        - username (str): The username of the user.
+
+        Returns:
+        - User: The deleted user record.
+
+        Raises:
+        - ValueError: If username is invalid or is the admin's own username.
+        """
+        user = db.read_user(username=username)
+
+        if not user:
+            raise ValueError(
+                "Invalid username. No user with that name was found in the database.")
+
+        if user.id == self.id:
+            raise ValueError("You can not delete your own account.")
+
+        for entry in db.query('waitlist', {'user_id': user.id}, fields=['id']):
+            db.delete_waitlist_entry(entry['id'])
+
+        for enrollment in db.query_enrollments(user_id=user.id):
+            db.delete_enrollment(enrollment.id)
+
+        db.delete_user(user.id)
+
+        return user
+
+    def delete_course(self, db: database_module.Database, course_id: str):
+        """
+        Delete a course along with its enrollments and waitlist.
+
+        Parameters:
+        - db (Database): The Database instance.
+        - course_id (str): The id of the course.
+
+        Returns:
+        - Course: The deleted course record.
+
+        Raises:
+        - ValueError: If course id is invalid.
+        """
+        course = db.read_course(course_id)
+
+        if not isinstance(course, course_module.Course):
+            raise ValueError(
+                "Invalid course_id. No course with that id was found in the database.")
+
+        # The waitlist goes first, or the seats freed below would be given to it
+        for entry in db.get_waitlist(course.id):
+            db.delete_waitlist_entry(entry['id'])
+
+        for enrollment in db.query_enrollments(course_id=course.id):
+            db.delete_enrollment(enrollment.id)
+
+        db.delete_course(course.id)
+
+        return course
+
 
 class Student(User):
     def __init__(self, id: str, name: str, username: str, password: str, role: str, creator: str, created_at: str, updated_at: str):
@@ -250,10 +434,10 @@ class Student(User):
         Returns:
         - list[Course]: A list of courses that the student is enrolled in.
         """
-        enrollments = db.query_enrollments(user_id=self.id)
-
         courses = []
-        for enrollment in enrollments:
+
+        # Point reads seek straight to each course, instead of scanning every course for one student
+        for enrollment in db.query_enrollments(user_id=self.id):
             course = db.read_course(id=enrollment.course_id)
             if course:
                 courses.append(course)
@@ -1,48 +1,64 @@
+import sys
 import classes.user as user_class
 import classes.database as database_class
-from utils.utilities import MaxAttemptsExceededError, create_new_course, create_new_user,  enroll_user_to_course, login_flow, quit_program, validate_menu_input, reset_screen, view_all_course_students, view_all_courses, view_all_enrollments, view_all_student_courses, view_all_users, view_my_courses
-
-db = database_class.Database()
+import classes.session as session_class
+from utils.utilities import MaxAttemptsExceededError, screen, create_new_course, create_new_user, delete_existing_course, delete_existing_user,  enroll_user_to_course, login_flow, quit_program, reset_user_password, unenroll_user_from_course, update_course_details, validate_menu_input, reset_screen, view_all_course_students, view_all_courses, view_all_enrollments, view_all_student_courses, view_all_users, view_my_courses
 
 
 def main():
+    db = database_class.Database()
+    # The only session is the one at this terminal, which stays open however long its user idles
+    sessions = session_class.SessionStore(db, ttl=None)
+
     reset_screen()
 
     CURRENT_USER: user_class.Admin | user_class.Student | None = None
+    TOKEN: str | None = None
 
     try:
 
         while not CURRENT_USER:
             try:
-                CURRENT_USER = login_flow(db)
+                TOKEN = login_flow(sessions)
+                CURRENT_USER = sessions.get(TOKEN)
 
             except MaxAttemptsExceededError as e:
                 quit_program(f"{e}")
 
             except Exception as e:
-                print(f"\nAn unkowned error occured {e}")
+                screen.print(f"\nAn unkowned error occured {e}")
 
         if isinstance(CURRENT_USER, user_class.Admin):
             """
             Admin flow with various actions.
             """
             while True:
-                print(f"\nHi {CURRENT_USER.name}, Menu:")
-                print("1. View all users")
-                print("2. View all courses")
-                print("3. View all enrollments")
-                print("4. View student courses")
-                print("5. View course student")
-                print("6. Create a new student")
-                print("7. Create a new admin")
-                print("8. Create a new course")
-                print("9. Enroll a user to a course")
-                print("10. Exit")
-
-                choice = input("Enter your choice (1-10): ")
-
-                if not validate_menu_input(choice, 1, 10):
-                    print("\nInvalid option. Please try again.")
+                # The session ends if the admin is deleted, demoted or has its password reset
+                CURRENT_USER = sessions.get(TOKEN)
+                if not isinstance(CURRENT_USER, user_class.Admin):
+                    quit_program("Your session has ended. Please log in again.")
+
+                screen.print(f"\nHi {CURRENT_USER.name}, Menu:")
+                screen.print("1. View all users")
+                screen.print("2. View all courses")
+                screen.print("3. View all enrollments")
+                screen.print("4. View student courses")
+                screen.print("5. View course student")
+                screen.print("6. Create a new student")
+                screen.print("7. Create a new admin")
+                screen.print("8. Create a new course")
+                screen.print("9. Enroll a user to a course")
+                screen.print("10. Update a course")
+                screen.print("11. Reset a user's password")
+                screen.print("12. Unenroll a user from a course")
+                screen.print("13. Delete a user")
+                screen.print("14. Delete a course")
+                screen.print("15. Exit")
+
+                choice = screen.input("Enter your choice (1-15): ")
+
+                if not validate_menu_input(choice, 1, 15):
+                    screen.print("\nInvalid option. Please try again.")
                     continue
 
                 # View all users
@@ -80,8 +96,28 @@ def main():
                 if choice == "9":
                     enroll_user_to_course(db, CURRENT_USER)
 
-                # Exit
+                # Update a course
                 if choice == "10":
+                    update_course_details(db, CURRENT_USER)
+
+                # Reset a user's password
+                if choice == "11":
+                    reset_user_password(db, CURRENT_USER)
+
+                # Unenroll a user from a course
+                if choice == "12":
+                    unenroll_user_from_course(db, CURRENT_USER)
+
+                # Delete a user
+                if choice == "13":
+                    delete_existing_user(db, CURRENT_USER)
+
+                # Delete a course
+                if choice == "14":
+                    delete_existing_course(db, CURRENT_USER)
+
+                # Exit
+                if choice == "15":
                     quit_program("Good bye.")
 
         if isinstance(CURRENT_USER, user_class.Student):
@@ -89,14 +125,18 @@ def main():
             Student flow with various actions.
             """
             while True:
-                print(f"\nHi {CURRENT_USER.name}, Menu:")
-                print("1. View my courses")
-                print("2. Exit")
+                CURRENT_USER = sessions.get(TOKEN)
+                if not isinstance(CURRENT_USER, user_class.Student):
+                    quit_program("Your session has ended. Please log in again.")
 
-                choice = input("Enter your choice (1-2): ")
+                screen.print(f"\nHi {CURRENT_USER.name}, Menu:")
+                screen.print("1. View my courses")
+                screen.print("2. Exit")
+
+                choice = screen.input("Enter your choice (1-2): ")
 
                 if not validate_menu_input(choice, 1, 2):
-                    print("\nInvalid option. Please try again.")
+                    screen.print("\nInvalid option. Please try again.")
                     continue
 
                 # View my courses
@@ -108,8 +148,14 @@ def main():
                     quit_program("Good bye.")
 
     except KeyboardInterrupt:
-        print("\nExited by user.")
+        screen.print("\nExited by user.")
+        screen.close()
 
 
 if __name__ == "__main__":
+    # Run a single command line operation when arguments are given, the interactive menus otherwise
+    if len(sys.argv) > 1:
+        from utils.cli import run_cli
+        sys.exit(run_cli(sys.argv[1:]))
+
     main()
@@ -0,0 +1,41 @@
+import json
+import atexit
+import pytest
+import classes.database as database_class
+from classes.audit_log import AuditLog
+from utils.utilities import _audit_logs, run_audited
+
+
+def read_events(file_path: str):
+    with open(file_path) as file:
+        return [json.loads(line) for line in file]
+
+
+def test_failures_are_recorded_whatever_the_error(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+
+    def fail():
+        raise RuntimeError("disk on fire")
+
+    with pytest.raises(RuntimeError):
+        run_audited(db, 'create_course', 'admin', fail, name='Math')
+    assert run_audited(db, 'create_course', 'admin', lambda: 42, name='Math') == 42
+
+    _audit_logs[str(tmp_path / 'audit.jsonl')].flush()
+    events = read_events(str(tmp_path / 'audit.jsonl'))
+    assert [(event['action'], event['outcome'], event['name'], event['error']) for event in events] == [
+        ('create_course', 'failure', 'Math', 'disk on fire')]
+    db.close()
+
+
+def test_restarted_writers_register_one_exit_handler(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(atexit, 'register', registered.append)
+    audit_log = AuditLog(str(tmp_path / 'audit.jsonl'))
+
+    for i in range(3):
+        audit_log.record('login', f"user{i}")
+        audit_log.close()
+
+    assert registered == [audit_log.close]
+    assert [event['actor'] for event in read_events(audit_log.file_path)] == ['user0', 'user1', 'user2']
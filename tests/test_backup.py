@@ -0,0 +1,71 @@
+import threading
+import classes.database as database_class
+from classes.backup import BackupStore
+from utils.utilities import get_current_datetime, get_unique_id
+
+
+def read_users(folder_path: str):
+    db = database_class.Database(folder_path=folder_path)
+    users = {user.id: (user.username, user.name) for user in db.read_users()}
+    db.close()
+    return users
+
+
+def test_restore_across_compaction(tmp_path):
+    folder_path, store = str(tmp_path / 'data'), BackupStore(str(tmp_path / 'backups'))
+    db = database_class.Database(folder_path=folder_path)
+    admin = db.read_users()[0]
+    students = [admin.create_user(db, f"Student {i}", f"student{i}", 'Secret123!', 'student') for i in range(20)]
+    store.backup(folder_path)
+    snapshots = [read_users(folder_path)]
+
+    for student in students[:10]:
+        db.update_user(student.id, {'name': f"{student.name} Updated"})
+    admin.create_user(db, 'Ada', 'ada', 'Secret123!', 'student')
+    store.backup(folder_path)
+    snapshots.append(read_users(folder_path))
+
+    for student in students[10:]:
+        db.delete_user(student.id)
+    db.compact('user')
+    backup = store.backup(folder_path)
+    snapshots.append(read_users(folder_path))
+    assert backup['files']['users.csv']['kind'] == 'full'
+
+    admin.create_user(db, 'Bob', 'bob', 'Secret123!', 'student')
+    backup = store.backup(folder_path)
+    snapshots.append(read_users(folder_path))
+    assert backup['files']['users.csv']['kind'] == 'tail'
+    db.close()
+
+    for backup, snapshot in zip(store.get_backups(), snapshots):
+        restored_path = str(tmp_path / f"restored-{backup['id']}")
+        store.restore(restored_path, backup['id'])
+        assert read_users(restored_path) == snapshot
+
+
+def test_backup_waits_for_writes_in_progress(tmp_path):
+    folder_path, store = str(tmp_path / 'data'), BackupStore(str(tmp_path / 'backups'))
+    db = database_class.Database(folder_path=folder_path, enrollment_shards=2)
+    admin = db.read_users()[0]
+    course_id = admin.create_course(db, "Math", "Algebra", "").id
+    now = get_current_datetime()
+    enrollment = {'id': get_unique_id(), 'user_id': admin.id, 'course_id': course_id,
+                  'creator': admin.id, 'created_at': now, 'updated_at': now}
+
+    # The enrollment and its change are written together, the backup copies both or neither
+    with db._lock_course(course_id):
+        backup = threading.Thread(target=store.backup, args=(folder_path,))
+        backup.start()
+        backup.join(0.2)
+        assert backup.is_alive()
+        db.write_enrollment(enrollment)
+    backup.join()
+    db.close()
+
+    restored_path = str(tmp_path / 'restored')
+    store.restore(restored_path)
+    restored = database_class.Database(folder_path=restored_path)
+    assert [row.id for row in restored.query_enrollments(course_id=course_id)] == [enrollment['id']]
+    assert restored.read_changes()[0][-1]['id'] == enrollment['id']
+    restored.close()
@@ -0,0 +1,46 @@
+import multiprocessing
+import classes.database as database_class
+from utils.utilities import get_current_datetime, get_unique_id
+
+
+def enroll(folder_path: str, course_id: str, worker: int, attempts: int):
+    db = database_class.Database(folder_path=folder_path)
+    try:
+        for i in range(attempts):
+            now = get_current_datetime()
+            try:
+                db.write_enrollment({'id': get_unique_id(), 'user_id': f"user-{worker}-{i}", 'course_id': course_id,
+                                     'creator': 'admin', 'created_at': now, 'updated_at': now})
+            except database_class.CourseFullError:
+                pass
+    finally:
+        db.close()
+
+
+def test_capacity_holds_across_processes(tmp_path):
+    folder_path = str(tmp_path)
+    db = database_class.Database(folder_path=folder_path)
+    admin = [user for user in db.read_users() if user.role == 'admin'][0]
+    course_id = admin.create_course(db, "Math", "Algebra", "25").id
+
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=enroll, args=(folder_path, course_id, n, 20)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    assert db.count_enrollments(course_id) == 25
+    assert len(db.query_enrollments(course_id=course_id)) == 25
+    assert len(database_class.Database(folder_path=folder_path).query_enrollments(course_id=course_id)) == 25
+    db.close()
+
+
+def test_memory_usage_includes_enrollment_counts(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+    before = db.memory_usage()
+    db.count_enrollments('course')
+
+    assert db.memory_usage() > before
+    db.close()
@@ -0,0 +1,75 @@
+import time
+import threading
+import multiprocessing
+import pytest
+from classes.change_feed import ChangeFeed
+
+
+def append_events(file_path: str, prefix: str, count: int):
+    feed = ChangeFeed(file_path)
+    for i in range(count):
+        feed.append('user', 'create', f"{prefix}-{i}", '2025-01-01T00:00:00', {'name': 'x' * 100})
+
+
+def test_resume_from_a_cursor_in_batches(tmp_path):
+    feed = ChangeFeed(str(tmp_path / 'changes.csv'))
+    assert feed.read() == ([], 0)
+
+    append_events(feed.file_path, 'a', 5)
+    events, cursor = feed.read(limit=2)
+    assert [event['id'] for event in events] == ['a-0', 'a-1']
+    assert events[0]['seq'] < events[1]['seq'] < cursor
+
+    events, cursor = feed.read(cursor, limit=10)
+    assert [event['id'] for event in events] == ['a-2', 'a-3', 'a-4']
+    assert events[0]['data'] == {'name': 'x' * 100}
+    assert feed.read(cursor) == ([], cursor) and cursor == feed.get_cursor()
+
+    feed.append('user', 'delete', 'a-0', '2025-01-01T00:00:00')
+    events, _ = feed.read(cursor)
+    assert [(event['operation'], event['data']) for event in events] == [('delete', None)]
+
+
+def test_invalid_cursors_and_limits(tmp_path):
+    feed = ChangeFeed(str(tmp_path / 'changes.csv'))
+    with pytest.raises(ValueError):
+        feed.read(5)
+
+    append_events(feed.file_path, 'a', 2)
+    events, _ = feed.read()
+    for cursor in [-1, feed.get_cursor() + 1, events[0]['seq'] + 1]:
+        with pytest.raises(ValueError):
+            feed.read(cursor)
+    with pytest.raises(ValueError):
+        feed.read(limit=0)
+
+
+def test_timeouts(tmp_path):
+    feed = ChangeFeed(str(tmp_path / 'changes.csv'), poll_interval=0.05)
+    cursor = feed.get_cursor()
+
+    start = time.monotonic()
+    assert feed.read(cursor, timeout=0.2) == ([], cursor)
+    assert time.monotonic() - start >= 0.2
+
+    timer = threading.Timer(0.1, append_events, (feed.file_path, 'late', 1))
+    timer.start()
+    events, _ = feed.read(cursor, timeout=5)
+    timer.join()
+    assert [event['id'] for event in events] == ['late-0']
+
+
+def test_processes_creating_the_log_at_once(tmp_path):
+    file_path = str(tmp_path / 'changes.csv')
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=append_events, args=(file_path, f"p{n}", 200)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    events, _ = ChangeFeed(file_path).read(limit=10000)
+    assert sorted(event['id'] for event in events) == sorted(f"p{n}-{i}" for n in range(4) for i in range(200))
+    with open(file_path) as file:
+        assert file.read().count('type,operation') == 1
@@ -0,0 +1,58 @@
+import uuid
+import pytest
+import classes.database as database_class
+import utils.utilities as utilities
+from classes.query import In
+from utils.utilities import bytes_to_ulid, get_current_datetime, get_id_timestamp, get_unique_id, ulid_to_bytes
+
+
+def test_ids_sort_in_creation_order_within_a_millisecond(monkeypatch):
+    monkeypatch.setattr(utilities.time, 'time_ns', lambda: 1_700_000_000_000_000_000)
+    ids = [get_unique_id() for _ in range(1000)]
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert len({id[:10] for id in ids}) == 1
+    assert get_id_timestamp(ids[0]).timestamp() == 1_700_000_000
+
+
+def test_ids_sort_in_creation_order():
+    ids = [get_unique_id() for _ in range(10000)]
+
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+
+
+def test_round_trip():
+    for value in [bytes(16), b'\xff' * 16, bytes(range(16))]:
+        id = bytes_to_ulid(value)
+        assert len(id) == 26 and ulid_to_bytes(id) == value
+
+    id = get_unique_id()
+    assert bytes_to_ulid(ulid_to_bytes(id.lower())) == id
+
+
+def test_crockford_aliases():
+    assert ulid_to_bytes('0' * 25 + 'I') == ulid_to_bytes('0' * 25 + 'l') == ulid_to_bytes('0' * 25 + '1')
+    assert ulid_to_bytes('O' * 26) == bytes(16)
+
+
+@pytest.mark.parametrize('id', ['', '0' * 25, '0' * 27, '0' * 25 + 'U', '8' + '0' * 25, str(uuid.uuid4())])
+def test_invalid_ulids(id):
+    with pytest.raises(ValueError):
+        ulid_to_bytes(id)
+    assert get_id_timestamp(id) is None
+
+
+def test_lookups_mixing_uuids_and_ulids(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+    ids = [get_unique_id(id_format) for id_format in ['uuid', 'ulid', 'uuid', 'ulid']]
+    now = get_current_datetime()
+    for i, id in enumerate(ids):
+        db.write_user({'id': id, 'name': f"User {i}", 'username': f"user{i}", 'password': '', 'role': 'student',
+                       'creator': 'admin', 'created_at': now, 'updated_at': now})
+
+    assert [db.read_user(id=id).username for id in ids] == ['user0', 'user1', 'user2', 'user3']
+    assert sorted(row['id'] for row in db.query('user', In('id', ids))) == sorted(ids)
+    db.delete_user(ids[0])
+    db.delete_user(ids[1])
+    assert sorted(row['id'] for row in db.query('user', In('id', ids))) == sorted(ids[2:])
+    db.close()
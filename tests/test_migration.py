@@ -0,0 +1,69 @@
+import os
+import csv
+import sys
+import json
+import subprocess
+import classes.database as database_class
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Files as the first release of the application wrote them
+BASELINE = {
+    'users.csv': (['id', 'name', 'username', 'password', 'role', 'creator', 'created_at', 'updated_at'], [
+        ['u1', 'super admin', 'admin', 'hash', 'admin', 'system', '2023-01-01 12:00:00', '2023-01-01 12:00:00'],
+        ['u2', 'Ada', 'ada', 'hash', 'student', 'super admin', '2023-01-02 12:00:00', '2023-01-02 12:00:00'],
+    ]),
+    'courses.csv': (['id', 'name', 'description', 'creator', 'created_at', 'updated_at'], [
+        ['c1', 'Math', 'Algebra, "intro"', 'super admin', '2023-01-03 12:00:00', '2023-01-03 12:00:00'],
+    ]),
+    'enrollments.csv': (['id', 'user_id', 'username', 'course_id', 'course_name', 'creator', 'created_at', 'updated_at'], [
+        ['e1', 'u2', 'ada', 'c1', 'Math', 'super admin', '2023-01-04 12:00:00', '2023-01-04 12:00:00'],
+    ]),
+}
+
+
+def write_baseline(folder_path: str):
+    os.makedirs(folder_path)
+    for name, (header, rows) in BASELINE.items():
+        with open(os.path.join(folder_path, name), 'w', newline='') as file:
+            csv.writer(file).writerows([header, *rows])
+
+
+def read_header(file_path: str):
+    with open(file_path, newline='') as file:
+        return next(csv.reader(file))
+
+
+def run_migrate(folder_path: str):
+    return subprocess.run([sys.executable, '-m', 'utils.migrate', folder_path],
+                          cwd=ROOT_PATH, capture_output=True, text=True, check=True).stdout
+
+
+def test_baseline_folder_migrates(tmp_path):
+    folder_path = str(tmp_path / 'data')
+    write_baseline(folder_path)
+
+    # Unmigrated files are read with the current fields
+    db = database_class.Database(folder_path=folder_path)
+    assert db.read_course('c1').capacity == ''
+    db.close()
+
+    output = run_migrate(folder_path)
+    assert "Migrated" in output and "courses.csv" in output and "enrollments.csv" in output
+
+    assert read_header(os.path.join(folder_path, 'courses.csv'))[-1] == 'capacity'
+    assert 'username' not in read_header(os.path.join(folder_path, 'enrollments.csv'))
+    with open(os.path.join(folder_path, 'schema.json')) as file:
+        versions = json.load(file)
+    assert versions['courses.csv'] == 1 and versions['enrollments.csv'] == 1
+
+    db = database_class.Database(folder_path=folder_path)
+    course = db.read_course('c1')
+    assert (course.name, course.description, course.capacity) == ('Math', 'Algebra, "intro"', '')
+    assert [(row['id'], row['username'], row['course_name']) for row in db.query('enrollment')] == [('e1', 'ada', 'Math')]
+    assert {user.username for user in db.read_users()} == {'admin', 'ada'}
+    assert db.migrate() == []
+    db.close()
+
+    contents = {name: open(os.path.join(folder_path, name), 'rb').read() for name in [*BASELINE, 'schema.json']}
+    assert "up to date" in run_migrate(folder_path)
+    assert {name: open(os.path.join(folder_path, name), 'rb').read() for name in contents} == contents
@@ -0,0 +1,52 @@
+import classes.database as database_class
+from classes.query import Range
+
+
+def write_enrollment(db, id: str, created_at: str):
+    db.write_enrollment({'id': id, 'user_id': f"user-{id}", 'course_id': 'course', 'creator': 'admin',
+                         'created_at': created_at, 'updated_at': created_at})
+
+
+def test_close_term_records_the_key_range_of_its_rows(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+    write_enrollment(db, '1', '2024-09-02T10:00:00')
+    write_enrollment(db, '2', '2024-11-30T10:00:00')
+    write_enrollment(db, '3', '2025-02-01T10:00:00')
+
+    partition = db.close_term('2024-fall', '2025-01-01')
+
+    assert (partition['start'], partition['last'], partition['end']) == ('2024-09-02T10:00:00', '2024-11-30T10:00:00', '2025-01-01')
+    assert partition['rows'] == 2
+    db.close()
+
+
+def test_history_queries_skip_partitions_outside_their_range(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+    write_enrollment(db, '1', '2024-09-02T10:00:00')
+    db.close_term('2024-fall', '2025-01-01')
+    write_enrollment(db, '2', '2025-02-01T10:00:00')
+    db.close_term('2025-spring', '2025-06-01')
+    db.close_term('2025-summer', '2025-09-01')
+
+    for where, scanned in [(Range('created_at', None, '2000-01-01'), 0),
+                           (Range('created_at', '2024-12-01', '2025-01-01'), 0),
+                           (Range('created_at', None, '2024-09-02T10:00:00'), 0),
+                           (Range('created_at', '2024-09-02T10:00:00', '2024-09-03'), 1),
+                           (Range('created_at', '2025-01-01', None), 1),
+                           (None, 2)]:
+        plan = db.explain('enrollment', where, include_history=True)
+        assert (len(plan.history), plan.partitions) == (scanned, 3)
+
+    ids = [row['id'] for row in db.query('enrollment', Range('created_at', '2025-01-01', None), include_history=True)]
+    assert ids == ['2']
+    db.close()
+
+
+def test_archived_partitions_are_still_read(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+    write_enrollment(db, '1', '2024-09-02T10:00:00')
+    db.close_term('2024-fall', '2025-01-01')
+
+    assert db.archive_term('2024-fall')['file'].endswith('.blk')
+    assert [row['id'] for row in db.query('enrollment', include_history=True)] == ['1']
+    db.close()
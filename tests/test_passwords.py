@@ -0,0 +1,68 @@
+import hashlib
+import pytest
+import classes.database as database_class
+from utils.utilities import (authenticate_user, compare_password_to_hash, get_current_datetime, hash_password,
+                             needs_rehash, verify_password)
+
+
+@pytest.mark.parametrize('algorithm, cost', [('scrypt', 1024), ('pbkdf2_sha256', 1000)])
+def test_hash_round_trip(algorithm, cost):
+    hashed_password = hash_password('Secret123!', algorithm, cost)
+
+    assert hashed_password.startswith(f"{algorithm}${cost}$")
+    assert compare_password_to_hash('Secret123!', hashed_password)
+    assert verify_password('Secret123!', hashed_password)
+    assert not compare_password_to_hash('Secret124!', hashed_password)
+    assert not verify_password('', hashed_password)
+    # Salts differ, so equal passwords get different hashes
+    assert hash_password('Secret123!', algorithm, cost) != hashed_password
+
+
+def test_malformed_hashes_never_match():
+    for hashed_password in ['', 'scrypt$x$8$1$00$00', 'pbkdf2_sha256$1000$zz$00', 'md5$1$2$3']:
+        assert not compare_password_to_hash('', hashed_password)
+
+    with pytest.raises(ValueError):
+        hash_password('Secret123!', 'md5')
+
+
+def test_needs_rehash():
+    assert needs_rehash(hashlib.sha256(b'Secret123!').hexdigest())
+    assert needs_rehash(hash_password('Secret123!', 'pbkdf2_sha256', 1000))
+    assert not needs_rehash(hash_password('Secret123!'))
+
+
+def test_legacy_login_upgrades_the_stored_hash(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+    legacy_hash = hashlib.sha256(b'Secret123!').hexdigest()
+    now = get_current_datetime()
+    db.write_user({'id': 'ada', 'name': 'Ada', 'username': 'ada', 'password': legacy_hash, 'role': 'student',
+                   'creator': 'admin', 'created_at': now, 'updated_at': now})
+    cursor = db.get_change_cursor()
+
+    assert authenticate_user(db, 'ada', 'Secret124!') is None
+    assert db.read_user(id='ada').password == legacy_hash
+
+    user = authenticate_user(db, 'ada', 'Secret123!')
+    stored = db.read_user(id='ada')
+
+    assert user.id == 'ada' and user.password == stored.password
+    assert not needs_rehash(stored.password) and compare_password_to_hash('Secret123!', stored.password)
+    assert stored.updated_at == now
+    assert db.read_changes(cursor)[0] == []
+    # The upgraded hash is used from then on
+    assert authenticate_user(db, 'ada', 'Secret123!').password == stored.password
+    assert authenticate_user(db, 'ada', legacy_hash) is None
+    db.close()
+
+
+def test_upgrade_skips_passwords_changed_meanwhile(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path))
+    now = get_current_datetime()
+    db.write_user({'id': 'ada', 'name': 'Ada', 'username': 'ada', 'password': 'old', 'role': 'student',
+                   'creator': 'admin', 'created_at': now, 'updated_at': now})
+    db.update_user('ada', {'password': 'changed'})
+
+    assert not db.upgrade_password_hash('ada', 'old', 'upgraded')
+    assert db.read_user(id='ada').password == 'changed'
+    db.close()
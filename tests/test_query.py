@@ -0,0 +1,127 @@
+import pytest
+import classes.database as database_class
+from classes.query import And, Eq, In, Or, Range
+from utils.utilities import get_current_datetime
+
+INDEXED_FIELDS = {'user': ['username', 'role'], 'enrollment': ['user_id'], 'waitlist': ['course_id']}
+
+
+def write_user(db, id: str, role: str):
+    now = get_current_datetime()
+    db.write_user({'id': id, 'name': f"Name {id}", 'username': f"user{id}", 'password': '', 'role': role,
+                   'creator': 'admin', 'created_at': now, 'updated_at': now})
+
+
+def write_enrollment(db, id: str, user_id: str, course_id: str):
+    now = get_current_datetime()
+    db.write_enrollment({'id': id, 'user_id': user_id, 'course_id': course_id, 'creator': 'admin',
+                         'created_at': now, 'updated_at': now})
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = database_class.Database(folder_path=str(tmp_path), enrollment_shards=3, max_workers=2,
+                                 compaction_min_rows=10 ** 9, indexed_fields=INDEXED_FIELDS)
+    for i in range(40):
+        write_user(db, f"u{i:02d}", 'admin' if i % 10 == 0 else 'student')
+    for i in range(120):
+        write_enrollment(db, f"e{i:03d}", f"u{i % 40:02d}", f"c{i % 7}")
+    yield db
+    db.close()
+
+
+USER_QUERIES = [
+    (None, 'full scan'),
+    (Eq('id', 'u05'), 'id lookup'),
+    (In('id', ['u01', 'u02', 'missing']), 'id lookup'),
+    (Eq('username', 'useru07'), 'index on username'),
+    (Eq('role', 'admin'), 'index on role'),
+    # The username index has fewer candidates than the role index
+    (And(Eq('role', 'student'), In('username', ['useru01', 'useru10', 'useru11'])), 'index on username'),
+    (Or(Eq('username', 'useru03'), Eq('username', 'useru04')), 'index on username'),
+    (Range('name', 'Name u10', 'Name u20'), 'full scan'),
+    (Or(Eq('username', 'useru03'), Eq('name', 'Name u04')), 'full scan'),
+]
+
+ENROLLMENT_QUERIES = [
+    (None, 'full scan'),
+    (Eq('id', 'e017'), 'id lookup'),
+    (Eq('user_id', 'u03'), 'index on user_id'),
+    (Eq('course_id', 'c2'), 'shard scan'),
+    (In('course_id', ['c1', 'c4']), 'shard scan'),
+    (And(Eq('course_id', 'c1'), Eq('user_id', 'u08')), 'index on user_id'),
+    (Range('created_at', None, '9999'), 'full scan'),
+]
+
+
+def check_queries(db, record_type: str, queries):
+    for where, access in queries:
+        expected = sorted(row['id'] for row in db.iter_rows(record_type, where))
+        plan = db.explain(record_type, where)
+        assert plan.access == access, repr(where)
+        assert sorted(row['id'] for row in db.query(record_type, where)) == expected, repr(where)
+        assert plan.rows_returned == len(expected), repr(where)
+
+
+def check_counts(db):
+    for course_id in [f"c{i}" for i in range(7)]:
+        expected = sum(1 for row in db.iter_rows('enrollment') if row['course_id'] == course_id)
+        assert db.count_enrollments(course_id) == expected, course_id
+
+
+def test_plans_match_a_brute_force_filter(db):
+    check_queries(db, 'user', USER_QUERIES)
+    check_queries(db, 'enrollment', ENROLLMENT_QUERIES)
+
+
+def test_unfiltered_enrollment_scans_run_in_parallel(db):
+    assert db.explain('enrollment').parallel
+    assert not db.explain('enrollment', limit=5).parallel
+
+
+def test_parallel_file_scans_match_a_brute_force_filter(db):
+    db.parallel_scan_threshold = 0
+    check_queries(db, 'user', USER_QUERIES)
+    check_queries(db, 'enrollment', ENROLLMENT_QUERIES)
+
+
+def test_indexes_follow_updates_deletes_and_compactions(db):
+    check_queries(db, 'user', USER_QUERIES)
+
+    db.update_user('u07', {'username': 'renamed'})
+    db.update_user('u01', {'role': 'admin'})
+    db.delete_user('u02')
+    db.delete_user('u10')
+    check_queries(db, 'user', [*USER_QUERIES, (Eq('username', 'renamed'), 'index on username')])
+    assert db.query('user', Eq('username', 'useru07')) == []
+
+    db.compact('user')
+    write_user(db, 'u99', 'admin')
+    check_queries(db, 'user', [*USER_QUERIES, (Eq('username', 'useru99'), 'index on username')])
+
+
+def test_indexes_follow_writes_of_other_processes(tmp_path, db):
+    check_queries(db, 'user', USER_QUERIES)
+    check_queries(db, 'enrollment', ENROLLMENT_QUERIES)
+    check_counts(db)
+
+    other = database_class.Database(folder_path=str(tmp_path), indexed_fields=INDEXED_FIELDS)
+    other.update_user('u05', {'username': 'elsewhere'})
+    other.delete_enrollment('e003')
+    write_enrollment(other, 'e999', 'u03', 'c2')
+    other.compact('enrollment')
+    other.close()
+
+    check_queries(db, 'user', [*USER_QUERIES, (Eq('username', 'elsewhere'), 'index on username')])
+    check_queries(db, 'enrollment', ENROLLMENT_QUERIES)
+    check_counts(db)
+    assert 'e999' in {row['id'] for row in db.query('enrollment', Eq('user_id', 'u03'))}
+
+
+def test_plans_after_resharding(db):
+    for shards in [5, 1, 2]:
+        db.delete_enrollment(f"e{shards:03d}")
+        db.reshard_enrollments(shards)
+        check_queries(db, 'enrollment', ENROLLMENT_QUERIES)
+        assert len(db.explain('enrollment', Eq('course_id', 'c2')).file_paths) == 1
+        check_counts(db)
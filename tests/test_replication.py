@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import classes.database as database_class
+from classes.replication import Replica
+
+
+def test_replica_creates_no_files(tmp_path):
+    log_path, replica_path = str(tmp_path / 'outbox'), str(tmp_path / 'replica')
+    os.makedirs(log_path)
+
+    # Nothing shipped yet, the replica doesn't bootstrap a database of its own
+    with pytest.raises(ValueError, match="read-only"):
+        Replica(log_path, replica_path)
+    assert os.listdir(replica_path) == ['replication.json']
+
+    db = database_class.Database(folder_path=log_path, enrollment_shards=2)
+    admin = db.read_users()[0]
+    admin.create_user(db, 'Ada', 'ada', 'Secret123!', 'student')
+
+    replica = Replica(log_path, replica_path)
+    shipped_names = [name for name in os.listdir(log_path) if not name.endswith('.lock')]
+    assert sorted(os.listdir(replica_path)) == sorted(shipped_names + ['replication.json'])
+    assert [user.id for user in replica.db.read_users()] == [user.id for user in db.read_users()]
+
+    with pytest.raises(ValueError, match="read-only"):
+        admin.create_user(replica.db, 'Bob', 'bob', 'Secret123!', 'student')
+    with pytest.raises(ValueError, match="read-only"):
+        replica.db.reshard_enrollments(1)
+
+    # Reopened read-only after a reshard of the primary
+    db.reshard_enrollments(1)
+    admin.create_user(db, 'Bob', 'bob', 'Secret123!', 'student')
+    shipped = replica.apply()
+    assert shipped['added'] and shipped['removed']
+    assert replica.db.read_only and replica.db.enrollments_files == [replica.db.enrollments_file]
+    assert [user.username for user in replica.db.read_users()] == ['admin', 'ada', 'bob']
+
+    replica.close()
+    db.close()
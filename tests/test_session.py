@@ -0,0 +1,21 @@
+import classes.database as database_class
+import classes.session as session_class
+
+
+def test_sessions_expire_after_their_ttl(tmp_path, monkeypatch):
+    db = database_class.Database(folder_path=str(tmp_path))
+    clock = [1000.0]
+    monkeypatch.setattr(session_class.time, 'monotonic', lambda: clock[0])
+    sessions = session_class.SessionStore(db, ttl=60)
+    idle = session_class.SessionStore(db, ttl=None)
+    token, idle_token = sessions.login('admin', 'admin'), idle.login('admin', 'admin')
+
+    clock[0] += 59
+    assert sessions.get(token).username == 'admin'
+    clock[0] += 59
+    assert sessions.get(token).username == 'admin'
+
+    clock[0] += 10 ** 6
+    assert sessions.get(token) is None
+    assert idle.get(idle_token).username == 'admin'
+    db.close()
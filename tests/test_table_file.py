@@ -0,0 +1,35 @@
+import multiprocessing
+from classes.table_file import TableFile
+
+FIELD_NAMES = ['id', 'name']
+
+
+def append_rows(file_path: str, prefix: str, count: int):
+    table = TableFile(file_path, FIELD_NAMES)
+    for i in range(count):
+        table.append({'id': f"{prefix}-{i}", 'name': 'new'})
+
+
+def test_compact_keeps_rows_appended_by_other_processes(tmp_path):
+    file_path = str(tmp_path / 'users.csv')
+    table = TableFile(file_path, FIELD_NAMES)
+    for i in range(200):
+        table.append({'id': f"old-{i}", 'name': 'old'})
+        table.append({'id': f"old-{i}", 'name': 'updated'})
+
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=append_rows, args=(file_path, f"p{n}", 300)) for n in range(3)]
+    for worker in workers:
+        worker.start()
+
+    while any(worker.is_alive() for worker in workers):
+        table.compact()
+
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    table.compact()
+    ids = {row['id'] for row in TableFile(file_path, FIELD_NAMES).live_records()}
+    assert len(ids) == 200 + 3 * 300
+    assert all(f"p{n}-{i}" in ids for n in range(3) for i in range(300))
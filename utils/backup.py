@@ -0,0 +1,57 @@
+"""
+Back up a database folder incrementally, list the backups, or restore the folder as of a backup.
+
+Usage:
+    python -m utils.backup create [folder_path] [backup_path]
+    python -m utils.backup list [backup_path]
+    python -m utils.backup restore <target_path> [backup_path] [--id N]
+"""
+import os
+import sys
+import argparse
+from classes.backup import BackupStore
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m utils.backup", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="Back up what was written since the previous backup.")
+    create.add_argument("folder_path", nargs="?", default="data", help="Folder path of the database (default: data).")
+    create.add_argument("backup_path", nargs="?", default="backups", help="Folder of the backups (default: backups).")
+
+    backups = commands.add_parser("list", help="List the backups.")
+    backups.add_argument("backup_path", nargs="?", default="backups", help="Folder of the backups (default: backups).")
+
+    restore = commands.add_parser("restore", help="Rebuild a database folder as of a backup.")
+    restore.add_argument("target_path", help="Empty folder to restore to.")
+    restore.add_argument("backup_path", nargs="?", default="backups", help="Folder of the backups (default: backups).")
+    restore.add_argument("--id", type=int, help="Number of the backup to restore (default: the latest).")
+
+    args = parser.parse_args()
+    store = BackupStore(args.backup_path)
+
+    try:
+        if args.command == "create":
+            if not os.path.isdir(args.folder_path):
+                sys.exit(f"No database folder at '{args.folder_path}'.")
+
+            backup = store.backup(args.folder_path)
+            full = [name for name, file in backup['files'].items() if file['kind'] == 'full']
+            print(f"Backup {backup['id']}: copied {backup['bytes_copied']} byte(s) of {len(backup['files'])} file(s)"
+                  f"{', in full: ' + ', '.join(full) if full else ''}.")
+
+        if args.command == "list":
+            for backup in store.get_backups():
+                print(f"{backup['id']}\t{backup['created_at']}\t{backup['bytes_copied']} byte(s)")
+
+        if args.command == "restore":
+            backup = store.restore(args.target_path, args.id)
+            print(f"Restored backup {backup['id']} of {backup['created_at']} to '{args.target_path}'.")
+
+    except ValueError as e:
+        sys.exit(f"{e}")
+
+
+if __name__ == "__main__":
+    main()
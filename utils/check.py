@@ -0,0 +1,48 @@
+"""
+Check the references between the users, courses and enrollments of a database folder,
+and optionally write a repaired copy of it.
+
+Usage: python -m utils.check [folder_path] [--repair OUTPUT_FOLDER] [--limit N] [--workers N]
+"""
+import os
+import sys
+import time
+import argparse
+import classes.database as database_class
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m utils.check", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("folder_path", nargs="?", default="data", help="Folder path of the database (default: data).")
+    parser.add_argument("--repair", metavar="OUTPUT_FOLDER",
+                        help="Write a copy without orphaned or duplicate enrollments and stale names to an empty folder.")
+    parser.add_argument("--limit", type=int, default=20, help="Problems listed of each kind (default: 20).")
+    parser.add_argument("--workers", type=int, help="Worker processes parsing large files (default: one per CPU).")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder_path):
+        sys.exit(f"No database folder at '{args.folder_path}'.")
+
+    db = database_class.Database(folder_path=args.folder_path, max_workers=args.workers)
+
+    try:
+        start = time.perf_counter()
+        report = db.check_integrity()
+        print(report.format(args.limit))
+        print(f"Checked in {time.perf_counter() - start:.2f} s.")
+
+        if args.repair:
+            db.write_repaired_copy(args.repair, report)
+            print(f"Wrote a repaired copy without {len(report.get_removed_enrollments())} enrollment(s) to '{args.repair}'.")
+
+    except ValueError as e:
+        sys.exit(f"{e}")
+
+    finally:
+        db.close()
+
+    sys.exit(1 if report else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,566 @@
+import os
+import sys
+import csv
+import json
+import argparse
+import classes.user as user_class
+import classes.database as database_class
+from classes.query import And, In
+from utils.utilities import audit, authenticate_user, run_audited
+
+USER_FIELDS = ["id", "name", "username", "role", "creator", "created_at"]
+COURSE_FIELDS = ["id", "name", "description", "capacity", "creator", "created_at"]
+ENROLLMENT_FIELDS = ["id", "user_id", "username", "course_id", "course_name", "creator", "created_at"]
+REPORT_FIELDS = ["id", "name", "capacity", "enrollments"]
+CHANGE_FIELDS = ["seq", "type", "operation", "id", "created_at", "data"]
+
+# Record type and default output fields of each exported entity
+EXPORTS = {
+    "users": ("user", USER_FIELDS),
+    "courses": ("course", COURSE_FIELDS),
+    "enrollments": ("enrollment", ENROLLMENT_FIELDS),
+}
+
+
+class AuthenticationError(Exception):
+    """Exception raised when the command line credentials are missing or invalid."""
+    pass
+
+
+def read_credentials(credentials_file=None):
+    """
+    Read the admin credentials from a credential file or the environment.
+
+    The credential file holds either a JSON object with username and password keys
+    or a single username:password line. Without a file, MINI_CANVAS_USERNAME and
+    MINI_CANVAS_PASSWORD are used.
+
+    Parameters:
+    - credentials_file (str): Optional. The path of the credential file.
+
+    Returns:
+    - tuple[str, str]: The username and password.
+
+    Raises:
+    - AuthenticationError: If no credentials were found.
+    """
+    if credentials_file:
+        with open(credentials_file, 'r') as file:
+            content = file.read().strip()
+
+        if content.startswith("{"):
+            credentials = json.loads(content)
+            return credentials.get("username", ""), credentials.get("password", "")
+
+        username, _, password = content.partition(":")
+        return username, password
+
+    username = os.environ.get("MINI_CANVAS_USERNAME", "")
+    password = os.environ.get("MINI_CANVAS_PASSWORD", "")
+
+    if not username or not password:
+        raise AuthenticationError(
+            "Missing credentials. Set MINI_CANVAS_USERNAME and MINI_CANVAS_PASSWORD or pass --credentials.")
+
+    return username, password
+
+
+def read_new_password():
+    """
+    Read the password of a user to create, so it never appears in the command line. It is
+    read from MINI_CANVAS_NEW_PASSWORD, or else prompted for without echo on a terminal, or
+    else read from the first line of stdin.
+
+    Returns:
+    - str: The password.
+    """
+    password = os.environ.get("MINI_CANVAS_NEW_PASSWORD", "")
+
+    if password:
+        return password
+
+    if sys.stdin.isatty():
+        import getpass
+        return getpass.getpass("Password: ")
+
+    return sys.stdin.readline().rstrip("\r\n")
+
+
+def authenticate(db, username: str, password: str):
+    """
+    Authenticate an admin once for the whole command, recording the login in the audit log.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - username (str): The username of the admin.
+    - password (str): The password of the admin.
+
+    Returns:
+    - Admin: The authenticated admin.
+
+    Raises:
+    - AuthenticationError: If the credentials are invalid or the user is not an admin.
+    """
+    user = run_audited(db, 'login', username, lambda: authenticate_user(db, username, password),
+                       interface='cli') if username else None
+
+    if not user:
+        audit(db, 'login', username, 'failure', interface='cli')
+        raise AuthenticationError("Invalid username or password")
+
+    if not isinstance(user, user_class.Admin):
+        audit(db, 'login', username, 'failure', interface='cli', error="not an admin")
+        raise AuthenticationError("Only admins can use the command line interface.")
+
+    audit(db, 'login', username, interface='cli')
+    return user
+
+
+def read_batch(file_path: str, input_format=None):
+    """
+    Read batch input records from a file or stdin.
+
+    Parameters:
+    - file_path (str): The path of the input file, '-' for stdin.
+    - input_format (str): Optional. 'csv' or 'json' (JSON Lines), guessed from the file extension by default.
+
+    Yields:
+    - dict: A dictionary for each input record.
+    """
+    if not input_format:
+        input_format = "json" if file_path.endswith((".json", ".jsonl")) else "csv"
+
+    file = sys.stdin if file_path == "-" else open(file_path, 'r', newline='')
+
+    try:
+        if input_format == "json":
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+class OutputWriter:
+    def __init__(self, output_format: str, field_names: list[str], stream=None):
+        """
+        Initialize an OutputWriter object, writing records as CSV or JSON Lines.
+
+        Parameters:
+        - output_format (str): 'csv' or 'json'.
+        - field_names (list[str]): The fields to write for each record.
+        - stream (TextIO): Optional. The stream to write to, defaults to sys.stdout.
+        """
+        self.output_format = output_format
+        self.field_names = field_names
+        self.stream = stream or sys.stdout
+        self._csv_writer = None
+
+        if output_format == "csv":
+            self._csv_writer = csv.DictWriter(
+                self.stream, fieldnames=field_names, extrasaction='ignore', lineterminator='\n')
+            self._csv_writer.writeheader()
+
+    def write(self, record: dict):
+        """
+        Write a single record.
+
+        Parameters:
+        - record (dict): The record to write.
+        """
+        if self._csv_writer:
+            self._csv_writer.writerow(record)
+        else:
+            self.stream.write(json.dumps({field: record.get(field, "") for field in self.field_names}) + "\n")
+
+
+def run_batch(records, action, writer: OutputWriter):
+    """
+    Run an action for every input record, reporting failures without stopping.
+
+    Parameters:
+    - records (Iterable[dict]): The input records.
+    - action (Callable): Takes an input record and returns the created object.
+    - writer (OutputWriter): Writer for the created records and errors.
+
+    Returns:
+    - int: The number of failed records.
+    """
+    failures = 0
+
+    for line, record in enumerate(records, start=1):
+        try:
+            writer.write({**action(record).__dict__, "status": "ok"})
+
+        except KeyError as e:
+            failures += 1
+            writer.write({"status": f"error: missing field {e}", "line": line})
+
+        except ValueError as e:
+            failures += 1
+            writer.write({"status": f"error: {e}", "line": line})
+
+    return failures
+
+
+def create_user(db, admin, record: dict):
+    """
+    Create a user from an input record, recording it in the audit log.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): The authenticated admin.
+    - record (dict): The name, username, password and optional role of the user.
+
+    Returns:
+    - Admin | Student: The created user.
+
+    Raises:
+    - KeyError: If a field is missing.
+    - ValueError: If the user is invalid.
+    """
+    username, role = record["username"], record.get("role") or "student"
+
+    user = run_audited(db, 'create_user', admin.username, lambda: admin.create_user(
+        db, record["name"], username, record["password"], role), username=username, role=role)
+    audit(db, 'create_user', admin.username, id=user.id, username=username, role=role)
+    return user
+
+
+def create_course(db, admin, record: dict):
+    """
+    Create a course from an input record, recording it in the audit log.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): The authenticated admin.
+    - record (dict): The name, description and optional capacity of the course.
+
+    Returns:
+    - Course: The created course.
+
+    Raises:
+    - KeyError: If a field is missing.
+    - ValueError: If the course is invalid.
+    """
+    name, capacity = record["name"], record.get("capacity") or ""
+
+    course = run_audited(db, 'create_course', admin.username, lambda: admin.create_course(
+        db, name, record["description"], capacity), name=name)
+    audit(db, 'create_course', admin.username, id=course.id, name=name, capacity=capacity)
+    return course
+
+
+def create_enrollment(db, admin, record: dict):
+    """
+    Enroll a student from an input record, recording it in the audit log.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): The authenticated admin.
+    - record (dict): The username of the student and the course_id.
+
+    Returns:
+    - Enrollment: The created enrollment.
+
+    Raises:
+    - KeyError: If a field is missing.
+    - ValueError: If the student can't be enrolled, e.g. the course is full.
+    """
+    username, course_id = record["username"], record["course_id"]
+
+    enrollment = run_audited(db, 'enroll_user', admin.username, lambda: admin.create_enrollment(
+        db, username, course_id), username=username, course_id=course_id)
+    audit(db, 'enroll_user', admin.username, id=enrollment.id, username=username, course_id=course_id)
+    return enrollment
+
+
+def build_parser():
+    """
+    Build the command line parser.
+
+    Returns:
+    - argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Run Mini Canvas admin operations without the interactive menus.")
+    parser.add_argument("--data", default="data", help="Folder path of the database (default: data).")
+    parser.add_argument("--credentials", help="Credential file with a JSON object or a username:password line.")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv",
+                        help="Output format, json writes JSON Lines (default: csv).")
+
+    batch = argparse.ArgumentParser(add_help=False)
+    batch.add_argument("file", nargs="?", default="-", help="Input file, '-' or nothing for stdin.")
+    batch.add_argument("--input-format", choices=["csv", "json"],
+                       help="Input format, guessed from the file extension by default.")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    users = commands.add_parser("users", help="List, create or import users.")
+    users_commands = users.add_subparsers(dest="action", required=True)
+    users_list = users_commands.add_parser("list", help="List users.")
+    users_list.add_argument("--role", choices=["student", "admin"])
+    users_create = users_commands.add_parser("create", help="Create a user.")
+    users_create.add_argument("--name", required=True)
+    users_create.add_argument("--username", required=True)
+    users_create.add_argument("--password", help="Password of the user, visible to other users of the machine. "
+                              "Read from MINI_CANVAS_NEW_PASSWORD, a prompt or stdin by default.")
+    users_create.add_argument("--role", choices=["student", "admin"], default="student")
+    users_commands.add_parser(
+        "import", parents=[batch], help="Create users from name, username, password and role records.")
+
+    courses = commands.add_parser("courses", help="List, create or import courses.")
+    courses_commands = courses.add_subparsers(dest="action", required=True)
+    courses_commands.add_parser("list", help="List courses.")
+    courses_create = courses_commands.add_parser("create", help="Create a course.")
+    courses_create.add_argument("--name", required=True)
+    courses_create.add_argument("--description", required=True)
+    courses_create.add_argument("--capacity", default="", help="Maximum number of enrollments (default: no limit).")
+    courses_commands.add_parser(
+        "import", parents=[batch], help="Create courses from name, description and optional capacity records.")
+
+    enroll = commands.add_parser(
+        "enroll", parents=[batch], help="Enroll students from username and course_id records.")
+    enroll.add_argument("--username", help="Enroll a single student instead of reading records.")
+    enroll.add_argument("--course-id", help="Course of the single student to enroll.")
+
+    report = commands.add_parser("report", help="Report enrollments.")
+    report.add_argument("--username", help="List the enrollments of a user.")
+    report.add_argument("--course-id", help="List the enrollments of a course.")
+    report.add_argument("--history", action="store_true", help="Also list the enrollments of past terms.")
+
+    export = commands.add_parser(
+        "export", help="Export a table sorted and filtered, sorting in bounded memory.")
+    export.add_argument("entity", choices=list(EXPORTS))
+    export.add_argument("--sort", help="Comma separated fields to sort by, prefix a field with - to sort it in descending order.")
+    export.add_argument("--where", action="append", default=[], metavar="FIELD=VALUE",
+                        help="Only export rows where the field has the value. Repeat for several fields, or a field for several values.")
+    export.add_argument("--fields", help="Comma separated fields to write, every field but passwords by default.")
+    export.add_argument("--output", help="Output file, stdout by default.")
+    export.add_argument("--memory-limit", type=int, default=64,
+                        help="MiB of rows sorted in memory before they are spilled to a temporary file (default: 64).")
+
+    changes = commands.add_parser(
+        "changes", help="Read the users, courses and enrollments written after a cursor.")
+    changes.add_argument("--cursor", type=int, default=0, help="Cursor to read from (default: 0, the first change).")
+    changes.add_argument("--cursor-file", help="File to resume from and to save the cursor to after every batch.")
+    changes.add_argument("--limit", type=int, default=100, help="Maximum number of changes per batch (default: 100).")
+    changes.add_argument("--timeout", type=float, default=0,
+                         help="Seconds to wait for a change when there are none yet (default: 0).")
+    changes.add_argument("--follow", action="store_true", help="Keep reading batches until interrupted.")
+
+    return parser
+
+
+def export_table(db, args):
+    """
+    Stream a table through filters and an external merge sort to the output.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - args (argparse.Namespace): The export command arguments.
+
+    Raises:
+    - ValueError: If a field or filter is invalid.
+    """
+    from utils.external_sort import external_sort, get_sort_key
+
+    record_type, field_names = EXPORTS[args.entity]
+    stored_field_names = {"user": db.users_field_names, "course": db.courses_field_names,
+                          "enrollment": db.enrollments_field_names}[record_type]
+    # Stored fields, plus the usernames and course names joined into enrollments
+    all_field_names = [*stored_field_names, *(field for field in field_names if field not in stored_field_names)]
+    field_names = args.fields.split(",") if args.fields else field_names
+    sort_fields = args.sort.split(",") if args.sort else []
+    values: dict[str, set[str]] = {}
+
+    for condition in args.where:
+        field, separator, value = condition.partition("=")
+        if not separator:
+            raise ValueError(f"Invalid filter '{condition}'. Use FIELD=VALUE.")
+        values.setdefault(field, set()).add(value)
+
+    for field in [*field_names, *(field.lstrip("-") for field in sort_fields), *values]:
+        if field not in all_field_names:
+            raise ValueError(
+                f"Invalid field '{field}'. Allowed fields: {', '.join(all_field_names)}")
+
+    # Stored fields are filtered by the query planner, which uses their indexes
+    where = And(*(In(field, values[field]) for field in values if field in stored_field_names))
+    joined_where = And(*(In(field, values[field]) for field in values if field not in stored_field_names))
+    rows = db.iter_query(record_type, where if where.predicates else None)
+    if joined_where.predicates:
+        rows = filter(joined_where, rows)
+
+    if sort_fields:
+        key, reverse = get_sort_key(sort_fields)
+        rows = external_sort(rows, key, reverse, memory_limit=args.memory_limit * 2 ** 20)
+
+    file = open(args.output, "w", newline="") if args.output else sys.stdout
+
+    try:
+        writer = OutputWriter(args.format, field_names, file)
+        for row in rows:
+            writer.write(row)
+
+    finally:
+        if file is not sys.stdout:
+            file.close()
+
+
+def read_changes(db, args):
+    """
+    Write batches of changes to the output, saving the cursor after each one.
+
+    Changes are written before their cursor is saved, so a consumer that stops
+    between the two reads the last batch again when it resumes.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - args (argparse.Namespace): The changes command arguments.
+
+    Raises:
+    - ValueError: If the cursor or limit is invalid.
+    """
+    cursor = args.cursor
+
+    if args.cursor_file and os.path.exists(args.cursor_file):
+        with open(args.cursor_file, 'r') as file:
+            cursor = int(file.read().strip() or 0)
+
+    writer = OutputWriter(args.format, CHANGE_FIELDS)
+
+    while True:
+        changes, cursor = db.read_changes(cursor, args.limit, args.timeout or (30 if args.follow else 0))
+
+        for change in changes:
+            writer.write(change if args.format == "json" else {**change, "data": json.dumps(change["data"])})
+        sys.stdout.flush()
+
+        if args.cursor_file:
+            temp_path = f"{args.cursor_file}.tmp"
+            with open(temp_path, 'w') as file:
+                file.write(f"{cursor}\n")
+            os.replace(temp_path, args.cursor_file)
+
+        if not args.follow and len(changes) < args.limit:
+            return
+
+
+def run_cli(argv: list[str]):
+    """
+    Run a command line invocation.
+
+    Parameters:
+    - argv (list[str]): The command line arguments, without the program name.
+
+    Returns:
+    - int: The exit status, 0 on success, 1 if any record failed and 2 if authentication failed.
+    """
+    args = build_parser().parse_args(argv)
+
+    db = database_class.Database(folder_path=args.data)
+
+    try:
+        return run_command(db, args)
+
+    finally:
+        db.close()
+
+
+def run_command(db, args):
+    """
+    Run a parsed command line invocation on an open database.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - args (argparse.Namespace): The command line arguments.
+
+    Returns:
+    - int: The exit status, see run_cli.
+    """
+    try:
+        admin = authenticate(db, *read_credentials(args.credentials))
+
+    except (AuthenticationError, OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    failures = 0
+
+    if args.command == "users":
+        writer = OutputWriter(args.format, USER_FIELDS if args.action == "list" else [*USER_FIELDS, "status", "line"])
+
+        if args.action == "list":
+            for user in admin.get_all_users(db):
+                if not args.role or user.role == args.role:
+                    writer.write(user.__dict__)
+
+        if args.action == "create":
+            record = {**vars(args), "password": args.password or read_new_password()}
+            failures = run_batch([record], lambda record: create_user(db, admin, record), writer)
+
+        if args.action == "import":
+            failures = run_batch(read_batch(args.file, args.input_format),
+                                 lambda record: create_user(db, admin, record), writer)
+
+    if args.command == "courses":
+        writer = OutputWriter(args.format, COURSE_FIELDS if args.action == "list" else [*COURSE_FIELDS, "status", "line"])
+
+        if args.action == "list":
+            for course in admin.get_all_courses(db):
+                writer.write(course.__dict__)
+
+        if args.action == "create":
+            failures = run_batch([vars(args)], lambda record: create_course(db, admin, record), writer)
+
+        if args.action == "import":
+            failures = run_batch(read_batch(args.file, args.input_format),
+                                 lambda record: create_course(db, admin, record), writer)
+
+    if args.command == "enroll":
+        writer = OutputWriter(args.format, [*ENROLLMENT_FIELDS, "status", "line"])
+        records = [{"username": args.username, "course_id": args.course_id}] if args.username \
+            else read_batch(args.file, args.input_format)
+
+        failures = run_batch(records, lambda record: create_enrollment(db, admin, record), writer)
+
+    if args.command == "report":
+        if args.username or args.course_id:
+            writer = OutputWriter(args.format, ENROLLMENT_FIELDS)
+            enrollments = admin.get_enrollments_by_user(db, args.username, args.history) if args.username \
+                else admin.get_enrollments_by_course_id(db, args.course_id, args.history)
+            for enrollment in enrollments:
+                writer.write(enrollment.__dict__)
+
+        else:
+            writer = OutputWriter(args.format, REPORT_FIELDS)
+            for course in admin.get_all_courses(db):
+                writer.write({**course.__dict__, "enrollments": db.count_enrollments(course.id)})
+
+    if args.command == "export":
+        try:
+            export_table(db, args)
+
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    if args.command == "changes":
+        try:
+            read_changes(db, args)
+
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+        except KeyboardInterrupt:
+            pass
+
+    sys.stdout.flush()
+
+    return 1 if failures else 0
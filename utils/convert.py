@@ -0,0 +1,43 @@
+"""
+Convert table files between plain CSV and compressed blocks.
+
+Usage:
+  python -m utils.convert to-blocks <csv_path> [blocks_path] [--codec zlib|lzma] [--block-rows N]
+  python -m utils.convert to-csv <blocks_path> [csv_path]
+"""
+import os
+import argparse
+from classes.block_table import CODECS, BlockTable, blocks_to_csv, csv_to_blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert table files between plain CSV and compressed blocks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    to_blocks = commands.add_parser("to-blocks", help="Compress a CSV table file.")
+    to_blocks.add_argument("csv_path")
+    to_blocks.add_argument("blocks_path", nargs="?")
+    to_blocks.add_argument("--codec", choices=list(CODECS), default="zlib")
+    to_blocks.add_argument("--block-rows", type=int, default=1024)
+
+    to_csv = commands.add_parser("to-csv", help="Decompress a block table file.")
+    to_csv.add_argument("blocks_path")
+    to_csv.add_argument("csv_path", nargs="?")
+
+    args = parser.parse_args()
+
+    if args.command == "to-blocks":
+        blocks_path = args.blocks_path or f"{os.path.splitext(args.csv_path)[0]}.blk"
+        table = csv_to_blocks(args.csv_path, blocks_path, args.codec, args.block_rows)
+        print(f"Wrote {len(table)} rows in {len(table.blocks)} blocks to '{blocks_path}' "
+              f"({os.path.getsize(args.csv_path)} -> {os.path.getsize(blocks_path)} bytes).")
+
+    if args.command == "to-csv":
+        csv_path = args.csv_path or f"{os.path.splitext(args.blocks_path)[0]}.csv"
+        blocks_to_csv(args.blocks_path, csv_path)
+        print(f"Wrote {len(BlockTable(args.blocks_path))} rows to '{csv_path}'.")
+
+
+if __name__ == "__main__":
+    main()
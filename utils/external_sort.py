@@ -0,0 +1,157 @@
+import os
+import sys
+import heapq
+import pickle
+import tempfile
+from functools import cmp_to_key
+from itertools import islice
+from operator import itemgetter
+
+# Rows pickled together in a run file, reading a run holds one batch in memory
+RUN_BATCH_ROWS = 1024
+
+
+def get_sort_key(fields: list[str]):
+    """
+    Build the key of a sort by several fields.
+
+    Parameters:
+    - fields (list[str]): The fields to sort by, prefixed with '-' to sort in descending order.
+
+    Returns:
+    - tuple[Callable, bool]: The key function and whether to reverse the order.
+
+    Raises:
+    - ValueError: If no field is given.
+    """
+    names = [field.lstrip('-') for field in fields]
+    descending = [field.startswith('-') for field in fields]
+
+    if not names or not all(names):
+        raise ValueError("Invalid sort. Give at least one field name.")
+
+    if len(set(descending)) == 1:
+        return itemgetter(*names), descending[0]
+
+    # Mixed directions can't be expressed by reversing a single key, so compare field by field
+    def compare(left: dict, right: dict):
+        for name, reverse in zip(names, descending):
+            if left[name] != right[name]:
+                return (-1 if left[name] < right[name] else 1) * (-1 if reverse else 1)
+        return 0
+
+    return cmp_to_key(compare), False
+
+
+def estimate_row_size(row: dict):
+    """
+    Estimate the memory held by a row.
+
+    Parameters:
+    - row (dict): The row.
+
+    Returns:
+    - int: The estimated size in bytes.
+    """
+    return sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row.values())
+
+
+def _write_run(directory: str, header: list[str], rows):
+    """
+    Spill sorted rows to a temporary run file.
+
+    Parameters:
+    - directory (str): The folder of the run files.
+    - header (list[str]): The fields of the rows, stored once instead of in every row.
+    - rows (Iterable[dict]): The sorted rows.
+
+    Returns:
+    - str: The path of the run file.
+    """
+    rows = iter(rows)
+
+    with tempfile.NamedTemporaryFile('wb', dir=directory, suffix='.run', delete=False) as file:
+        while batch := [tuple(row[field] for field in header) for row in islice(rows, RUN_BATCH_ROWS)]:
+            pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return file.name
+
+
+def _read_run(file_path: str, header: list[str]):
+    """
+    Read the rows of a run file back, one at a time.
+
+    Parameters:
+    - file_path (str): The path of the run file.
+    - header (list[str]): The fields of the rows.
+
+    Yields:
+    - dict: A dictionary for each row, in sorted order.
+    """
+    with open(file_path, 'rb') as file:
+        while True:
+            try:
+                batch = pickle.load(file)
+            except EOFError:
+                return
+            for values in batch:
+                yield dict(zip(header, values))
+
+
+def external_sort(rows, key=None, reverse=False, memory_limit=64 * 2 ** 20, max_runs=64, temp_dir=None):
+    """
+    Sort rows of any number with bounded memory. Rows are collected until they take
+    memory_limit bytes, sorted and spilled to a temporary run file, and the runs are
+    merged with a k-way heapq.merge as the result is consumed. Once there are max_runs
+    runs they are merged into one, which also bounds the number of open files.
+
+    The sort is stable, rows with equal keys keep their input order.
+
+    Parameters:
+    - rows (Iterable[dict]): The rows to sort, all with the same fields.
+    - key (Callable): Optional. The sort key of a row, see get_sort_key.
+    - reverse (bool): Optional. Sort in descending order.
+    - memory_limit (int): Optional. Estimated bytes of rows held in memory at a time.
+    - max_runs (int): Optional. Maximum number of run files merged at once.
+    - temp_dir (str): Optional. The folder to create the run files in.
+
+    Yields:
+    - dict: The rows, in sorted order.
+    """
+    directory = tempfile.TemporaryDirectory(prefix='sort-', dir=temp_dir)
+
+    try:
+        header = None
+        runs: list[str] = []
+        run: list[dict] = []
+        run_size = 0
+
+        for row in rows:
+            if header is None:
+                header = list(row)
+
+            run.append(row)
+            run_size += estimate_row_size(row)
+
+            if run_size >= memory_limit:
+                run.sort(key=key, reverse=reverse)
+                runs.append(_write_run(directory.name, header, run))
+                run = []
+                run_size = 0
+
+            if len(runs) >= max_runs:
+                merged = heapq.merge(*(_read_run(file_path, header) for file_path in runs),
+                                     key=key, reverse=reverse)
+                merged_run = _write_run(directory.name, header, merged)
+                for file_path in runs:
+                    os.remove(file_path)
+                runs = [merged_run]
+
+        run.sort(key=key, reverse=reverse)
+
+        # The last run is merged straight from memory
+        yield from heapq.merge(*(_read_run(file_path, header) for file_path in runs), run,
+                               key=key, reverse=reverse)
+
+    finally:
+        directory.cleanup()
@@ -0,0 +1,30 @@
+"""
+Apply the pending schema migrations of a database folder. The application can keep
+running meanwhile.
+
+Usage: python -m utils.migrate [folder_path] [record_type]
+"""
+import os
+import sys
+import classes.database as database_class
+
+
+def main():
+    folder_path = sys.argv[1] if len(sys.argv) > 1 else 'data'
+    record_type = sys.argv[2] if len(sys.argv) > 2 else None
+
+    if not os.path.isdir(folder_path):
+        sys.exit(__doc__.strip())
+
+    db = database_class.Database(folder_path=folder_path)
+    migrated = db.migrate(record_type)
+
+    for file_path, version, new_version, records in migrated:
+        print(f"Migrated '{file_path}' from version {version} to {new_version} ({records} record(s) rewritten).")
+
+    if not migrated:
+        print(f"Every table in '{folder_path}' is up to date.")
+
+
+if __name__ == "__main__":
+    main()
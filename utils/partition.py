@@ -0,0 +1,70 @@
+"""
+Close terms, moving their enrollments out of the enrollment shards into a partition per
+term, list the partitions, and compress the partitions of old terms.
+
+Usage:
+    python -m utils.partition close <term> <end> [folder_path]
+    python -m utils.partition list [folder_path]
+    python -m utils.partition archive [folder_path] [--keep N] [--codec zlib|lzma]
+"""
+import os
+import sys
+import argparse
+import classes.database as database_class
+from classes.block_table import CODECS
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m utils.partition", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    close = commands.add_parser("close", help="Move the enrollments created before the end of a term into its partition.")
+    close.add_argument("term", help="Name of the term, e.g. 2024-fall.")
+    close.add_argument("end", help="ISO date the next term starts at, e.g. 2025-01-01.")
+    close.add_argument("folder_path", nargs="?", default="data", help="Folder path of the database (default: data).")
+
+    partitions = commands.add_parser("list", help="List the partitions of past terms.")
+    partitions.add_argument("folder_path", nargs="?", default="data", help="Folder path of the database (default: data).")
+
+    archive = commands.add_parser("archive", help="Compress the partitions of old terms into blocks.")
+    archive.add_argument("folder_path", nargs="?", default="data", help="Folder path of the database (default: data).")
+    archive.add_argument("--keep", type=int, default=1, help="Latest past terms left uncompressed (default: 1).")
+    archive.add_argument("--codec", choices=list(CODECS), default="zlib")
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder_path):
+        sys.exit(f"No database folder at '{args.folder_path}'.")
+
+    db = database_class.Database(folder_path=args.folder_path)
+
+    try:
+        if args.command == "close":
+            partition = db.close_term(args.term, args.end)
+            print(f"Closed term {partition['term']}: moved {partition['rows']} enrollment(s) to '{partition['file']}'.")
+
+        if args.command == "list":
+            for partition in db.get_partitions():
+                size = os.path.getsize(os.path.join(args.folder_path, partition['file']))
+                print(f"{partition['term']}\t{partition['start'] or '-'}\t{partition['last'] or '-'}\t{partition['end']}\t"
+                      f"{partition['rows']} row(s)\t{partition['file']}\t{size} byte(s)")
+
+        if args.command == "archive":
+            partitions = db.get_partitions()
+            for partition in partitions[:max(0, len(partitions) - args.keep)]:
+                if partition['file'].endswith('.blk'):
+                    continue
+                size = os.path.getsize(os.path.join(args.folder_path, partition['file']))
+                partition = db.archive_term(partition['term'], args.codec)
+                print(f"Archived term {partition['term']} to '{partition['file']}' "
+                      f"({size} -> {os.path.getsize(os.path.join(args.folder_path, partition['file']))} bytes).")
+
+    except ValueError as e:
+        sys.exit(f"{e}")
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Ship the records appended to a database folder into another folder, the transport
+folder of a replica or the folder of the replica itself, and report the replication lag.
+
+Usage:
+    python -m utils.replicate ship <source_path> <target_path> [--interval S] [--once]
+    python -m utils.replicate status <source_path> <target_path>
+"""
+import os
+import sys
+import time
+import argparse
+from classes.replication import LogShipper
+
+
+def format_lag(lag: dict):
+    """
+    Describe a replication lag.
+
+    Parameters:
+    - lag (dict): The lag, see LogShipper.get_lag.
+
+    Returns:
+    - str: The description.
+    """
+    seconds = 'never shipped' if lag['seconds'] is None else f"{lag['seconds']:.2f} s"
+    return f"lag: {seconds}, {lag['pending_bytes']} byte(s) pending"
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m utils.replicate", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ship = commands.add_parser("ship", help="Copy what was written since the previous call, until interrupted.")
+    ship.add_argument("source_path", help="Folder of the primary, or a folder shipped from it.")
+    ship.add_argument("target_path", help="Folder to copy it to.")
+    ship.add_argument("--interval", type=float, default=0.25, help="Seconds between two calls (default: 0.25).")
+    ship.add_argument("--once", action="store_true", help="Ship once and exit.")
+
+    status = commands.add_parser("status", help="Report the replication lag.")
+    status.add_argument("source_path", help="Folder of the primary, or a folder shipped from it.")
+    status.add_argument("target_path", help="Folder it is copied to.")
+
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.source_path):
+        sys.exit(f"No database folder at '{args.source_path}'.")
+
+    shipper = LogShipper(args.source_path, args.target_path)
+
+    if args.command == "status":
+        print(format_lag(shipper.get_lag()))
+        return
+
+    try:
+        while True:
+            try:
+                shipped = shipper.ship()
+                if shipped['bytes_copied'] or shipped['removed']:
+                    full = shipped['added'] + shipped['copied']
+                    print(f"Shipped {shipped['bytes_copied']} byte(s)"
+                          f"{', in full: ' + ', '.join(full) if full else ''}"
+                          f"{', removed: ' + ', '.join(shipped['removed']) if shipped['removed'] else ''}"
+                          f" ({format_lag(shipper.get_lag())}).", flush=True)
+
+            except (OSError, ValueError) as e:
+                if args.once:
+                    sys.exit(f"{e}")
+                # e.g. an unmounted transport folder, retried at the next interval
+                print(f"Shipping failed, retrying: {e}", file=sys.stderr, flush=True)
+
+            if args.once:
+                break
+            time.sleep(args.interval)
+
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""
+Convert the enrollments of a database folder to a number of shard files.
+
+Usage: python -m utils.reshard <shards> [folder_path]
+"""
+import sys
+import classes.database as database_class
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit(__doc__.strip())
+
+    shards = int(sys.argv[1])
+    folder_path = sys.argv[2] if len(sys.argv) > 2 else 'data'
+
+    db = database_class.Database(folder_path=folder_path)
+    before = len(db.enrollments_files)
+    db.reshard_enrollments(shards)
+
+    print(f"Resharded enrollments in '{folder_path}' from {before} to {shards} shard(s).")
+
+
+if __name__ == "__main__":
+    main()
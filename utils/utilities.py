@@ -1,26 +1,49 @@
 import os
 import sys
-import uuid
+import time
+import hmac
 import hashlib
-from getpass import getpass
+import threading
 from datetime import datetime
-import classes.user as user_class
-import classes.course as course_class
-from prettytable import PrettyTable
+from classes.screen import Screen
+from classes.render_cache import RenderCache
+
+# Modules that are slow to import or only needed by some actions, such as uuid, prettytable,
+# concurrent.futures and the classes package, are imported where they are first used.
 
 
 MAX_ATTEMPTS = 5
 
+# Format of new ids, 'ulid' for time-sortable 26 character ids or 'uuid' for random uuid4 strings.
+# Ids of both formats can live side by side in the same tables.
+ID_FORMAT = 'ulid'
 
-class MaxAttemptsExceededError(Exception):
-    """Exception raised when the maximum login attempts are exceeded."""
-    pass
+# Crockford's base32 alphabet used by ULIDs
+ULID_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+# Letters Crockford's base32 reads as the digits they look like
+ULID_ALIASES = str.maketrans('ILO', '110')
+ULID_LENGTH = 26
 
+_ulid_lock = threading.Lock()
+_last_ulid = 0
 
-def reset_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
-    print(
-        """
+# Key derivation function of new password hashes, 'scrypt' or 'pbkdf2_sha256', and its cost:
+# the scrypt n (memory use is 128 * n * SCRYPT_BLOCK_SIZE bytes) or the PBKDF2 iterations.
+# Stored hashes record their own settings, passwords hashed with other settings are rehashed on login.
+PASSWORD_HASH_ALGORITHM = 'scrypt'
+PASSWORD_HASH_COSTS = {'scrypt': 2 ** 14, 'pbkdf2_sha256': 600_000}
+SCRYPT_BLOCK_SIZE = 8
+SCRYPT_PARALLELISM = 1
+
+# Threads verifying passwords, and the number of verifications that may wait for one
+PASSWORD_WORKERS = min(4, os.cpu_count() or 1)
+PASSWORD_QUEUE_SIZE = PASSWORD_WORKERS * 4
+
+_password_lock = threading.Lock()
+_password_executor = None
+_password_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_SIZE)
+
+BANNER = """
    ▄▄   ▄▄ ▄▄▄ ▄▄    ▄ ▄▄▄    ▄▄▄▄▄▄▄ ▄▄▄▄▄▄ ▄▄    ▄ ▄▄   ▄▄ ▄▄▄▄▄▄ ▄▄▄▄▄▄▄
   █  █▄█  █   █  █  █ █   █  █       █      █  █  █ █  █ █  █      █       █
   █       █   █   █▄█ █   █  █       █  ▄   █   █▄█ █  █▄█  █  ▄   █  ▄▄▄▄▄█
@@ -30,7 +53,27 @@ def reset_screen():
   █▄█   █▄█▄▄▄█▄█  █▄▄█▄▄▄█  █▄▄▄▄▄▄▄█▄█ █▄▄█▄█  █▄▄█ █▄▄▄█ █▄█ █▄▄█▄▄▄▄▄▄▄█
   
                                                             by Cytro
-""")
+"""
+
+screen = Screen(banner=BANNER)
+
+# Rendered tables, keyed by the version of the data they show
+render_cache = RenderCache()
+
+# Audit logs of logins and admin actions, keyed by file path
+_audit_logs = {}
+
+
+class MaxAttemptsExceededError(Exception):
+    """Exception raised when the maximum login attempts are exceeded."""
+    pass
+
+
+def reset_screen():
+    """
+    Start a new screen below the banner, without spawning a shell to clear the terminal.
+    """
+    screen.reset()
 
 
 def validate_string_input(input_string: str):
@@ -66,52 +109,205 @@ def validate_menu_input(input_value: str, min_value: int, max_value: int):
         return False
 
 
-def login_flow(db):
+def audit(db, action: str, actor: str, outcome='success', **details):
     """
-    A login flow with a limited number of attempts.
+    Record a login or an admin action in the audit log of a database folder, audit.jsonl.
+    The event is written by a background thread, see AuditLog.
 
     Parameters:
     - db (Database): The Database instance.
+    - action (str): What was done, e.g. 'create_user'.
+    - actor (str): The username of who did it.
+    - outcome (str): Optional. 'success' or 'failure'.
+    - details: Optional. JSON serializable fields of the event, never passwords.
+    """
+    file_path = os.path.join(db.folder_path, 'audit.jsonl')
+    audit_log = _audit_logs.get(file_path)
+
+    if audit_log is None:
+        from classes.audit_log import AuditLog
+        audit_log = _audit_logs.setdefault(file_path, AuditLog(file_path))
+
+    audit_log.record(action, actor, outcome, **details)
+
+
+def run_audited(db, action: str, actor: str, run, **details):
+    """
+    Run a login or an admin action, recording a failure in the audit log whatever the error.
+    Successes are recorded by the caller, with the ids of what was written.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - action (str): What is done, e.g. 'create_user'.
+    - actor (str): The username of who does it.
+    - run (Callable): Runs the action and returns its result.
+    - details: Optional. JSON serializable fields of a failure event, never passwords.
 
     Returns:
-    - User: An instance of either Admin or Student based on the role.
+    - The result of run.
+
+    Raises:
+    - Exception: Whatever run raises.
+    """
+    try:
+        return run()
+
+    except Exception as e:
+        audit(db, action, actor, 'failure', **details, error=f"{e}")
+        raise
+
+
+def login_flow(sessions):
+    """
+    A login flow with a limited number of attempts.
+
+    Parameters:
+    - sessions (SessionStore): The SessionStore to start the session in.
+
+    Returns:
+    - str: The token of the session, use sessions.get to get the Admin or Student.
     """
     attempts = 0
 
     while attempts < MAX_ATTEMPTS:
-        username = input("Enter your username: ")
-        password = getpass(prompt="Enter your password (hidden): ")
+        username = screen.input("Enter your username: ")
+        password = screen.getpass(prompt="Enter your password (hidden): ")
 
         attempts += 1
 
         if not validate_string_input(username) or not validate_string_input(password):
-            print("username and password can not be empty.")
+            screen.print("username and password can not be empty.")
             continue
 
-        user = db.read_user(username=username)
+        token = run_audited(sessions.db, 'login', username, lambda: sessions.login(username, password), attempt=attempts)
 
-        if not user:
-            print("Invalid username or password")
+        if not token:
+            audit(sessions.db, 'login', username, 'failure', attempt=attempts)
+            screen.print("Invalid username or password")
             continue
 
-        if not compare_password_to_hash(password, user.password):
-            print("Invalid username or password")
-            continue
-
-        return user.to_admin_or_student()
+        audit(sessions.db, 'login', username, attempt=attempts)
+        return token
 
     raise MaxAttemptsExceededError(
         "Exceeded maximum login attempts. Try again later.")
 
 
-def get_unique_id():
+def get_unique_id(id_format=None):
+    """
+    Generate a unique id.
+
+    Parameters:
+    - id_format (str): Optional. 'ulid' or 'uuid', defaults to ID_FORMAT.
+
+    Returns:
+    - str: A string representation of a unique ULID or UUID.
+
+    Raises:
+    - ValueError: If id_format is invalid.
+    """
+    id_format = id_format or ID_FORMAT
+
+    if id_format == 'ulid':
+        return bytes_to_ulid(get_ulid_bytes())
+
+    if id_format == 'uuid':
+        import uuid
+        return str(uuid.uuid4())
+
+    raise ValueError("Invalid id format. Allowed formats: ulid, uuid")
+
+
+def get_ulid_bytes():
     """
-    Generate a unique UUID.
+    Generate a ULID in its 16-byte binary form: a 48-bit millisecond timestamp
+    followed by 80 random bits. Ids generated within the same millisecond
+    increment the random part, so they keep sorting in creation order.
 
     Returns:
-    - str: A string representation of a unique UUID.
+    - bytes: The 16-byte ULID.
     """
-    return str(uuid.uuid4())
+    global _last_ulid
+
+    timestamp = time.time_ns() // 1_000_000
+
+    with _ulid_lock:
+        if timestamp == _last_ulid >> 80:
+            value = _last_ulid + 1
+        else:
+            value = (timestamp << 80) | int.from_bytes(os.urandom(10), 'big')
+        _last_ulid = value
+
+    return value.to_bytes(16, 'big')
+
+
+def bytes_to_ulid(value: bytes):
+    """
+    Encode a 16-byte ULID as a 26 character string.
+
+    Parameters:
+    - value (bytes): The 16-byte ULID.
+
+    Returns:
+    - str: The ULID string.
+    """
+    number = int.from_bytes(value, 'big')
+    characters = []
+
+    for _ in range(ULID_LENGTH):
+        number, index = divmod(number, 32)
+        characters.append(ULID_ALPHABET[index])
+
+    return ''.join(reversed(characters))
+
+
+def ulid_to_bytes(id: str):
+    """
+    Decode a 26 character ULID string to its 16-byte binary form. Decoding is case
+    insensitive, and I, L and O are read as 1, 1 and 0.
+
+    Parameters:
+    - id (str): The ULID string.
+
+    Returns:
+    - bytes: The 16-byte ULID.
+
+    Raises:
+    - ValueError: If id is not a ULID.
+    """
+    if len(id) != ULID_LENGTH:
+        raise ValueError("Invalid ULID. A ULID has 26 characters.")
+
+    number = 0
+    for character in id.upper().translate(ULID_ALIASES):
+        index = ULID_ALPHABET.find(character)
+        if index < 0:
+            raise ValueError(f"Invalid ULID character '{character}'.")
+        number = number * 32 + index
+
+    if number >> 128:
+        raise ValueError("Invalid ULID. Value is larger than 128 bits.")
+
+    return number.to_bytes(16, 'big')
+
+
+def get_id_timestamp(id: str):
+    """
+    Get the creation time embedded in an id.
+
+    Parameters:
+    - id (str): A ULID or UUID string.
+
+    Returns:
+    - datetime or None: The creation time of a ULID, None for UUIDs and other ids.
+    """
+    try:
+        timestamp = int.from_bytes(ulid_to_bytes(id)[:6], 'big')
+
+    except ValueError:
+        return None
+
+    return datetime.fromtimestamp(timestamp / 1000)
 
 
 def get_current_datetime():
@@ -125,34 +321,154 @@ def get_current_datetime():
     return current_datetime.isoformat()
 
 
-def hash_password(password: str):
+def hash_password(password: str, algorithm=None, cost=None):
     """
-    Hash a password using SHA-256.
+    Hash a password with a salted key derivation function.
+
+    The hash records its algorithm, cost and salt, e.g. 'scrypt$16384$8$1$<salt>$<hash>'
+    or 'pbkdf2_sha256$600000$<salt>$<hash>', so it can be verified after the settings change.
 
     Parameters:
     - password (str): The password to be hashed.
+    - algorithm (str): Optional. 'scrypt' or 'pbkdf2_sha256', defaults to PASSWORD_HASH_ALGORITHM.
+    - cost (int): Optional. The scrypt n or the PBKDF2 iterations, defaults to PASSWORD_HASH_COSTS.
 
     Returns:
     - str: The hashed password.
+
+    Raises:
+    - ValueError: If algorithm is invalid.
+    """
+    algorithm = algorithm or PASSWORD_HASH_ALGORITHM
+
+    if algorithm not in PASSWORD_HASH_COSTS:
+        raise ValueError(
+            f"Invalid algorithm. Allowed algorithms: {', '.join(PASSWORD_HASH_COSTS)}")
+
+    cost = cost or PASSWORD_HASH_COSTS[algorithm]
+    salt = os.urandom(16)
+
+    if algorithm == 'scrypt':
+        digest = _scrypt(password, salt, cost, SCRYPT_BLOCK_SIZE, SCRYPT_PARALLELISM)
+        return f"scrypt${cost}${SCRYPT_BLOCK_SIZE}${SCRYPT_PARALLELISM}${salt.hex()}${digest.hex()}"
+
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, cost)
+    return f"pbkdf2_sha256${cost}${salt.hex()}${digest.hex()}"
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int):
+    """
+    Derive a key with scrypt, allowing enough memory for the requested cost.
+
+    Parameters:
+    - password (str): The password.
+    - salt (bytes): The salt.
+    - n (int): The CPU and memory cost.
+    - r (int): The block size.
+    - p (int): The parallelism.
+
+    Returns:
+    - bytes: The derived key.
+    """
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=2 * 128 * r * (n + p), dklen=32)
+
+
+def _legacy_hash_password(password: str):
+    """
+    Hash a password with the unsalted SHA-256 used before versioned hashes.
+
+    Parameters:
+    - password (str): The password to be hashed.
+
+    Returns:
+    - str: The hexadecimal SHA-256 digest.
+    """
+    return hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+
+def needs_rehash(hashed_password: str):
     """
-    # Convert the password to bytes before hashing
-    password_bytes = password.encode('utf-8')
+    Check if a stored hash is a legacy hash or uses other settings than new hashes.
 
-    # Create a SHA-256 hash object
-    sha256_hash = hashlib.sha256()
+    Parameters:
+    - hashed_password (str): The stored hashed password.
 
-    # Update the hash object with the password bytes
-    sha256_hash.update(password_bytes)
+    Returns:
+    - bool: True if the password should be hashed again, False otherwise.
+    """
+    cost = str(PASSWORD_HASH_COSTS[PASSWORD_HASH_ALGORITHM])
 
-    # Get the hexadecimal representation of the hash
-    hashed_password = sha256_hash.hexdigest()
+    if PASSWORD_HASH_ALGORITHM == 'scrypt':
+        settings = ['scrypt', cost, str(SCRYPT_BLOCK_SIZE), str(SCRYPT_PARALLELISM)]
+    else:
+        settings = [PASSWORD_HASH_ALGORITHM, cost]
 
-    return hashed_password
+    return hashed_password.split('$')[:len(settings)] != settings
 
 
 def compare_password_to_hash(password: str, hashed_password: str):
     """
-    Compare a password to its hashed version.
+    Compare a password to its hashed version in constant time. Runs on the calling
+    thread, use verify_password to keep slow hashes off it.
+
+    Parameters:
+    - password (str): The password to be compared.
+    - hashed_password (str): The hashed version of the password, versioned or legacy SHA-256.
+
+    Returns:
+    - bool: True if the password matches the hashed version, False otherwise.
+    """
+    fields = hashed_password.split('$')
+
+    try:
+        if fields[0] == 'scrypt' and len(fields) == 6:
+            n, r, p = (int(value) for value in fields[1:4])
+            expected = bytes.fromhex(fields[5])
+            digest = _scrypt(password, bytes.fromhex(fields[4]), n, r, p)
+
+        elif fields[0] == 'pbkdf2_sha256' and len(fields) == 4:
+            expected = bytes.fromhex(fields[3])
+            digest = hashlib.pbkdf2_hmac('sha256', password.encode(
+                'utf-8'), bytes.fromhex(fields[2]), int(fields[1]))
+
+        elif len(fields) == 1:
+            return hmac.compare_digest(_legacy_hash_password(password), hashed_password)
+
+        else:
+            return False
+
+    except ValueError:
+        # A malformed stored hash never matches
+        return False
+
+    return hmac.compare_digest(digest, expected)
+
+
+def _get_password_executor():
+    """
+    Get the worker pool that verifies passwords, starting it on first use.
+
+    Returns:
+    - ThreadPoolExecutor: The worker pool.
+    """
+    global _password_executor
+
+    with _password_lock:
+        if _password_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _password_executor = ThreadPoolExecutor(
+                max_workers=PASSWORD_WORKERS, thread_name_prefix='password')
+
+    return _password_executor
+
+
+def verify_password(password: str, hashed_password: str):
+    """
+    Compare a password to its hashed version on the password worker pool. The key
+    derivation functions release the GIL, so verifications run in parallel while the
+    calling thread waits. At most PASSWORD_QUEUE_SIZE verifications are queued, further
+    callers wait for a free slot.
 
     Parameters:
     - password (str): The password to be compared.
@@ -161,24 +477,54 @@ def compare_password_to_hash(password: str, hashed_password: str):
     Returns:
     - bool: True if the password matches the hashed version, False otherwise.
     """
-    # Hash the provided password
-    hashed_input_password = hash_password(password)
+    executor = _get_password_executor()
 
-    # Compare the hashed input password to the stored hashed password
-    return hashed_input_password == hashed_password
+    with _password_slots:
+        return executor.submit(compare_password_to_hash, password, hashed_password).result()
 
 
-def display_table(entity_name: str, field_names: list[str], data: list[dict]):
+def authenticate_user(db, username: str, password: str):
     """
-    Displays a table containing information for a given entity.
+    Check a username and password, upgrading a legacy or outdated hash on success.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - username (str): The username of the user.
+    - password (str): The password entered by the user.
+
+    Returns:
+    - User or None: The user if the credentials are valid, None otherwise.
+    """
+    user = db.read_user(username=username)
+
+    if not user or not verify_password(password, user.password):
+        return None
+
+    if needs_rehash(user.password):
+        new_hashed_password = hash_password(password)
+        # Upgrading the hash isn't an edit of the user, so it isn't in the change feed
+        if db.upgrade_password_hash(user.id, user.password, new_hashed_password):
+            user.password = new_hashed_password
+
+    return user
+
+
+def render_table(entity_name: str, field_names: list[str], data: list[dict]):
+    """
+    Renders a table containing information for a given entity.
 
     Parameters:
     - entity_name (str): The name of the entity.
     - field_names (list[str]): A list of field names for the table.
     - data (list[dict]): A list of dictionaries representing the entity data.
 
+    Returns:
+    - str: The table with its header.
+
     Each dictionary in the data list should have keys corresponding to the field names.
     """
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = ["S/N", *[name.title() for name in field_names]]
 
@@ -189,10 +535,43 @@ def display_table(entity_name: str, field_names: list[str], data: list[dict]):
     header = f"{entity_name} Information Table"
     separator = "=" * len(header)
 
-    print()
-    print(header)
-    print(separator)
-    print(table)
+    return f"\n{header}\n{separator}\n{table}"
+
+
+def display_table(entity_name: str, field_names: list[str], data: list[dict]):
+    """
+    Displays a table containing information for a given entity.
+
+    Parameters:
+    - entity_name (str): The name of the entity.
+    - field_names (list[str]): A list of field names for the table.
+    - data (list[dict]): A list of dictionaries representing the entity data.
+
+    Each dictionary in the data list should have keys corresponding to the field names.
+    """
+    screen.print(render_table(entity_name, field_names, data))
+
+
+def display_cached_table(db, record_types: list[str], entity_name: str, field_names: list[str], get_data, scope=''):
+    """
+    Displays a table, reading and rendering its data only if the tables it comes from
+    changed since it was last displayed.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - record_types (list[str]): The types of record the data is read from.
+    - entity_name (str): The name of the entity.
+    - field_names (list[str]): A list of field names for the table.
+    - get_data (Callable): Returns a list of dictionaries representing the entity data.
+    - scope (str): Optional. Identifies whose data it is when get_data depends on more than the tables, e.g. a user id.
+    """
+    key = (os.path.abspath(db.folder_path), entity_name, tuple(field_names), scope, db.get_version(*record_types))
+    text = render_cache.get(key)
+
+    if text is None:
+        text = render_cache.put(key, render_table(entity_name, field_names, get_data()))
+
+    screen.print(text)
 
 
 # User Actions
@@ -206,16 +585,15 @@ def view_all_users(db, admin):
     """
     reset_screen()
     try:
-        users = admin.get_all_users(db)
-        display_table(
-            "User", ["id", "username", "name", "role", "creator", "created_at"], [user.__dict__ for user in users])
+        display_cached_table(db, ["user"], "User", ["id", "username", "name", "role", "creator", "created_at"],
+                             lambda: [user.__dict__ for user in admin.get_all_users(db)])
 
     except KeyError:
-        print(
+        screen.print(
             "\nEach dictionary in the data list should have keys corresponding to the field names.")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def view_all_courses(db, admin):
@@ -228,16 +606,15 @@ def view_all_courses(db, admin):
     """
     reset_screen()
     try:
-        courses = admin.get_all_courses(db)
-        display_table(
-            "Course", ["id", "name", "description", "creator", "created_at"], [course.__dict__ for course in courses])
+        display_cached_table(db, ["course"], "Course", ["id", "name", "description", "capacity", "creator", "created_at"],
+                             lambda: [course.__dict__ for course in admin.get_all_courses(db)])
 
     except KeyError:
-        print(
+        screen.print(
             "\nEach dictionary in the data list should have keys corresponding to the field names.")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def view_all_enrollments(db, admin):
@@ -250,16 +627,15 @@ def view_all_enrollments(db, admin):
     """
     reset_screen()
     try:
-        enrollments = admin.get_all_enrollments(db)
-        display_table(
-            "Enrollment", ["id", "user_id", "username", "course_id", "course_name", "creator", "created_at"], [enrollment.__dict__ for enrollment in enrollments])
+        display_cached_table(db, ["enrollment", "user", "course"], "Enrollment", ["id", "user_id", "username", "course_id", "course_name", "creator", "created_at"],
+                             lambda: [enrollment.__dict__ for enrollment in admin.get_all_enrollments(db)])
 
     except KeyError:
-        print(
+        screen.print(
             "\nEach dictionary in the data list should have keys corresponding to the field names.")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def view_all_student_courses(db):
@@ -271,28 +647,29 @@ def view_all_student_courses(db):
     """
     reset_screen()
     try:
-        value = input("Enter username or id: ")
+        value = screen.input("Enter username or id: ")
 
         if not validate_string_input(value):
-            print("\nInvalid username or id.")
+            screen.print("\nInvalid username or id.")
             return
 
+        import classes.user as user_class
+
         student = db.read_user(id=value, username=value)
 
         if isinstance(student, user_class.Student):
-            courses = student.get_enrolled_courses(db)
-            display_table(f"{student.name}'s Course", ["id", "name", "description", "creator", "created_at"], [
-                course.__dict__ for course in courses])
+            display_cached_table(db, ["enrollment", "course"], f"{student.name}'s Course", ["id", "name", "description", "creator", "created_at"],
+                                 lambda: [course.__dict__ for course in student.get_enrolled_courses(db)], scope=student.id)
             return
 
-        print("\nDidn't find a student with that username or id.")
+        screen.print("\nDidn't find a student with that username or id.")
 
     except KeyError:
-        print(
+        screen.print(
             "\nEach dictionary in the data list should have keys corresponding to the field names.")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def view_all_course_students(db):
@@ -304,28 +681,29 @@ def view_all_course_students(db):
     """
     reset_screen()
     try:
-        value = input("Enter course id: ")
+        value = screen.input("Enter course id: ")
 
         if not validate_string_input(value):
-            print("\nCourse id can not be empty.")
+            screen.print("\nCourse id can not be empty.")
             return
 
+        import classes.course as course_class
+
         course = db.read_course(id=value)
 
         if isinstance(course, course_class.Course):
-            users = course.get_enrolled_students(db)
-            display_table(f"{course.name}'s Student", ["id", "username", "name", "role", "creator", "created_at"], [
-                user.__dict__ for user in users])
+            display_cached_table(db, ["enrollment", "user"], f"{course.name}'s Student", ["id", "username", "name", "role", "creator", "created_at"],
+                                 lambda: [user.__dict__ for user in course.get_enrolled_students(db)], scope=course.id)
             return
 
-        print("\nDidn't find a course with that id.")
+        screen.print("\nDidn't find a course with that id.")
 
     except KeyError:
-        print(
+        screen.print(
             "\nEach dictionary in the data list should have keys corresponding to the field names.")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def create_new_user(db, admin, role: str):
@@ -339,32 +717,33 @@ def create_new_user(db, admin, role: str):
     """
     reset_screen()
     try:
-        username = input(f"Enter {role}'s username: ")
-        full_name = input(f"Enter {role}'s full name: ")
-        password = getpass(prompt=f"Enter {role}'s password (hidden): ")
+        username = screen.input(f"Enter {role}'s username: ")
+        full_name = screen.input(f"Enter {role}'s full name: ")
+        password = screen.getpass(prompt=f"Enter {role}'s password (hidden): ")
 
         if not validate_string_input(username):
-            print("\nUsername can not be empty.")
+            screen.print("\nUsername can not be empty.")
             return
 
         if not validate_string_input(full_name):
-            print("\nFull name can not be empty.")
+            screen.print("\nFull name can not be empty.")
             return
 
         if not validate_string_input(password):
-            print("\nPassword can not be empty.")
+            screen.print("\nPassword can not be empty.")
             return
 
-        student = admin.create_user(
-            db, full_name, username, password, role)
+        student = run_audited(db, 'create_user', admin.username, lambda: admin.create_user(
+            db, full_name, username, password, role), username=username, role=role)
+        audit(db, 'create_user', admin.username, id=student.id, username=username, role=role)
 
-        print(f"\n{role.title()} Created Successfully {student}.")
+        screen.print(f"\n{role.title()} Created Successfully {student}.")
 
     except ValueError as e:
-        print(f"\n{e}")
+        screen.print(f"\n{e}")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def create_new_course(db, admin):
@@ -377,60 +756,243 @@ def create_new_course(db, admin):
     """
     reset_screen()
     try:
-        course_name = input("Enter the course name: ")
-        course_description = input(
+        course_name = screen.input("Enter the course name: ")
+        course_description = screen.input(
             "Enter the course description: ")
+        course_capacity = screen.input(
+            "Enter the course capacity (leave empty for no limit): ").strip()
 
         if not validate_string_input(course_name):
-            print("\nCourse name can not be empty.")
+            screen.print("\nCourse name can not be empty.")
             return
 
         if not validate_string_input(course_description):
-            print("\nCourse description can not be empty.")
+            screen.print("\nCourse description can not be empty.")
             return
 
-        course = admin.create_course(
-            db, course_name, course_description)
+        course = run_audited(db, 'create_course', admin.username, lambda: admin.create_course(
+            db, course_name, course_description, course_capacity), name=course_name)
+        audit(db, 'create_course', admin.username, id=course.id, name=course_name, capacity=course_capacity)
 
-        print(f"\nCourse Created Successfully {course}.")
+        screen.print(f"\nCourse Created Successfully {course}.")
+
+    except ValueError as e:
+        screen.print(f"\n{e}")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}")
+        screen.print(f"\nAn unkowned error occured {e}")
 
 
 def enroll_user_to_course(db, admin):
     """
-    Admin action, Enrolls student to course.
+    Admin action, Enrolls student to course, or puts them on its waitlist if it is full.
 
     Parameters:
     - db (Database): The Database instance.
     - admin (Admin): Admin user performing action.
     """
+    import classes.database as database_class
+
     reset_screen()
     try:
-        username = input("Enter username of user to enroll: ")
-        course_id = input(
+        username = screen.input("Enter username of user to enroll: ")
+        course_id = screen.input(
             "Enter course id of course to enroll to: ")
 
         if not validate_string_input(username):
-            print("\nUsername can not be empty")
+            screen.print("\nUsername can not be empty")
             return
 
         if not validate_string_input(course_id):
-            print("\nFull name can not be empty")
+            screen.print("\nFull name can not be empty")
             return
 
-        enrollment = admin.create_enrollment(
-            db,  username, course_id)
+        try:
+            enrollment = run_audited(db, 'enroll_user', admin.username, lambda: admin.create_enrollment(
+                db,  username, course_id), username=username, course_id=course_id)
+        except database_class.CourseFullError:
+            position = run_audited(db, 'waitlist_user', admin.username, lambda: admin.add_to_waitlist(
+                db, username, course_id), username=username, course_id=course_id)
+            audit(db, 'waitlist_user', admin.username, username=username, course_id=course_id, position=position)
+            screen.print(
+                f"\nThe course is full, {username} is number {position} on its waitlist.")
+            return
+
+        audit(db, 'enroll_user', admin.username, id=enrollment.id, username=username, course_id=course_id)
 
-        print(
+        screen.print(
             f"\nEnrollment Created Successfully {enrollment}.")
 
     except ValueError as e:
-        print(f"\n{e}")
+        screen.print(f"\n{e}")
+
+    except Exception as e:
+        screen.print(f"\nAn unkowned error occured {e}.")
+
+
+def update_course_details(db, admin):
+    """
+    Admin action, Renames a course and changes its description and capacity.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): Admin user performing action.
+    """
+    reset_screen()
+    try:
+        course_id = screen.input("Enter course id of course to update: ")
+        course_name = screen.input("Enter the new course name: ")
+        course_description = screen.input("Enter the new course description: ")
+        course_capacity = screen.input("Enter the new course capacity (leave empty for no limit): ").strip()
+
+        if not validate_string_input(course_id):
+            screen.print("\nCourse id can not be empty.")
+            return
+
+        if not validate_string_input(course_name):
+            screen.print("\nCourse name can not be empty.")
+            return
+
+        if not validate_string_input(course_description):
+            screen.print("\nCourse description can not be empty.")
+            return
+
+        course = run_audited(db, 'update_course', admin.username, lambda: admin.update_course(
+            db, course_id, course_name, course_description, course_capacity), id=course_id)
+        audit(db, 'update_course', admin.username, id=course_id, name=course_name, capacity=course_capacity)
+
+        screen.print(f"\nCourse Updated Successfully {course}.")
+
+    except ValueError as e:
+        screen.print(f"\n{e}")
+
+    except Exception as e:
+        screen.print(f"\nAn unkowned error occured {e}.")
+
+
+def reset_user_password(db, admin):
+    """
+    Admin action, Resets a user's password.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): Admin user performing action.
+    """
+    reset_screen()
+    try:
+        username = screen.input("Enter username of user: ")
+        password = screen.getpass(prompt="Enter the new password (hidden): ")
+
+        if not validate_string_input(username):
+            screen.print("\nUsername can not be empty.")
+            return
+
+        if not validate_string_input(password):
+            screen.print("\nPassword can not be empty.")
+            return
+
+        user = run_audited(db, 'reset_password', admin.username, lambda: admin.reset_password(
+            db, username, password), username=username)
+        audit(db, 'reset_password', admin.username, id=user.id, username=username)
+
+        screen.print(f"\nPassword Reset Successfully {user}.")
+
+    except ValueError as e:
+        screen.print(f"\n{e}")
+
+    except Exception as e:
+        screen.print(f"\nAn unkowned error occured {e}.")
+
+
+def unenroll_user_from_course(db, admin):
+    """
+    Admin action, Drops a student from a course.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): Admin user performing action.
+    """
+    reset_screen()
+    try:
+        username = screen.input("Enter username of user to unenroll: ")
+        course_id = screen.input(
+            "Enter course id of course to unenroll from: ")
+
+        if not validate_string_input(username):
+            screen.print("\nUsername can not be empty.")
+            return
+
+        if not validate_string_input(course_id):
+            screen.print("\nCourse id can not be empty.")
+            return
+
+        enrollment = run_audited(db, 'unenroll_user', admin.username, lambda: admin.unenroll_user(
+            db, username, course_id), username=username, course_id=course_id)
+        audit(db, 'unenroll_user', admin.username, id=enrollment.id, username=username, course_id=course_id)
+
+        screen.print(f"\nEnrollment Deleted Successfully {enrollment}.")
+
+    except ValueError as e:
+        screen.print(f"\n{e}")
+
+    except Exception as e:
+        screen.print(f"\nAn unkowned error occured {e}.")
+
+
+def delete_existing_user(db, admin):
+    """
+    Admin action, Deletes a user and their enrollments.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): Admin user performing action.
+    """
+    reset_screen()
+    try:
+        username = screen.input("Enter username of user to delete: ")
+
+        if not validate_string_input(username):
+            screen.print("\nUsername can not be empty.")
+            return
+
+        user = run_audited(db, 'delete_user', admin.username, lambda: admin.delete_user(db, username), username=username)
+        audit(db, 'delete_user', admin.username, id=user.id, username=username)
+
+        screen.print(f"\nUser Deleted Successfully {user}.")
+
+    except ValueError as e:
+        screen.print(f"\n{e}")
+
+    except Exception as e:
+        screen.print(f"\nAn unkowned error occured {e}.")
+
+
+def delete_existing_course(db, admin):
+    """
+    Admin action, Deletes a course and its enrollments.
+
+    Parameters:
+    - db (Database): The Database instance.
+    - admin (Admin): Admin user performing action.
+    """
+    reset_screen()
+    try:
+        course_id = screen.input("Enter course id of course to delete: ")
+
+        if not validate_string_input(course_id):
+            screen.print("\nCourse id can not be empty.")
+            return
+
+        course = run_audited(db, 'delete_course', admin.username, lambda: admin.delete_course(db, course_id), id=course_id)
+        audit(db, 'delete_course', admin.username, id=course_id, name=course.name)
+
+        screen.print(f"\nCourse Deleted Successfully {course}.")
+
+    except ValueError as e:
+        screen.print(f"\n{e}")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def view_my_courses(db, student):
@@ -443,16 +1005,15 @@ def view_my_courses(db, student):
     """
     reset_screen()
     try:
-        courses = student.get_enrolled_courses(db)
-        display_table(
-            "My Courses", ["id", "name", "description", "creator", "created_at"], [course.__dict__ for course in courses])
+        display_cached_table(db, ["enrollment", "course"], "My Courses", ["id", "name", "description", "creator", "created_at"],
+                             lambda: [course.__dict__ for course in student.get_enrolled_courses(db)], scope=student.id)
 
     except KeyError:
-        print(
+        screen.print(
             "\nEach dictionary in the data list should have keys corresponding to the field names.")
 
     except Exception as e:
-        print(f"\nAn unkowned error occured {e}.")
+        screen.print(f"\nAn unkowned error occured {e}.")
 
 
 def quit_program(message: str):
@@ -463,4 +1024,5 @@ def quit_program(message: str):
     - message (str): sys exit message.
 
     """
+    screen.close()
     sys.exit(message)